@@ -0,0 +1,446 @@
+"""
+Headless JSON API over the same corpus, search index and page index as the
+Streamlit app, for clients that cannot afford a Streamlit session.
+
+    GET /api/categories                          categories, subcategories, article counts
+    GET /api/search?q=...&category=...&pages=1   article hits (and page hits with pages=1)
+    GET /api/articles/{id}                       one article
+    GET /api/penalties?kind=...&class=...&min_fine=700&category=...
+                                                 articles filtered by structured penalty facets
+    GET /api/documents                           PDFs in attached_assets
+    GET /api/documents/{name}?pages=3-5          a page range of one PDF, as a PDF
+    GET /api/health                              200 once warmed up (with the startup profile), 503 before
+
+This is a plain ASGI application, run with any ASGI server, for example
+(from the project root):
+
+    uvicorn api:app --host 0.0.0.0 --port 8600 --timeout-keep-alive 30
+    python -m api --port 8600
+
+Several workers on one host can share one memory-mapped copy of the corpus
+and index (see utils.snapshot):
+
+    python -m utils.snapshot build --watch &
+    CORPUS_SNAPSHOT_DIR=data/snapshots uvicorn api:app --port 8600 --workers 4
+
+Responses carry Content-Length so connections are kept alive, JSON bodies are
+gzipped when the client accepts it, every response has an ETag derived from
+the corpus version (If-None-Match gives 304 without doing the work), and at
+most MAX_CONCURRENT_REQUESTS requests are processed at once.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote
+
+import numpy as np
+import PyPDF2
+
+from data.categories import CATEGORIES
+from utils.analytics import get_query_log, schedule_prewarm
+from utils.article import compact_categories
+from utils.page_index import ASSETS_DIR, cached_page_search, get_page_index
+from utils.pdf_backends import pdf_reader
+from utils.penalties import OFFENCE_CLASSES, PENALTY_KINDS, PenaltyFacets
+from utils.query import QuerySyntaxError
+from utils.search_cache import cached_search
+from utils.search_index import ShardedSearchIndex
+from utils.snapshot import get_current_snapshot
+from utils.storage import create_repository
+from utils.warmup import CORPUS_VERSION, get_warm_corpus, is_ready, startup_profile, warmup_error
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("API_MAX_CONCURRENT_REQUESTS", "32"))
+QUEUE_TIMEOUT = 5.0
+GZIP_MIN_BYTES = 1024
+MAX_PAGE_RANGE = 50
+MAX_SEARCH_LIMIT = 500
+PENALTY_AMOUNT_FILTERS = {
+    'min_fine': 'fine_at_least',
+    'max_fine': 'fine_at_most',
+    'min_days': 'days_at_least',
+    'max_days': 'days_at_most'
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def article_id(category: str, subcategory: str, position: int) -> str:
+    """Stable id of the position-th article of a subcategory"""
+    key = f"{category}\x1f{subcategory}\x1f{position}".encode('utf-8')
+    return hashlib.sha1(key).hexdigest()[:16]
+
+
+class ApiCorpus:
+    """
+    The repository plus everything derived from it, rebuilt when the
+    repository version changes (for example after an upload in the Streamlit
+    app when both share a SQLite corpus).
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.version: Optional[str] = None
+        self.index: Optional[ShardedSearchIndex] = None
+        self.penalties: Optional[PenaltyFacets] = None
+        self.articles: Dict[str, Tuple[str, str, Dict]] = {}
+        self._ids_by_title: Dict[Tuple[str, str, str], List[str]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> str:
+        """Rebuild the derived state if the corpus changed; returns the current version"""
+        repository = self.repository
+        version = repository.version
+        if version == self.version:
+            return version
+        with self._lock:
+            if version != self.version:
+                articles, ids_by_title, positions = {}, {}, {}
+                for category, subcategory, article in repository.iter_articles():
+                    position = positions.get((category, subcategory), 0)
+                    positions[(category, subcategory)] = position + 1
+                    identifier = article_id(category, subcategory, position)
+                    articles[identifier] = (category, subcategory, article)
+                    ids_by_title.setdefault((category, subcategory, article['title']), []).append(identifier)
+                warm = get_warm_corpus()
+                snapshot = get_current_snapshot()
+                if snapshot is not None and snapshot.version == version:
+                    self.index = snapshot.index
+                    self.penalties = snapshot.derived('penalties', PenaltyFacets.from_repository)
+                elif warm is not None and warm.version == version:
+                    self.index, self.penalties = warm.index, warm.penalties
+                else:
+                    self.index = ShardedSearchIndex.from_repository(repository)
+                    self.penalties = PenaltyFacets.from_repository(repository)
+                self.articles, self._ids_by_title = articles, ids_by_title
+                self.version = version
+                schedule_prewarm(self.index, version)
+                logger.info(f"API corpus loaded at version {version}: {len(articles)} articles")
+        return version
+
+    def refreshed(self) -> 'ApiCorpus':
+        self.refresh()
+        return self
+
+    def id_of(self, result: Dict[str, str]) -> Optional[str]:
+        candidates = self._ids_by_title.get((result['category'], result['subcategory'], result['title']), [])
+        if len(candidates) == 1:
+            return candidates[0]
+        for identifier in candidates:
+            if self.articles[identifier][2]['content'] == result['content']:
+                return identifier
+        return None
+
+    def categories(self) -> List[Dict]:
+        return [{
+            'name': category,
+            'subcategories': [{
+                'name': subcategory,
+                'articles': len(self.repository.get_articles(category, subcategory))
+            } for subcategory in self.repository.get_subcategories(category)]
+        } for category in self.repository.get_categories()]
+
+    def search(self, query: str, category: Optional[str], limit: int, pages: bool) -> Dict:
+        categories = [category] if category else None
+        started = time.perf_counter()
+        results = cached_search(self.index, query, self.version, categories=categories)
+        get_query_log().record(query, time.perf_counter() - started, len(results), category)
+        response = {
+            'query': query,
+            'version': self.version,
+            'total': len(results),
+            'results': [dict(result, id=self.id_of(result)) for result in results[:limit]]
+        }
+        if pages:
+            response['pages'] = cached_page_search(get_page_index(background_update=False), query, limit=limit)
+        return response
+
+    def penalties_matching(self, filters: Dict, limit: int) -> Dict:
+        # Rows of the facets follow iter_articles(), like the ids
+        identifiers = list(self.articles)
+        rows = [int(row) for row in np.flatnonzero(self.penalties.mask(**filters))]
+        return {
+            'filters': filters,
+            'version': self.version,
+            'total': len(rows),
+            'results': [dict(self.article(identifiers[row]), facets=self.penalties.facets(row))
+                        for row in rows[:limit]]
+        }
+
+    def article(self, identifier: str) -> Dict:
+        if identifier not in self.articles:
+            raise ApiError(404, "Article not found")
+        category, subcategory, article = self.articles[identifier]
+        return {
+            'id': identifier,
+            'category': category,
+            'subcategory': subcategory,
+            'title': article['title'],
+            'law': article.get('law', ''),
+            'content': article['content'],
+            'penalty': article.get('penalty', '')
+        }
+
+
+def list_documents() -> Dict[str, Path]:
+    return {path.name: path for path in sorted(Path(ASSETS_DIR).glob("*.pdf"))}
+
+
+def parse_page_range(value: str, page_count: int) -> Tuple[int, int]:
+    """'3-5' or '4' -> 1-based inclusive (first, last), checked against the document"""
+    first, _, last = value.partition('-')
+    try:
+        first_page = int(first)
+        last_page = int(last) if last else first_page
+    except ValueError:
+        raise ApiError(400, "pages must look like 3-5")
+    if not 1 <= first_page <= last_page <= page_count:
+        raise ApiError(416, f"Page range outside 1-{page_count}")
+    if last_page - first_page + 1 > MAX_PAGE_RANGE:
+        raise ApiError(400, f"At most {MAX_PAGE_RANGE} pages per request")
+    return first_page, last_page
+
+
+def extract_page_range(path: Path, pages: Optional[str]) -> bytes:
+    """The requested pages as a new PDF, or the whole file when pages is None"""
+    if pages is None:
+        return path.read_bytes()
+    # The pooled reader skips reparsing the file on every request
+    with pdf_reader(str(path)) as reader:
+        first_page, last_page = parse_page_range(pages, len(reader.pages))
+        writer = PyPDF2.PdfWriter()
+        for page_number in range(first_page - 1, last_page):
+            writer.add_page(reader.pages[page_number])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+    return buffer.getvalue()
+
+
+_corpus: Optional[ApiCorpus] = None
+_corpus_lock = threading.Lock()
+_request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
+def get_corpus() -> ApiCorpus:
+    global _corpus
+    with _corpus_lock:
+        snapshot = get_current_snapshot()
+        if snapshot is not None:
+            # Follow the published snapshot; the next refresh() loads it
+            if _corpus is None:
+                _corpus = ApiCorpus(snapshot.repository)
+            _corpus.repository = snapshot.repository
+        elif _corpus is None:
+            warm = get_warm_corpus()
+            _corpus = ApiCorpus(warm.new_repository() if warm is not None else
+                                create_repository(compact_categories(CATEGORIES), version=CORPUS_VERSION))
+        return _corpus
+
+
+def _query_param(params: Dict[str, List[str]], name: str, default: str = '') -> str:
+    values = params.get(name)
+    return values[0] if values else default
+
+
+def _limit(params: Dict[str, List[str]]) -> int:
+    """The limit parameter, capped at MAX_SEARCH_LIMIT"""
+    try:
+        limit = int(_query_param(params, 'limit', '50'))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    if limit < 1:
+        raise ApiError(400, "limit must be at least 1")
+    return min(limit, MAX_SEARCH_LIMIT)
+
+
+def _etag(*parts: object) -> str:
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def route(path: str, params: Dict[str, List[str]]) -> Tuple[str, object]:
+    """
+    Resolve a request to (etag, handler). The etag is computed without doing
+    the work so that conditional requests can be answered first.
+    """
+    if path == '/api/health':
+        # Ready once every warmup phase succeeded; a failed warmup stays unhealthy
+        error = warmup_error()
+        if error is not None:
+            raise ApiError(503, f"Warmup failed: {error}")
+        if not is_ready():
+            raise ApiError(503, "Warming up")
+        version = get_corpus().version
+        return _etag(path, version, startup_profile()), lambda: json_body(
+            {'status': 'ready', 'version': version, 'startup': startup_profile()})
+
+    corpus = get_corpus()
+    if path == '/api/categories':
+        return _etag(corpus.repository.version, path), lambda: json_body(corpus.refreshed().categories())
+
+    if path == '/api/search':
+        query = _query_param(params, 'q').strip()
+        if not query:
+            raise ApiError(400, "Missing q")
+        category = _query_param(params, 'category') or None
+        limit = _limit(params)
+        pages = _query_param(params, 'pages') in ('1', 'true')
+        return (_etag(corpus.repository.version, path, query, category, limit, pages),
+                lambda: json_body(corpus.refreshed().search(query, category, limit, pages)))
+
+    if path == '/api/penalties':
+        filters = {
+            'kinds': params.get('kind', []),
+            'offence_class': _query_param(params, 'class') or None,
+            'category': _query_param(params, 'category') or None,
+            'subcategory': _query_param(params, 'subcategory') or None
+        }
+        if any(kind not in PENALTY_KINDS for kind in filters['kinds']):
+            raise ApiError(400, f"kind must be one of: {', '.join(PENALTY_KINDS)}")
+        if filters['offence_class'] not in (None,) + OFFENCE_CLASSES:
+            raise ApiError(400, f"class must be one of: {', '.join(OFFENCE_CLASSES[1:])}")
+        try:
+            for name in ('min_fine', 'max_fine', 'min_days', 'max_days'):
+                value = _query_param(params, name)
+                if value:
+                    filters[PENALTY_AMOUNT_FILTERS[name]] = float(value)
+        except ValueError:
+            raise ApiError(400, "amounts must be numbers")
+        limit = _limit(params)
+        return (_etag(corpus.repository.version, path, sorted(params.items()), limit),
+                lambda: json_body(corpus.refreshed().penalties_matching(filters, limit)))
+
+    if path.startswith('/api/articles/'):
+        identifier = path[len('/api/articles/'):]
+        return _etag(corpus.repository.version, path), lambda: json_body(corpus.refreshed().article(identifier))
+
+    if path == '/api/documents':
+        documents = list_documents()
+        listing = [{'name': name, 'bytes': file.stat().st_size} for name, file in documents.items()]
+        return _etag(path, *(f"{entry['name']}:{entry['bytes']}" for entry in listing)), lambda: json_body(listing)
+
+    if path.startswith('/api/documents/'):
+        name = path[len('/api/documents/'):]
+        document = list_documents().get(name)
+        if document is None:
+            raise ApiError(404, "Document not found")
+        pages = _query_param(params, 'pages') or None
+        stat = document.stat()
+        return (_etag(name, stat.st_mtime, stat.st_size, pages),
+                lambda: (extract_page_range(document, pages), 'application/pdf'))
+
+    raise ApiError(404, "Not found")
+
+
+def json_body(data: object) -> Tuple[bytes, str]:
+    return json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8'
+
+
+async def send_response(send, status: int, body: bytes = b'', content_type: Optional[str] = None,
+                        headers: Optional[List[Tuple[bytes, bytes]]] = None, head: bool = False) -> None:
+    headers = list(headers or [])
+    if content_type:
+        headers.append((b'content-type', content_type.encode('latin-1')))
+    headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def send_error(send, status: int, message: str, headers=None) -> None:
+    body, content_type = json_body({'error': message})
+    await send_response(send, status, body, content_type, headers)
+
+
+async def handle_http(scope, send) -> None:
+    method = scope['method']
+    if method not in ('GET', 'HEAD'):
+        await send_error(send, 405, "Method not allowed", [(b'allow', b'GET, HEAD')])
+        return
+
+    request_headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    path = unquote(scope['path'])
+    params = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+
+    try:
+        await asyncio.wait_for(_request_slots.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        await send_error(send, 503, "Server busy", [(b'retry-after', b'1')])
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+        etag, handler = await loop.run_in_executor(None, route, path, params)
+        headers = [(b'etag', etag.encode('latin-1')), (b'vary', b'accept-encoding'),
+                   (b'cache-control', b'no-cache')]
+        if etag in (tag.strip() for tag in request_headers.get('if-none-match', '').split(',')):
+            await send_response(send, 304, headers=headers)
+            return
+
+        # Search and PDF slicing are CPU bound; keep them off the event loop
+        body, content_type = await loop.run_in_executor(None, handler)
+        if (content_type.startswith('application/json') and len(body) >= GZIP_MIN_BYTES
+                and 'gzip' in request_headers.get('accept-encoding', '')):
+            body = gzip.compress(body, compresslevel=5)
+            headers.append((b'content-encoding', b'gzip'))
+        await send_response(send, 200, body, content_type, headers, head=method == 'HEAD')
+    except ApiError as e:
+        await send_error(send, e.status, e.message)
+    except QuerySyntaxError as e:
+        await send_error(send, 400, f"Invalid query: {str(e)}")
+    except Exception as e:
+        logger.error(f"API error for {path}: {str(e)}")
+        await send_error(send, 500, "Internal error")
+    finally:
+        _request_slots.release()
+
+
+async def app(scope, receive, send) -> None:
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Load the corpus before the first request instead of during it
+                await asyncio.get_running_loop().run_in_executor(None, lambda: get_corpus().refresh())
+                get_page_index()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    elif scope['type'] == 'http':
+        await handle_http(scope, send)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the JSON API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--keep-alive", type=int, default=30, help="keep-alive timeout in seconds")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is not installed; install the 'api' extra or run api:app with another ASGI server")
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app, host=args.host, port=args.port, timeout_keep_alive=args.keep_alive)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Load test for the JSON API (api.py).
+
+Each simulated client keeps one HTTP/1.1 connection alive and sends requests
+back to back for the given duration; the report has requests/sec, latency
+percentiles and the status codes seen.
+
+Usage (from the project root):
+    python -m benchmarks.api_load                                  # in-process, no server needed
+    python -m benchmarks.api_load --url http://127.0.0.1:8600 --clients 64 --duration 20
+    python -m benchmarks.api_load --gzip --revalidate --output /tmp/api_load.json
+
+In-process mode calls the ASGI app directly, so it measures the application
+without any server or network overhead.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+from benchmarks.harness import environment_info, format_seconds, save_results
+
+DEFAULT_PATHS = [
+    "/api/categories",
+    "/api/search?q=" + quote("κλοπή"),
+    "/api/search?q=" + quote("ναρκωτικ OR όπλ"),
+    "/api/search?q=" + quote('"σωματική βλάβη"'),
+    "/api/search?q=" + quote("πρόστιμο") + "&category=" + quote("ΚΟΚ-ΤΡΟΧΟΝΟΜΙΚΑ"),
+    "/api/search?q=" + quote("law:Π.Κ. -κλοπή"),
+]
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client: GET only, Content-Length bodies only"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def get(self, path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        body = await self.reader.readexactly(int(response_headers.get('content-length', '0')))
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, body
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class InProcessConnection:
+    """Calls the ASGI app directly"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def get(self, path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        raw_path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': unquote(raw_path),
+            'query_string': query.encode('latin-1'),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        }
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await self.app(scope, None, send)
+        response_headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in messages[0]['headers']}
+        return messages[0]['status'], response_headers, messages[1]['body']
+
+    async def close(self) -> None:
+        pass
+
+
+async def run_client(connection, paths: List[str], deadline: float, use_gzip: bool, revalidate: bool,
+                     latencies: List[float], statuses: Counter, counter: Dict[str, int]) -> None:
+    etags: Dict[str, str] = {}
+    for path in itertools.cycle(paths):
+        if time.perf_counter() >= deadline:
+            break
+        headers = {'Accept-Encoding': 'gzip'} if use_gzip else {}
+        if revalidate and path in etags:
+            headers['If-None-Match'] = etags[path]
+        start = time.perf_counter()
+        try:
+            status, response_headers, body = await connection.get(path, headers)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            statuses[f"error:{type(e).__name__}"] += 1
+            await connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+        statuses[str(status)] += 1
+        counter['bytes'] += len(body)
+        if 'etag' in response_headers:
+            etags[path] = response_headers['etag']
+    await connection.close()
+
+
+async def load_test(url: Optional[str], clients: int, duration: float, paths: List[str],
+                    use_gzip: bool, revalidate: bool) -> Dict:
+    if url:
+        parts = urlsplit(url)
+        make_connection = lambda: HttpConnection(parts.hostname, parts.port or 80)
+    else:
+        import api
+        # Warm up the corpus and index like the server's lifespan startup does
+        await asyncio.get_running_loop().run_in_executor(None, lambda: api.get_corpus().refresh())
+        make_connection = lambda: InProcessConnection(api.app)
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = {'bytes': 0}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(run_client(make_connection(), paths, deadline, use_gzip, revalidate,
+                                      latencies, statuses, counter) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'target': url or 'in-process',
+        'clients': clients,
+        'seconds': elapsed,
+        'requests': len(latencies),
+        'requests_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_p50': quantiles[49],
+        'latency_p95': quantiles[94],
+        'latency_p99': quantiles[98],
+        'bytes': counter['bytes'],
+        'statuses': dict(statuses),
+        'gzip': use_gzip,
+        'revalidate': revalidate
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the JSON API")
+    parser.add_argument("--url", help="base URL of a running server; omit to call the app in-process")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", action="append", dest="paths", help="request path, repeatable")
+    parser.add_argument("--gzip", action="store_true", help="send Accept-Encoding: gzip")
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match with the last ETag")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(load_test(args.url, args.clients, args.duration, args.paths or DEFAULT_PATHS,
+                                   args.gzip, args.revalidate))
+
+    print(f"{report['target']}: {report['clients']} clients, {report['requests']} requests "
+          f"in {report['seconds']:.1f}s")
+    print(f"  {report['requests_per_sec']:.0f} requests/sec, {report['bytes'] / 1e6:.1f} MB")
+    print(f"  latency p50 {format_seconds(report['latency_p50'])}  p95 {format_seconds(report['latency_p95'])}"
+          f"  p99 {format_seconds(report['latency_p99'])}")
+    print(f"  statuses {report['statuses']}")
+    if args.output:
+        save_results({'environment': environment_info(), 'load_test': report}, args.output)
+    return 0 if all(status.startswith(('2', '3')) for status in report['statuses']) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
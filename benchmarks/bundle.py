@@ -0,0 +1,91 @@
+"""
+Size and search latency of the offline field bundle (utils.bundle).
+
+For the bundled corpus and, optionally, synthetic corpora this reports the
+compressed and raw bundle size, how long a client takes to load it, the
+search latency over the benchmark query set, and how many files a client has
+to re-download after one category changes.
+
+Usage (from the project root):
+    python -m benchmarks.bundle
+    python -m benchmarks.bundle --scale 10000 --scale 100000 --output /tmp/bundle.json
+"""
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+from typing import Dict
+
+from benchmarks.harness import format_seconds, save_results, time_call
+from benchmarks.run import SEARCH_QUERIES, STRUCTURED_QUERIES
+from benchmarks.synthetic_corpus import generate_corpus
+from data.categories import CATEGORIES
+from utils.article import compact_categories
+from utils.bundle import export_bundle, load_bundle, missing_files
+from utils.storage import InMemoryRepository
+
+
+def benchmark_corpus(name: str, categories: Dict, repeat: int) -> Dict[str, Dict]:
+    results = {}
+    bundle_dir = tempfile.mkdtemp(prefix="bundle-")
+    try:
+        repository = InMemoryRepository(categories)
+        manifest = export_bundle(repository, bundle_dir)
+        files = [entry for shard in manifest['shards'] for entry in shard['files'].values()]
+        size = {
+            'shards': len(manifest['shards']),
+            'bytes': sum(entry['bytes'] for entry in files),
+            'raw_bytes': sum(entry['raw_bytes'] for entry in files),
+            'index_bytes': sum(shard['files']['index']['bytes'] for shard in manifest['shards'])
+        }
+
+        results[f"bundle.export[{name}]"] = time_call(lambda: export_bundle(repository, bundle_dir), repeat=1, warmup=0)
+        results[f"bundle.load[{name}]"] = time_call(lambda: load_bundle(bundle_dir), repeat=repeat, warmup=0)
+        index = load_bundle(bundle_dir)
+        queries = SEARCH_QUERIES + STRUCTURED_QUERIES
+        results[f"bundle.search[{name}:all-queries]"] = time_call(
+            lambda: [index.search(query) for query in queries], repeat=repeat)
+
+        # Touch one category: only its two files should need downloading again
+        category = repository.get_categories()[0]
+        subcategory = repository.get_subcategories(category)[0]
+        repository.add_articles(category, subcategory, [{'title': 'Νέο άρθρο', 'law': '', 'content': 'Νέο', 'penalty': ''}])
+        changed = missing_files(export_bundle(repository, tempfile.mkdtemp(dir=bundle_dir)), bundle_dir)
+        size['files_after_one_category_change'] = len(changed)
+        results[f"bundle.size[{name}]"] = size
+    finally:
+        shutil.rmtree(bundle_dir, ignore_errors=True)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the offline bundle")
+    parser.add_argument("--scale", type=int, action="append", default=[], help="synthetic corpus size, repeatable")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    corpora = {'categories': compact_categories(CATEGORIES)}
+    for size in args.scale:
+        corpora[f"synthetic-{size}"] = generate_corpus(size)
+
+    results = {}
+    for name, categories in corpora.items():
+        results.update(benchmark_corpus(name, categories, args.repeat))
+
+    for name, result in results.items():
+        if 'median' in result:
+            print(f"{name:<50} {format_seconds(result['median']):>10}")
+        else:
+            print(f"{name:<50} {result['bytes'] / 1024:>9.1f} KiB gz, {result['raw_bytes'] / 1024:.1f} KiB raw, "
+                  f"index {result['index_bytes'] / 1024:.1f} KiB, {result['shards']} shards, "
+                  f"{result['files_after_one_category_change']} files to refetch after one change")
+    if args.output:
+        save_results(results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
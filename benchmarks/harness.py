@@ -0,0 +1,103 @@
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+def time_call(func: Callable[[], object], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Run func several times and return timing statistics in seconds"""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+        'repeat': len(timings)
+    }
+
+
+def measure_memory(func: Callable[[], object]) -> Dict[str, int]:
+    """Run func once and return the Python heap it allocated and kept, in bytes"""
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {'retained_bytes': current, 'peak_bytes': peak}
+
+
+def environment_info() -> Dict[str, str]:
+    """Describe the machine the benchmarks ran on"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': str(os.cpu_count())
+    }
+
+
+def save_results(results: Dict[str, Dict], path: str) -> None:
+    """Save benchmark results together with environment metadata"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    payload = {
+        'created_at': datetime.now().isoformat(),
+        'environment': environment_info(),
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Dict]:
+    """Load the results section of a saved benchmark run"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('results', {})
+
+
+def compare_results(current: Dict[str, Dict], baseline: Dict[str, Dict],
+                    threshold: float = 0.2, metric: str = 'median') -> List[Dict]:
+    """
+    Compare two runs and return one entry per shared benchmark.
+    A benchmark regresses when it is slower than the baseline by more than threshold.
+    """
+    comparison = []
+    for name in sorted(set(current) & set(baseline)):
+        old = baseline[name].get(metric)
+        new = current[name].get(metric)
+        if not old or new is None:
+            continue
+        ratio = new / old
+        comparison.append({
+            'name': name,
+            'baseline': old,
+            'current': new,
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold
+        })
+    return comparison
+
+
+def format_seconds(value: Optional[float]) -> str:
+    """Format a duration for the console report"""
+    if value is None:
+        return '-'
+    if value < 1e-3:
+        return f"{value * 1e6:.1f}µs"
+    if value < 1:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value:.2f}s"
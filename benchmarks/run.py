@@ -0,0 +1,325 @@
+"""
+Offline benchmark suite for the ingestion, search, validation and rendering paths.
+
+Usage (from the project root):
+    python -m benchmarks.run                       # run everything, save results
+    python -m benchmarks.run --only search         # run a single group
+    python -m benchmarks.run --save-baseline       # store this run as the baseline
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.run --only scaling --scale 10000 --scale 100000
+
+The process exits with status 1 when a benchmark is slower than the baseline
+by more than the threshold.
+"""
+import argparse
+import copy
+import logging
+import os
+import sys
+import tempfile
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import PyPDF2
+
+from benchmarks.harness import (compare_results, format_seconds, load_results,
+                                measure_memory, save_results, time_call)
+from benchmarks.synthetic_corpus import generate_corpus
+from data.categories import CATEGORIES
+from utils.article import TextArena, compact_categories
+from utils.pdf_pool import PdfReaderPool
+from utils.pdf_processor import process_pdf, process_pdf_to_articles
+from utils.rendering import render_article_html
+from utils.search import search_content
+from utils.search_cache import SearchCache, cached_search
+from utils.search_index import SearchIndex, ShardedSearchIndex
+from utils.storage import InMemoryRepository, SqliteRepository
+from utils.validation import ReferenceValidator
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = Path("attached_assets")
+RESULTS_DIR = Path("benchmarks/results")
+DEFAULT_BASELINE = Path("benchmarks/baseline.json")
+
+# Queries using the boolean, phrase and field syntax of utils.query
+STRUCTURED_QUERIES = [
+    "κατοχή ναρκωτικ",
+    '"σωματική βλάβη"',
+    "κλοπή OR ληστεία",
+    "ναρκωτικ NOT χρήση",
+    'law:"Π.Κ." penalty:φυλάκιση',
+    "category:ΟΠΛΑ",
+]
+
+# Representative queries typed by officers: single words, partial words,
+# law references, multi-word phrases and a query with no hits
+SEARCH_QUERIES = [
+    "κλοπή",
+    "φυλάκιση",
+    "πρόστιμο",
+    "ναρκωτικ",
+    "Π.Κ. 372",
+    "Ν.3500/2006",
+    "άρθρο 6",
+    "σωματική βλάβη",
+    "οπλοκατοχή",
+    "ανύπαρκτος όρος αναζήτησης",
+]
+
+Case = Tuple[str, str, Callable[[], object]]
+
+
+def merge_articles(base: Dict, articles: List[Dict[str, str]]) -> None:
+    """Merge a flat list of ingested articles into a nested categories dict"""
+    for article in articles:
+        subcategories = base.setdefault(article['category'], {})
+        subcategories.setdefault(article['subcategory'], []).append(article)
+
+
+def ingestion_cases(pdf_files: List[Path]) -> List[Case]:
+    """Cases for text extraction and article parsing of every bundled PDF"""
+    cases = []
+    for pdf_file in pdf_files:
+        path = str(pdf_file)
+        cases.append(("ingest", f"process_pdf[{pdf_file.name}]", lambda p=path: process_pdf(p)))
+        cases.append(("ingest", f"process_pdf_to_articles[{pdf_file.name}]",
+                      lambda p=path: process_pdf_to_articles(p)))
+    return cases
+
+
+# Large PDFs whose pages are looked up one at a time (page ranges, OCR fallback)
+PAGE_LOOKUP_FILES = ["eidikoi_poinikoi_nomoi-poinologi.pdf", "Ποινικός-Κώδικας.pdf"]
+
+
+def page_lookup_cases(pdf_files: List[Path]) -> List[Case]:
+    """Ten scattered page reads per run, reopening the file each time vs. through a reader pool"""
+    cases = []
+    wanted = {unicodedata.normalize('NFC', name) for name in PAGE_LOOKUP_FILES}
+    for pdf_file in pdf_files:
+        if unicodedata.normalize('NFC', pdf_file.name) not in wanted:
+            continue
+        path = str(pdf_file)
+        pool = PdfReaderPool()
+
+        def reopen(p=path):
+            for step in range(10):
+                reader = PyPDF2.PdfReader(p)
+                reader.pages[step * 7 % len(reader.pages)].extract_text()
+
+        def pooled(p=path, pool=pool):
+            for step in range(10):
+                with pool.reader(p) as reader:
+                    reader.pages[step * 7 % len(reader.pages)].extract_text()
+
+        cases.append(("ingest", f"page_lookup.reopen[{pdf_file.name}]", reopen))
+        cases.append(("ingest", f"page_lookup.pooled[{pdf_file.name}]", pooled))
+    return cases
+
+
+def search_cases(corpora: Dict[str, Dict]) -> List[Case]:
+    """Cases for search_content over each corpus and the whole query set"""
+    cases = []
+    for corpus_name, corpus in corpora.items():
+        for query in SEARCH_QUERIES:
+            cases.append(("search", f"search_content[{corpus_name}:{query}]",
+                          lambda q=query, c=corpus: search_content(q, c)))
+        cases.append(("search", f"search_content[{corpus_name}:all-queries]",
+                      lambda c=corpus: [search_content(q, c) for q in SEARCH_QUERIES]))
+
+        index = SearchIndex.from_categories(corpus)
+        cases.append(("search", f"SearchIndex.build[{corpus_name}]",
+                      lambda c=corpus: SearchIndex.from_categories(c)))
+        cases.append(("search", f"SearchIndex.search[{corpus_name}:all-queries]",
+                      lambda i=index: [i.search(q) for q in SEARCH_QUERIES + STRUCTURED_QUERIES]))
+
+        sharded = ShardedSearchIndex.from_repository(InMemoryRepository(corpus))
+        first_category = next(iter(corpus), None)
+        cases.append(("search", f"ShardedSearchIndex.search[{corpus_name}:all-queries]",
+                      lambda i=sharded: [i.search(q) for q in SEARCH_QUERIES + STRUCTURED_QUERIES]))
+        cases.append(("search", f"ShardedSearchIndex.search[{corpus_name}:one-category]",
+                      lambda i=sharded, c=first_category: [i.search(q, [c]) for q in SEARCH_QUERIES + STRUCTURED_QUERIES]))
+
+        # Warm cache: every lookup after the first run is a hit
+        cache = SearchCache()
+        cases.append(("search", f"cached_search[{corpus_name}:all-queries]",
+                      lambda i=index, cache=cache: [cached_search(i, q, corpus_name, cache=cache)
+                                                    for q in SEARCH_QUERIES + STRUCTURED_QUERIES]))
+    return cases
+
+
+def validation_cases(corpora: Dict[str, Dict]) -> List[Case]:
+    """Cases for building the reference map and validating section removal"""
+    cases = []
+    for corpus_name, corpus in corpora.items():
+        cases.append(("validation", f"ReferenceValidator.build[{corpus_name}]",
+                      lambda c=corpus: ReferenceValidator(c)))
+
+        validator = ReferenceValidator(corpus)
+        sections = [(category, subcategory)
+                    for category, subcategories in corpus.items()
+                    for subcategory in subcategories]
+
+        def validate_all(v=validator, s=sections):
+            for category, subcategory in s:
+                v.validate_section_removal(category, subcategory)
+
+        cases.append(("validation", f"validate_section_removal[{corpus_name}:all-sections]",
+                      validate_all))
+    return cases
+
+
+def rendering_cases(corpora: Dict[str, Dict]) -> List[Case]:
+    """Cases for the HTML generated by display_article"""
+    cases = []
+    for corpus_name, corpus in corpora.items():
+        articles = [article
+                    for subcategories in corpus.values()
+                    for articles in subcategories.values()
+                    for article in articles]
+
+        def render_all(a=articles):
+            for article in a:
+                render_article_html(article)
+
+        cases.append(("render", f"render_article_html[{corpus_name}:all-articles]", render_all))
+    return cases
+
+
+def scaling_cases(sizes: List[int]) -> List[Case]:
+    """Cases for search and validation over synthetic corpora of increasing size"""
+    cases = []
+    for size in sizes:
+        corpus = generate_corpus(size)
+        name = f"synthetic-{size}"
+        cases.append(("scaling", f"search_content[{name}:all-queries]",
+                      lambda c=corpus: [search_content(q, c) for q in SEARCH_QUERIES]))
+        cases.append(("scaling", f"ReferenceValidator.build[{name}]",
+                      lambda c=corpus: ReferenceValidator(c)))
+
+        index = SearchIndex.from_categories(corpus)
+        cases.append(("scaling", f"SearchIndex.search[{name}:all-queries]",
+                      lambda i=index: [i.search(q) for q in SEARCH_QUERIES + STRUCTURED_QUERIES]))
+
+        repository = SqliteRepository(os.path.join(tempfile.mkdtemp(), "corpus.sqlite3"))
+        repository.add_categories(corpus)
+        cases.append(("scaling", f"SqliteRepository.search[{name}:all-queries]",
+                      lambda r=repository: [r.search(q) for q in SEARCH_QUERIES]))
+
+        validator = ReferenceValidator(corpus)
+        category = next(iter(corpus))
+        subcategory = next(iter(corpus[category]))
+        cases.append(("scaling", f"validate_section_removal[{name}:one-section]",
+                      lambda v=validator, c=category, s=subcategory: v.validate_section_removal(c, s)))
+    return cases
+
+
+def memory_results(sizes: List[int]) -> Dict[str, Dict]:
+    """Heap usage of a synthetic corpus and of its reference map, per size"""
+    results = {}
+    for size in sizes:
+        name = f"synthetic-{size}"
+        results[f"memory.corpus[{name}]"] = measure_memory(lambda s=size: generate_corpus(s))
+        corpus = generate_corpus(size)
+        results[f"memory.compact_corpus[{name}]"] = measure_memory(
+            lambda c=corpus: compact_categories(c, TextArena()))
+        results[f"memory.ReferenceValidator[{name}]"] = measure_memory(lambda c=corpus: ReferenceValidator(c))
+    return results
+
+
+def build_cases(groups: List[str], include_pdfs: bool, sizes: List[int] = ()) -> List[Case]:
+    """Collect the benchmark cases for the requested groups"""
+    pdf_files = sorted(ASSETS_DIR.glob("*.pdf")) if include_pdfs else []
+
+    corpora = {'categories': CATEGORIES}
+    if pdf_files and set(groups) & {'search', 'validation', 'render'}:
+        # Build the fully ingested corpus once, outside of any timed section
+        ingested = copy.deepcopy(CATEGORIES)
+        for pdf_file in pdf_files:
+            merge_articles(ingested, process_pdf_to_articles(str(pdf_file)))
+        corpora['ingested'] = ingested
+
+    builders = {
+        'ingest': lambda: ingestion_cases(pdf_files) + page_lookup_cases(pdf_files),
+        'search': lambda: search_cases(corpora),
+        'validation': lambda: validation_cases(corpora),
+        'render': lambda: rendering_cases(corpora),
+        'scaling': lambda: scaling_cases(list(sizes)),
+    }
+
+    cases = []
+    for group in groups:
+        cases.extend(builders[group]())
+    return cases
+
+
+GROUPS = ['ingest', 'search', 'validation', 'render', 'scaling']
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument('--only', choices=GROUPS, action='append',
+                        help="Run only the given group (can be repeated)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case")
+    parser.add_argument('--ingest-repeat', type=int, default=1,
+                        help="Timed runs per PDF ingestion case")
+    parser.add_argument('--no-pdfs', action='store_true',
+                        help="Skip the PDFs in attached_assets (CATEGORIES only)")
+    parser.add_argument('--scale', type=int, action='append', default=[],
+                        help="Synthetic corpus size for the scaling group (can be repeated)")
+    parser.add_argument('--output', help="Where to write the results JSON")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                        help="Baseline results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed slowdown before a case counts as a regression")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Also store this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    groups = args.only or GROUPS
+    sizes = args.scale or ([10_000] if 'scaling' in groups else [])
+
+    results = {}
+    for group, name, func in build_cases(groups, include_pdfs=not args.no_pdfs, sizes=sizes):
+        repeat = args.ingest_repeat if group == 'ingest' else args.repeat
+        stats = time_call(func, repeat=repeat, warmup=0 if group == 'ingest' else 1)
+        stats['group'] = group
+        results[name] = stats
+        print(f"{name:<80} {format_seconds(stats['median']):>10}")
+
+    if 'scaling' in groups:
+        for name, stats in memory_results(sizes).items():
+            stats['group'] = 'memory'
+            results[name] = stats
+            print(f"{name:<80} {stats['retained_bytes'] / 2**20:>8.1f}MB")
+
+    output = args.output or str(RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(results, output)
+    print(f"\nResults saved to {output}")
+
+    exit_code = 0
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.save_baseline:
+        comparison = compare_results(results, load_results(str(baseline_path)), args.threshold)
+        regressions = [entry for entry in comparison if entry['regression']]
+        print(f"\nCompared {len(comparison)} cases against {baseline_path}")
+        for entry in regressions:
+            print(f"REGRESSION {entry['name']}: {format_seconds(entry['baseline'])} -> "
+                  f"{format_seconds(entry['current'])} ({entry['ratio']:.2f}x)")
+        if regressions:
+            exit_code = 1
+        else:
+            print("No regressions detected")
+
+    if args.save_baseline:
+        save_results(results, str(baseline_path))
+        print(f"Baseline saved to {baseline_path}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Memory and throughput of app workers sharing a corpus snapshot (utils.snapshot).
+
+Starts the same number of worker processes twice over a synthetic corpus:
+
+    private   every worker compacts the corpus and builds its own search index
+    mapped    every worker maps the published snapshot
+
+Each worker runs the benchmark queries back to back for the given duration,
+taking the current snapshot before every query as a request would. The
+report has queries/sec, latency percentiles, startup time and memory summed
+over the workers: RSS counts shared pages once per worker, PSS divides them
+among the processes mapping them (what the host really spends), and USS is
+the memory private to the workers. With --republish the builder publishes a
+changed corpus halfway through the mapped run, and the report shows how many
+workers switched to it.
+
+Usage (from the project root, Linux for PSS/USS):
+    python -m benchmarks.snapshot_load
+    python -m benchmarks.snapshot_load --articles 50000 --workers 8 --duration 10 --republish
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.harness import environment_info, format_seconds, save_results
+from benchmarks.run import SEARCH_QUERIES, STRUCTURED_QUERIES
+from benchmarks.synthetic_corpus import generate_corpus
+from utils.article import compact_categories
+from utils.storage import InMemoryRepository
+
+QUERIES = SEARCH_QUERIES + STRUCTURED_QUERIES
+MODES = ('private', 'mapped')
+
+
+def memory_usage() -> Dict[str, Optional[int]]:
+    """RSS, PSS and USS of this process in bytes, from /proc/self/smaps_rollup (None elsewhere)"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return {'rss': None, 'pss': None, 'uss': None}
+    return {'rss': fields.get('Rss'), 'pss': fields.get('Pss'),
+            'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def worker(mode: str, n_articles: int, snapshot_dir: str, ready, start, deadline_at, results) -> None:
+    started = time.perf_counter()
+    if mode == 'mapped':
+        os.environ["CORPUS_SNAPSHOT_DIR"] = snapshot_dir
+        from utils.snapshot import get_current_snapshot
+        current = get_current_snapshot
+    else:
+        from utils.search_index import ShardedSearchIndex
+        repository = InMemoryRepository(compact_categories(generate_corpus(n_articles)), version="synthetic")
+        index = ShardedSearchIndex.from_repository(repository)
+        current = None
+    startup = time.perf_counter() - started
+
+    ready.put(os.getpid())
+    start.wait()
+    latencies, versions, position = [], set(), 0
+    while time.time() < deadline_at.value:
+        query_started = time.perf_counter()
+        if current is not None:
+            snapshot = current()
+            versions.add(snapshot.version)
+            index = snapshot.index
+        index.search(QUERIES[position % len(QUERIES)])
+        latencies.append(time.perf_counter() - query_started)
+        position += 1
+    results.put({'startup': startup, 'latencies': latencies, 'versions': len(versions), **memory_usage()})
+
+
+def _total(reports: List[Dict], key: str) -> Optional[int]:
+    values = [report[key] for report in reports]
+    return None if None in values else sum(values)
+
+
+def run_mode(mode: str, n_articles: int, workers: int, duration: float, snapshot_dir: str,
+             republish: Optional[str] = None) -> Dict:
+    # spawn, not fork: forked workers would share the parent's corpus copy-on-write
+    context = multiprocessing.get_context('spawn')
+    ready, start, results = context.Queue(), context.Event(), context.Queue()
+    deadline_at = context.Value('d', 0.0)
+    processes = [context.Process(target=worker,
+                                 args=(mode, n_articles, snapshot_dir, ready, start, deadline_at, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    # Every worker queries for the same duration, once all of them are up
+    for _ in processes:
+        ready.get()
+    deadline_at.value = time.time() + duration
+    start.set()
+
+    if republish is not None:
+        from utils.snapshot import publish_snapshot
+        time.sleep(duration / 2)
+        publish_snapshot(snapshot_dir, republish)
+
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for report in reports for latency in report['latencies'])
+    return {
+        'mode': mode,
+        'workers': workers,
+        'queries': len(latencies),
+        'queries_per_sec': len(latencies) / duration,
+        'latency_p50': statistics.median(latencies) if latencies else None,
+        'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else None,
+        'startup_max': max(report['startup'] for report in reports),
+        'rss_bytes': _total(reports, 'rss'),
+        'pss_bytes': _total(reports, 'pss'),
+        'uss_bytes': _total(reports, 'uss'),
+        'workers_switched': sum(report['versions'] > 1 for report in reports)
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare private and snapshot-mapped app workers")
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--republish", action="store_true", help="publish a changed corpus during the mapped run")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    from utils.snapshot import write_snapshot
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        repository = InMemoryRepository(compact_categories(generate_corpus(args.articles)), version="synthetic")
+        path = write_snapshot(repository, snapshot_dir)
+        print(f"{args.articles} articles, snapshot {path.stat().st_size / 1e6:.1f} MB")
+        changed = None
+        if args.republish:
+            # Written beforehand: the run measures the switch, not the build
+            changed = write_snapshot(InMemoryRepository(compact_categories(generate_corpus(args.articles, seed=1)),
+                                                        version="changed"), snapshot_dir, publish=False).name
+
+        reports = {}
+        for mode in MODES:
+            reports[mode] = run_mode(mode, args.articles, args.workers, args.duration, snapshot_dir,
+                                     changed if mode == 'mapped' else None)
+
+    for mode, report in reports.items():
+        memory = '  '.join(f"{key.split('_')[0].upper()} {report[key] / 1e6:.0f} MB"
+                           for key in ('rss_bytes', 'pss_bytes', 'uss_bytes') if report[key] is not None)
+        print(f"{mode:<8} {report['workers']} workers: {report['queries_per_sec']:.0f} queries/sec, "
+              f"p50 {format_seconds(report['latency_p50'])}  p95 {format_seconds(report['latency_p95'])}, "
+              f"startup {format_seconds(report['startup_max'])}")
+        print(f"{'':<8} {memory}")
+    if args.republish:
+        print(f"mapped workers that switched to the republished snapshot: "
+              f"{reports['mapped']['workers_switched']}/{args.workers}")
+    if args.output:
+        save_results({'environment': environment_info(), **reports}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Synthetic Greek legal corpus generator for scaling tests.
+
+Produces corpora in the same category -> subcategory -> article shape as
+data/categories.py, with article cross-references ("Άρθρο N", "Π.Κ. N",
+"Ν.X/YYYY") and penalty text, so that search and validation costs can be
+measured at 10k, 100k and 1M articles.
+
+Usage (from the project root):
+    python -m benchmarks.synthetic_corpus --articles 100000 --output /tmp/corpus.json
+"""
+import argparse
+import json
+import random
+from typing import Dict, Iterator, List
+
+CATEGORY_NAMES = [
+    "ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ", "ΚΩΔΙΚΑΣ ΠΟΙΝΙΚΗΣ ΔΙΚΟΝΟΜΙΑΣ", "ΕΙΔΙΚΟΙ ΠΟΙΝΙΚΟΙ ΝΟΜΟΙ",
+    "ΝΑΡΚΩΤΙΚΑ", "ΟΠΛΑ", "ΚΟΚ-ΤΡΟΧΟΝΟΜΙΚΑ", "ΕΝΔΟΟΙΚΟΓΕΝΕΙΑΚΗ ΒΙΑ (Ν.3500/2006)",
+    "ΝΟΜΟΣ ΠΕΡΙ ΚΑΤΟΙΚΙΔΙΩΝ", "ΑΣΤΥΝΟΜΙΚΟ ΠΡΟΣΩΠΙΚΟ", "ΗΛΕΚΤΡΟΝΙΚΟ ΕΓΚΛΗΜΑ",
+]
+
+SUBCATEGORY_NAMES = [
+    "Γενικές Διατάξεις", "Βασικές Διατάξεις", "Εγκλήματα κατά της ζωής",
+    "Εγκλήματα κατά της ιδιοκτησίας", "Εγκλήματα κατά της σωματικής ακεραιότητας",
+    "Κατοχή", "Διακίνηση", "Παραβάσεις Σήμανσης", "Επικίνδυνη Συμπεριφορά",
+    "Πειθαρχικό Δίκαιο", "Ορισμοί", "Διαδικασίες", "Κυρώσεις", "Μεταβατικές Διατάξεις",
+]
+
+TITLE_WORDS = [
+    "Κλοπή", "Ληστεία", "Απάτη", "Πλαστογραφία", "Σωματική βλάβη", "Απειλή",
+    "Οπλοκατοχή", "Κατοχή ναρκωτικών", "Διακίνηση ναρκωτικών", "Εκβίαση",
+    "Υπεξαίρεση", "Φθορά ξένης ιδιοκτησίας", "Παράβαση καθήκοντος", "Δωροδοκία",
+    "Παραβίαση σηματοδότη", "Οδήγηση υπό την επήρεια μέθης", "Κακοποίηση ζώων",
+    "Παράνομη πρόσβαση σε σύστημα", "Ενδοοικογενειακή βία", "Αντίσταση κατά της αρχής",
+]
+
+SUBJECTS = [
+    "Όποιος", "Ο οδηγός που", "Το μέλος της οικογένειας που", "Ο υπάλληλος που",
+    "Ο ιδιοκτήτης ζώου συντροφιάς που", "Όποιος με πρόθεση", "Ο αστυνομικός που",
+]
+
+VERBS = [
+    "αφαιρεί ξένο κινητό πράγμα", "κατέχει ναρκωτικές ουσίες", "φέρει όπλο χωρίς άδεια",
+    "προξενεί σε άλλον σωματική κάκωση", "παραποιεί έγγραφο", "απειλεί άλλον με βία",
+    "εισέρχεται χωρίς δικαίωμα σε πληροφοριακό σύστημα", "δεν σταματά στην πινακίδα STOP",
+    "εγκαταλείπει ζώο συντροφιάς", "παραβαίνει τα καθήκοντα της υπηρεσίας του",
+]
+
+CLAUSES = [
+    "με σκοπό να το ιδιοποιηθεί παράνομα", "κατά παράβαση των διατάξεων του παρόντος",
+    "χωρίς την άδεια της αρμόδιας αρχής", "σε βάρος ανηλίκου", "κατ' επάγγελμα",
+    "με ιδιαίτερη σκληρότητα", "κατά τη διάρκεια της νύχτας", "σε δημόσιο χώρο",
+]
+
+PENALTIES = [
+    "Φυλάκιση μέχρι {n} έτη", "Φυλάκιση τουλάχιστον {n} μηνών", "Κάθειρξη έως {n} έτη",
+    "Κάθειρξη τουλάχιστον {n} ετών", "Ισόβια κάθειρξη", "Χρηματική ποινή",
+    "Διοικητικό πρόστιμο {fine} ευρώ", "Διοικητικό πρόστιμο {fine} ευρώ και αφαίρεση διπλώματος για {days} ημέρες",
+    "Πειθαρχικές κυρώσεις",
+]
+
+LAW_PREFIXES = ["Π.Κ.", "ΚΠΔ", "ΚΟΚ"]
+
+
+def _law_reference(rng: random.Random) -> str:
+    """Return a random law reference in one of the forms used by the validator"""
+    kind = rng.random()
+    if kind < 0.4:
+        return f"Άρθρο {rng.randint(1, 500)}"
+    if kind < 0.75:
+        return f"Π.Κ. {rng.randint(1, 470)}"
+    return f"Ν.{rng.randint(1000, 5200)}/{rng.randint(1950, 2024)}"
+
+
+def _penalty(rng: random.Random) -> str:
+    template = rng.choice(PENALTIES)
+    return template.format(n=rng.randint(1, 10), fine=rng.choice([50, 100, 200, 350, 700, 2000]),
+                           days=rng.choice([10, 30, 60, 90]))
+
+
+def _content(rng: random.Random, penalty: str, references: int) -> str:
+    """Build a few paragraphs of article text with cross-references"""
+    paragraphs = []
+    for number in range(1, rng.randint(2, 4) + 1):
+        sentence = f"{number}. {rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(CLAUSES)}"
+        if references and rng.random() < 0.7:
+            sentence += f", όπως ορίζεται στο {_law_reference(rng)}"
+            references -= 1
+        paragraphs.append(sentence + f", τιμωρείται με {penalty.lower()}.")
+    while references > 0:
+        paragraphs.append(f"Κατά τα λοιπά εφαρμόζονται οι διατάξεις του {_law_reference(rng)}.")
+        references -= 1
+    return "\n".join(paragraphs)
+
+
+def iter_articles(n_articles: int, seed: int = 0, max_references: int = 3) -> Iterator[Dict[str, str]]:
+    """
+    Yield n_articles synthetic articles, each tagged with its category and subcategory.
+    Generation is deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    for index in range(n_articles):
+        category = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+        subcategory = SUBCATEGORY_NAMES[(index // len(CATEGORY_NAMES)) % len(SUBCATEGORY_NAMES)]
+        number = index // (len(CATEGORY_NAMES) * len(SUBCATEGORY_NAMES)) + 1
+        prefix = rng.choice(LAW_PREFIXES)
+        penalty = _penalty(rng)
+
+        yield {
+            'title': f"Άρθρο {number} - {rng.choice(TITLE_WORDS)}",
+            'law': f"{prefix} {number}",
+            'content': _content(rng, penalty, rng.randint(0, max_references)),
+            'penalty': penalty,
+            'category': category,
+            'subcategory': subcategory
+        }
+
+
+def generate_corpus(n_articles: int, seed: int = 0,
+                    max_references: int = 3) -> Dict[str, Dict[str, List[Dict[str, str]]]]:
+    """
+    Generate a nested categories dict with n_articles articles in total.
+    Articles carry only the keys used by data/categories.py.
+    """
+    corpus = {}
+    for article in iter_articles(n_articles, seed, max_references):
+        category = article.pop('category')
+        subcategory = article.pop('subcategory')
+        corpus.setdefault(category, {}).setdefault(subcategory, []).append(article)
+    return corpus
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic Greek legal corpus")
+    parser.add_argument('--articles', type=int, default=10_000, help="Number of articles")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-references', type=int, default=3,
+                        help="Maximum cross-references per article")
+    parser.add_argument('--output', required=True, help="Path of the JSON file to write")
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.articles, args.seed, args.max_references)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, ensure_ascii=False)
+    print(f"Wrote {args.articles} articles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
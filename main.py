@@ -1,19 +1,35 @@
+import time
+
+_script_started = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-from utils.pdf_processor import process_pdf_to_articles, process_multiple_pdfs
-from utils.search import search_content
-from utils.law_updater import LawUpdater, update_categories_from_database
 from data.categories import CATEGORIES
-import json
 from datetime import datetime
 import logging
-import tempfile
 import os
-from pathlib import Path
 import base64
+import html
 from typing import Dict, Optional
-from utils.welcome_messages import get_welcome_message, get_departments, update_department_message, update_default_message
-from utils.validation import ReferenceValidator # Added import
+from utils.welcome_messages import get_welcome_message, update_department_message, update_default_message
+from utils.rendering import render_article_html
+from utils.article import compact_categories
+from utils.storage import create_repository
+from utils.search_index import ShardedSearchIndex
+from utils.query import QuerySyntaxError
+from utils.search_cache import SEARCH_CACHE, cached_search
+from utils.analytics import get_query_log, schedule_prewarm
+from utils.history import effective_date, get_history
+from utils.warmup import CORPUS_VERSION, get_warm_corpus, record, start_warmup
+from utils.snapshot import get_current_snapshot
+from utils.law_updater import SOURCES
+from utils.penalties import OFFENCE_CLASSES, PENALTY_KINDS, PenaltyFacets
+# Imported where they are used, after start_warmup() has loaded them in the
+# background: utils.page_index, utils.editions and utils.related (PDF backends,
+# scipy). The ingestion subsystem (utils.jobs) and the reference
+# validator are only needed by the admin panels.
+
+# Prepare the corpus, indexes and heavy modules while the first page renders
+start_warmup()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,8 +48,7 @@ def get_binary_file_downloader_html(bin_file_path, file_label='File'):
 
 def get_source_url(category: str, subcategory: str = None) -> tuple:
     """Get the official source URL or PDF path for a given category and optional subcategory"""
-    law_updater = LawUpdater()
-    source = law_updater.sources.get(category, "#")
+    source = SOURCES.get(category, "#")
 
     if isinstance(source, dict):
         if 'local' in source:  # Special case for ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ with both local and external sources
@@ -82,22 +97,12 @@ def display_pdf_download(source_path: str, custom_label: Optional[str] = None, s
 
 def display_article(article: Dict[str, str], subcategory: str) -> None:
     """Helper function to display an article with improved formatting"""
-    # Pre-compute penalty section if it exists
-    penalty_html = f"""<div class='article-penalty'>
-        <strong>Ποινή:</strong> {article['penalty']}
-    </div>""" if article.get('penalty') else ""
-
-    # Format the content with proper line breaks
-    content_html = article['content'].replace('\n', '<br>')
+    from utils.editions import article_amendment
+    from utils.related import get_related_articles
 
-    st.markdown(f"""
-    <div class="law-article">
-        <div class="article-title">{article['title']}</div>
-        <strong>Νόμος:</strong> {article['law']}
-        <div class="article-content">{content_html}</div>
-        {penalty_html}
-    </div>
-    """, unsafe_allow_html=True)
+    related = get_related_articles(st.session_state.repository)
+    st.markdown(render_article_html(article, article_amendment(article), related.related(article) if related else None),
+                unsafe_allow_html=True)
 
 
 
@@ -114,6 +119,12 @@ def show_help():
     2. **Αναζήτηση**
        - Πληκτρολογήστε λέξεις-κλειδιά στο πεδίο αναζήτησης
        - Τα αποτελέσματα θα εμφανιστούν αυτόματα
+       - Πολλές λέξεις αναζητούνται όλες μαζί: `κατοχή όπλου`
+       - Ακριβής φράση σε εισαγωγικά: `"σωματική βλάβη"`
+       - Συνδυασμοί με `OR`, `NOT` ή `-`: `κλοπή OR ληστεία`, `ναρκωτικά -χρήση`
+       - Αναζήτηση σε πεδίο: `law:"Π.Κ."`, `category:ΟΠΛΑ`, `penalty:πρόστιμο`
+       - Γίνονται δεκτά και greeklish: `narkotika`, `oplo`, `endooikogeneiaki`
+       - Τα ⚖️ Φίλτρα ποινής στο μενού βρίσκουν άρθρα ανά είδος ποινής, χαρακτηρισμό (π.χ. κακούργημα) ή ύψος προστίμου
 
     3. **Ενημερώσεις**
        - Το σύστημα ενημερώνεται αυτόματα με νέες νομικές διατάξεις
@@ -124,36 +135,139 @@ def show_help():
        - Οι ποινές εμφανίζονται με κόκκινο φόντο
     """)
 
+def get_search_index() -> ShardedSearchIndex:
+    """Return the session search index, rebuilding it when the corpus version changed"""
+    repository = st.session_state.repository
+    version = repository.version
+    if st.session_state.get('search_index_version') != version:
+        warm = get_warm_corpus()
+        snapshot = get_current_snapshot()
+        if snapshot is not None and snapshot.version == version:
+            st.session_state.search_index = snapshot.index
+        elif warm is not None and warm.version == version:
+            st.session_state.search_index = warm.index
+        else:
+            st.session_state.search_index = ShardedSearchIndex.from_repository(repository)
+        st.session_state.search_index_version = version
+        schedule_prewarm(st.session_state.search_index, version)
+    return st.session_state.search_index
+
+def get_penalty_facets() -> PenaltyFacets:
+    """Return the session penalty facets, rebuilding them when the corpus version changed"""
+    repository = st.session_state.repository
+    version = repository.version
+    if st.session_state.get('penalty_facets_version') != version:
+        warm = get_warm_corpus()
+        snapshot = get_current_snapshot()
+        if snapshot is not None and snapshot.version == version:
+            st.session_state.penalty_facets = snapshot.derived('penalties', PenaltyFacets.from_repository)
+        elif warm is not None and warm.version == version:
+            st.session_state.penalty_facets = warm.penalties
+        else:
+            st.session_state.penalty_facets = PenaltyFacets.from_repository(repository)
+        st.session_state.penalty_facets_version = version
+    return st.session_state.penalty_facets
+
+def refresh_search_shards(categories):
+    """Rebuild only the shards of the changed categories after a write"""
+    if 'search_index' not in st.session_state:
+        return
+    repository = st.session_state.repository
+    version = repository.version
+    # The index may be the warm one other sessions share: rebuild shards of a copy
+    st.session_state.search_index = st.session_state.search_index.copy()
+    for category in categories:
+        st.session_state.search_index.rebuild_shard(repository, category)
+    st.session_state.search_index_version = version
+    schedule_prewarm(st.session_state.search_index, version)
+
+def get_validator():
+    """Return the session reference validator, built the first time a section is removed"""
+    from utils.validation import ReferenceValidator
+
+    if 'validator' not in st.session_state:
+        st.session_state.validator = ReferenceValidator(st.session_state.repository)
+    return st.session_state.validator
+
 def process_uploaded_files(uploaded_files):
-    """Process uploaded PDF files and update categories"""
-    temp_dir = Path("temp_pdfs")
-    temp_dir.mkdir(exist_ok=True)
+    """Queue uploaded PDF files as an ingestion job; the worker parses them in the background"""
+    from utils.jobs import ensure_worker, get_job_queue
 
     try:
-        for uploaded_file in uploaded_files:
-            temp_path = temp_dir / uploaded_file.name
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-        all_articles = process_multiple_pdfs(str(temp_dir))
-
-        for category, subcategories in all_articles.items():
-            if category not in st.session_state.cached_categories:
-                st.session_state.cached_categories[category] = {}
-
-            for subcategory, articles in subcategories.items():
-                if subcategory not in st.session_state.cached_categories[category]:
-                    st.session_state.cached_categories[category][subcategory] = []
-                st.session_state.cached_categories[category][subcategory].extend(articles)
-
+        queue = get_job_queue()
+        job_id = queue.submit((uploaded_file.name, uploaded_file) for uploaded_file in uploaded_files)
+        ensure_worker(queue)
+        st.session_state.setdefault('upload_jobs', []).append(job_id)
         return True
     except Exception as e:
-        logger.error(f"Error processing PDFs: {str(e)}")
+        logger.error(f"Error queueing PDFs: {str(e)}")
         return False
-    finally:
-        for file in temp_dir.glob("*.pdf"):
-            file.unlink()
-        temp_dir.rmdir()
+
+
+def record_shared_history(categories, effective):
+    """
+    Record categories of the shared corpus in the history. A session's own
+    in-memory repository is not recorded: no other session sees its writes.
+    """
+    repository = st.session_state.repository
+    # A snapshot repository writes to its source; the snapshot itself lags behind
+    repository = getattr(repository, 'source', repository)
+    if repository is not None and repository.shared:
+        get_history().record_repository(repository, effective, categories)
+
+
+def publish_finished_jobs():
+    """Merge the articles of this session's finished upload jobs into its repository"""
+    if not st.session_state.get('upload_jobs'):
+        return
+    from utils.jobs import get_job_queue
+
+    queue = get_job_queue()
+    for job_id in st.session_state.get('upload_jobs', []):
+        try:
+            all_articles = queue.publish(job_id, st.session_state.repository)
+        except Exception as e:
+            # The job is back to done with its articles; the next rerun tries again
+            logger.error(f"Publishing ingestion job {job_id} failed: {str(e)}")
+            continue
+        if all_articles:
+            refresh_search_shards(all_articles.keys())
+            for category, sections in all_articles.items():
+                # Dated by the uploaded text itself (its ΦΕΚ or amending law), else by the upload
+                text = '\n'.join(article.get('content', '') for articles in sections.values()
+                                  for article in articles)
+                record_shared_history([category], effective_date(text, source=category))
+
+
+JOB_STATUS_LABELS = {
+    'preparing': 'Προετοιμασία',
+    'queued': 'Σε αναμονή',
+    'running': 'Επεξεργασία',
+    'done': 'Ολοκληρώθηκε',
+    'publishing': 'Δημοσίευση',
+    'published': 'Δημοσιεύθηκε',
+    'failed': 'Απέτυχε',
+    'cancelled': 'Ακυρώθηκε',
+}
+
+
+def show_upload_jobs():
+    """Progress and cancel buttons for this session's upload jobs"""
+    from utils.jobs import get_job_queue
+
+    queue = get_job_queue()
+    for job_id in reversed(st.session_state.get('upload_jobs', [])):
+        job = queue.get(job_id)
+        if job is None:
+            continue
+        label = f"{', '.join(job['files'])}: {JOB_STATUS_LABELS.get(job['status'], job['status'])}"
+        if job['message']:
+            label += f" ({job['message']})"
+        st.progress(job['progress'], text=label)
+        if job['status'] in ('queued', 'running') and not job['cancel_requested']:
+            if st.button("Ακύρωση", key=f"cancel_job_{job_id}"):
+                queue.cancel(job_id)
+                st.experimental_rerun()
 
 
 # Set page config
@@ -191,6 +305,38 @@ st.markdown("""
         border-radius: 4px;
         margin-top: 10px;
     }
+    .article-amendment {
+        color: #856404;
+        background-color: #fff3cd;
+        padding: 6px 10px;
+        border-radius: 4px;
+        margin-top: 8px;
+        font-size: 0.9em;
+    }
+    .article-diff {
+        margin-top: 6px;
+        line-height: 1.6;
+    }
+    .related-articles {
+        margin-top: 8px;
+        font-size: 0.9em;
+        color: #1f4e79;
+    }
+    .related-articles ul {
+        margin: 4px 0 0 0;
+    }
+    .related-placement {
+        color: #6c757d;
+    }
+    .article-diff del {
+        color: #721c24;
+        background-color: #f8d7da;
+    }
+    .article-diff ins {
+        color: #155724;
+        background-color: #d4edda;
+        text-decoration: none;
+    }
     .sidebar-welcome {
         background-color: #1f4e79;
         color: white;
@@ -236,13 +382,23 @@ st.markdown("""
 
 def main():
     try:
+        # Workers of a snapshot deployment follow the published snapshot from one rerun to
+        # the next; the snapshot builder records its history
+        snapshot = get_current_snapshot()
+        if snapshot is not None:
+            st.session_state.repository = snapshot.repository
         # Initialize session state for categories if not exists
-        if 'cached_categories' not in st.session_state:
-            st.session_state.cached_categories = CATEGORIES
-
-        # Added validator initialization
-        if 'validator' not in st.session_state:
-            st.session_state.validator = ReferenceValidator(st.session_state.cached_categories)
+        elif 'repository' not in st.session_state:
+            # Every session starts from the same bundled corpus, so they share its version
+            # and the warm index; without a warmup the session compacts the corpus itself
+            warm = get_warm_corpus()
+            if warm is not None:
+                st.session_state.repository = warm.new_repository()
+            else:
+                st.session_state.repository = create_repository(compact_categories(CATEGORIES),
+                                                                version=CORPUS_VERSION)
+
+        publish_finished_jobs()
 
         # Display version badge
         version_date = datetime.now()
@@ -254,6 +410,8 @@ def main():
 
         # Main title
         st.title("🏛️ Νομικός Βοηθός για Αστυνομικούς")
+        # Time to first render of the process, from the start of the script
+        record('first_render', _script_started)
 
         # Sidebar navigation
         st.sidebar.title("Πλοήγηση")
@@ -304,27 +462,41 @@ def main():
 
             if uploaded_files:
                 if st.button("Ενημέρωση Περιεχομένου"):
-                    with st.spinner("Επεξεργασία αρχείων..."):
-                        success = process_uploaded_files(uploaded_files)
-                        if success:
-                            st.success("Το περιεχόμενο ενημερώθηκε επιτυχώς!")
-                        else:
-                            st.error("Παρουσιάστηκε σφάλμα κατά την επεξεργασία των αρχείων.")
+                    success = process_uploaded_files(uploaded_files)
+                    if success:
+                        st.success("Τα αρχεία προστέθηκαν στην ουρά επεξεργασίας.")
+                    else:
+                        st.error("Παρουσιάστηκε σφάλμα κατά την επεξεργασία των αρχείων.")
+
+            if st.session_state.get('upload_jobs'):
+                show_upload_jobs()
+                if st.button("🔄 Ανανέωση κατάστασης"):
+                    st.experimental_rerun()
+
+            cache_stats = SEARCH_CACHE.stats()
+            st.caption(
+                f"Cache αναζήτησης: {cache_stats['entries']}/{cache_stats['max_entries']} εγγραφές, "
+                f"ποσοστό επιτυχίας {cache_stats['hit_rate']:.0%}"
+            )
+            top_queries = get_query_log().top_queries(limit=5)
+            if top_queries:
+                st.caption("Συχνότερες αναζητήσεις: " + ", ".join(
+                    f"{html.escape(top['query'])} ({top['count']})" for top in top_queries))
 
             # Section removal interface
             st.write("Διαγραφή Ενότητας:")
             section_to_remove = st.selectbox(
                 "Επιλέξτε ενότητα προς διαγραφή:",
-                list(st.session_state.cached_categories.keys())
+                st.session_state.repository.get_categories()
             )
             subsection_to_remove = st.selectbox(
                 "Επιλέξτε υποενότητα:",
-                list(st.session_state.cached_categories[section_to_remove].keys()) if section_to_remove else []
+                st.session_state.repository.get_subcategories(section_to_remove) if section_to_remove else []
             )
 
             if section_to_remove and subsection_to_remove:
                 if st.button("Διαγραφή Ενότητας"):
-                    is_safe, references = st.session_state.validator.validate_section_removal(
+                    is_safe, references = get_validator().validate_section_removal(
                         section_to_remove, 
                         subsection_to_remove
                     )
@@ -337,17 +509,17 @@ def main():
                             st.write(f"- {ref}")
 
                         if st.checkbox("Επιβεβαίωση διαγραφής παρά τις αναφορές"):
-                            del st.session_state.cached_categories[section_to_remove][subsection_to_remove]
-                            if not st.session_state.cached_categories[section_to_remove]:
-                                del st.session_state.cached_categories[section_to_remove]
-                            st.session_state.validator.update_references()
+                            st.session_state.repository.remove_section(section_to_remove, subsection_to_remove)
+                            refresh_search_shards([section_to_remove])
+                            record_shared_history([section_to_remove], datetime.now().date())
+                            get_validator().update_references()
                             st.success("Η ενότητα διαγράφηκε επιτυχώς!")
                             st.experimental_rerun()
                     else:
-                        del st.session_state.cached_categories[section_to_remove][subsection_to_remove]
-                        if not st.session_state.cached_categories[section_to_remove]:
-                            del st.session_state.cached_categories[section_to_remove]
-                        st.session_state.validator.update_references()
+                        st.session_state.repository.remove_section(section_to_remove, subsection_to_remove)
+                        refresh_search_shards([section_to_remove])
+                        record_shared_history([section_to_remove], datetime.now().date())
+                        get_validator().update_references()
                         st.success("Η ενότητα διαγράφηκε επιτυχώς!")
                         st.experimental_rerun()
 
@@ -355,14 +527,37 @@ def main():
         # Category selection
         selected_category = st.sidebar.selectbox(
             "Επιλέξτε Κατηγορία:",
-            sorted(list(st.session_state.cached_categories.keys()))
+            sorted(st.session_state.repository.get_categories())
+        )
+
+        # Point-in-time view: the wording that applied on the date of an incident
+        as_of_date = st.sidebar.date_input(
+            "📅 Ισχύς κατά την ημερομηνία:",
+            value=None,
+            max_value=datetime.now().date(),
+            format="DD/MM/YYYY"
         )
+        browse_repository = get_history().as_of(as_of_date) if as_of_date else st.session_state.repository
+
+        # Structured penalty filters
+        with st.sidebar.expander("⚖️ Φίλτρα ποινής"):
+            penalty_kinds = st.multiselect("Είδος ποινής:", PENALTY_KINDS)
+            offence_class = st.selectbox("Χαρακτηρισμός:", OFFENCE_CLASSES,
+                                         format_func=lambda value: value or "Όλοι")
+            min_fine = st.number_input("Πρόστιμο τουλάχιστον (€):", min_value=0, value=0, step=100)
+            penalty_in_category = st.checkbox("Μόνο στην επιλεγμένη κατηγορία")
 
         # Search with loading state
         search_query = st.text_input(
             "🔍 Αναζήτηση νομικών διατάξεων...",
             placeholder="π.χ. κατοικίδια, ποινές, πρόστιμα..."
         )
+        search_scope = st.radio(
+            "Εύρος αναζήτησης:",
+            ["Παντού", "Στην επιλεγμένη κατηγορία"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
 
         if selected_category:
             with st.spinner("Φόρτωση περιεχομένου..."):
@@ -490,8 +685,11 @@ def main():
 
 
                 # Display category content
-                if selected_category in st.session_state.cached_categories:
-                    for subcategory, articles in st.session_state.cached_categories[selected_category].items():
+                if as_of_date:
+                    st.info(f"Εμφανίζεται το κείμενο που ίσχυε στις {as_of_date.strftime('%d/%m/%Y')}.")
+                if selected_category in browse_repository.get_categories():
+                    for subcategory in browse_repository.get_subcategories(selected_category):
+                        articles = browse_repository.get_articles(selected_category, subcategory)
                         with st.expander(f"📚 {subcategory}", expanded=True):
                             source_path, is_local, external_url = get_source_url(selected_category, subcategory)
 
@@ -512,25 +710,67 @@ def main():
         if search_query:
             with st.spinner("Αναζήτηση..."):
                 try:
-                    results = search_content(search_query, st.session_state.cached_categories)
+                    search_index = get_search_index()
+                    version = st.session_state.search_index_version
+                    search_started = time.perf_counter()
+                    scope = selected_category if search_scope == "Στην επιλεγμένη κατηγορία" else None
+                    if scope:
+                        results = cached_search(search_index, search_query, version, categories=[scope])
+                    else:
+                        results = cached_search(search_index, search_query, version)
+                    # Streamlit reruns the script on every widget change, log each search once
+                    if st.session_state.get('last_logged_search') != (search_query, scope):
+                        get_query_log().record(search_query, time.perf_counter() - search_started, len(results), scope)
+                        st.session_state.last_logged_search = (search_query, scope)
+                    from utils.page_index import cached_page_search, get_page_index
+                    page_hits = cached_page_search(get_page_index(), search_query)
                     if results:
                         st.subheader("🔍 Αποτελέσματα Αναζήτησης")
                         for result in results:
+                            also_in = "".join(
+                                f"<br><strong>Επίσης σε:</strong> {other['category']} / {other['subcategory']}"
+                                for other in result.get('also_in', [])
+                            )
                             with st.expander(f"📑 {result['title']}", expanded=True):
                                 st.markdown(f"""
                                 <div class="law-article">
                                     <strong>Κατηγορία:</strong> {result['category']}
                                     <br>
                                     <strong>Υποκατηγορία:</strong> {result['subcategory']}
+                                    {also_in}
                                     <div class="article-content">{result['content']}</div>
                                 </div>
                                 """, unsafe_allow_html=True)
-                    else:
+                    if page_hits:
+                        st.subheader("📄 Αποτελέσματα σε Σελίδες Εγγράφων")
+                        for hit in page_hits:
+                            st.markdown(f"""
+                            <div class="law-article">
+                                <strong>{html.escape(', '.join([hit['document']] + hit['also_in']))}</strong> — σελ. {hit['page']}
+                                <div class="article-content">{html.escape(hit['snippet'])}</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                    if not results and not page_hits:
                         st.info("Δεν βρέθηκαν αποτελέσματα για την αναζήτησή σας.")
+                except QuerySyntaxError as e:
+                    st.warning(f"Μη έγκυρη αναζήτηση: {str(e)}")
                 except Exception as e:
                     logger.error(f"Search error: {str(e)}")
                     st.error("Παρουσιάστηκε σφάλμα κατά την αναζήτηση. Παρακαλώ δοκιμάστε ξανά.")
 
+        # Penalty filter results
+        if penalty_kinds or offence_class or min_fine:
+            matches = get_penalty_facets().select(
+                kinds=penalty_kinds,
+                offence_class=offence_class or None,
+                fine_at_least=min_fine or None,
+                category=selected_category if penalty_in_category else None
+            )
+            st.subheader(f"⚖️ Άρθρα με βάση την ποινή ({len(matches)})")
+            for category, subcategory, article in matches:
+                with st.expander(f"📑 {article['title']} — {category}"):
+                    display_article(article, subcategory)
+
         # Feedback section
         st.markdown("---")
         with st.expander("📝 Αναφορά Προβλήματος"):
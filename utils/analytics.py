@@ -0,0 +1,227 @@
+"""
+Query analytics: what officers search for, and the hot queries served warm.
+
+record() appends (time, query, latency, result count, category) to a bounded
+ring buffer. It takes no lock: deque.append is atomic, and when the buffer is
+full the oldest event is overwritten. A background thread drains the buffer
+every FLUSH_INTERVAL seconds and writes each batch to a SQLite log in one
+transaction. The log stores every distinct query once, grouping them by
+their cache key (normalize_query). Each event is then a row of small integers.
+
+After each corpus rebuild, schedule_prewarm() runs the PREWARM_QUERIES most
+frequent queries of the last TOP_QUERIES_DAYS days against the new index,
+with their page hits, in a background thread. Their results and snippets
+are in the search cache before the first officer asks for them.
+
+Usage (from the project root):
+    python -m utils.analytics                 # the most frequent queries of the last days
+    python -m utils.analytics --days 1 --limit 50
+"""
+import argparse
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from utils.query import QuerySyntaxError
+from utils.search_cache import cached_search, normalize_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_DB_PATH = "data/analytics.sqlite3"
+RING_CAPACITY = 8192
+FLUSH_INTERVAL = 5.0
+RETENTION_DAYS = 180
+TOP_QUERIES_DAYS = 30
+PREWARM_QUERIES = 50
+
+# (unix time, query, latency in seconds, result count, category or '' for all)
+QueryEvent = Tuple[float, str, float, int, str]
+
+
+class QueryLog:
+    """Ring buffer of search events, flushed in batches to a SQLite log"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS queries (
+            id INTEGER PRIMARY KEY,
+            normalized TEXT NOT NULL UNIQUE,
+            query TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS query_events (
+            at INTEGER NOT NULL,
+            query_id INTEGER NOT NULL REFERENCES queries(id),
+            category TEXT NOT NULL,
+            latency_us INTEGER NOT NULL,
+            results INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_query_events_at ON query_events(at);
+    """
+
+    def __init__(self, db_path: str = DEFAULT_ANALYTICS_DB_PATH, capacity: int = RING_CAPACITY,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._events: Deque[QueryEvent] = deque(maxlen=capacity)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._flusher_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, query: str, latency: float, results: int, category: Optional[str] = None) -> None:
+        """Log one search; never blocks and never raises on the request path"""
+        self._events.append((time.time(), query, latency, results, category or ''))
+        if self._flusher is None:
+            self._start_flusher()
+
+    def _start_flusher(self) -> None:
+        with self._flusher_lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="query-log-flush", daemon=True)
+                self._flusher.start()
+                # The flusher is a daemon thread: write what is left when the process exits
+                atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Query log flush failed: {str(e)}")
+
+    def flush(self) -> int:
+        """Write the buffered events to the log; returns how many were written"""
+        batch: List[QueryEvent] = []
+        # popleft is atomic too: events recorded meanwhile wait for the next flush
+        try:
+            while True:
+                batch.append(self._events.popleft())
+        except IndexError:
+            pass
+        if not batch:
+            return 0
+
+        with self._write_lock, self._connection() as conn:
+            normalized = {event[1]: normalize_query(event[1]) for event in batch}
+            conn.executemany("INSERT OR IGNORE INTO queries (normalized, query) VALUES (?, ?)",
+                             [(key, query) for query, key in normalized.items()])
+            ids = {}
+            for query, key in normalized.items():
+                ids[query] = conn.execute("SELECT id FROM queries WHERE normalized = ?", (key,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO query_events (at, query_id, category, latency_us, results) VALUES (?, ?, ?, ?, ?)",
+                [(int(at), ids[query], category, int(latency * 1e6), results)
+                 for at, query, latency, results, category in batch])
+            conn.execute("DELETE FROM query_events WHERE at < ?", (int(time.time()) - RETENTION_DAYS * 86400,))
+        return len(batch)
+
+    def top_queries(self, limit: int = PREWARM_QUERIES, days: float = TOP_QUERIES_DAYS) -> List[Dict]:
+        """The most frequent (query, category) pairs since days ago, most frequent first"""
+        rows = self._connection().execute("""
+            SELECT q.query, e.category, COUNT(*) AS count, AVG(e.latency_us) / 1000.0 AS latency_ms,
+                   AVG(e.results) AS results
+            FROM query_events e JOIN queries q ON q.id = e.query_id
+            WHERE e.at >= ?
+            GROUP BY e.query_id, e.category
+            ORDER BY count DESC, q.query
+            LIMIT ?
+        """, (int(time.time() - days * 86400), limit))
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        row = self._connection().execute(
+            "SELECT (SELECT COUNT(*) FROM queries) AS queries, COUNT(*) AS events FROM query_events").fetchone()
+        return {'queries': row['queries'], 'events': row['events'], 'buffered': len(self._events)}
+
+
+_query_log: Optional[QueryLog] = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log() -> QueryLog:
+    """Return the process-wide query log; ANALYTICS_DB_PATH overrides its location"""
+    global _query_log
+    with _query_log_lock:
+        if _query_log is None:
+            _query_log = QueryLog(os.environ.get("ANALYTICS_DB_PATH", DEFAULT_ANALYTICS_DB_PATH))
+        return _query_log
+
+
+def prewarm(index, version: str, limit: int = PREWARM_QUERIES, pages: bool = True) -> int:
+    """Run the top queries against index (and the page index) through the search cache; returns how many ran"""
+    from utils.page_index import cached_page_search, get_page_index
+
+    log = get_query_log()
+    log.flush()
+    page_index = get_page_index() if pages else None
+    warmed = 0
+    for top in log.top_queries(limit):
+        try:
+            cached_search(index, top['query'], version, categories=[top['category']] if top['category'] else None)
+            if page_index is not None:
+                cached_page_search(page_index, top['query'])
+            warmed += 1
+        except QuerySyntaxError:
+            continue
+    return warmed
+
+
+_prewarmed: Set[str] = set()
+_prewarm_lock = threading.Lock()
+
+
+def schedule_prewarm(index, version: str, pages: bool = True) -> None:
+    """Prewarm the cache for a freshly built index in the background, once per corpus version"""
+    with _prewarm_lock:
+        if version in _prewarmed:
+            return
+        _prewarmed.add(version)
+
+    def run():
+        started = time.perf_counter()
+        try:
+            warmed = prewarm(index, version, pages=pages)
+            logger.info(f"Prewarmed {warmed} hot queries for version {version} "
+                        f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            logger.error(f"Prewarming version {version} failed: {str(e)}")
+
+    threading.Thread(target=run, name="query-prewarm", daemon=True).start()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show the most frequent search queries")
+    parser.add_argument("--days", type=float, default=TOP_QUERIES_DAYS)
+    parser.add_argument("--limit", type=int, default=PREWARM_QUERIES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log = get_query_log()
+    for top in log.top_queries(args.limit, args.days):
+        print(f"{top['count']:>7}  {top['latency_ms']:>8.1f} ms  {top['results']:>7.1f} hits  "
+              f"{top['category'] or '*':<30} {top['query']}")
+    stats = log.stats()
+    print(f"{stats['events']} searches, {stats['queries']} distinct queries")
+
+
+if __name__ == "__main__":
+    main()
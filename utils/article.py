@@ -0,0 +1,164 @@
+import hashlib
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ARTICLE_FIELDS = ('title', 'law', 'content', 'penalty', 'category', 'subcategory')
+
+# The fields that make up an article's content, independent of where it is filed
+CONTENT_FIELDS = ('title', 'law', 'content', 'penalty')
+
+
+def article_digest(article: Mapping) -> str:
+    """Content hash of an article; the same article filed under several categories has one digest"""
+    digest = hashlib.sha1()
+    for field in CONTENT_FIELDS:
+        digest.update((article.get(field, '') or '').encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class TextArena:
+    """
+    Append-only, content-addressed text store that keeps article contents in a
+    few large shared strings instead of one string object per article. Adding
+    a text that is already stored returns the existing location.
+
+    Nothing is ever freed: a text stays in the arena as long as the arena
+    lives, even after every article holding it is gone. Corpora that are
+    rebuilt or replaced should get an arena of their own
+    (compact_categories(categories, TextArena())) and drop it with them.
+    Adding and sealing are serialized by a lock; reading a sealed chunk is not.
+    """
+
+    def __init__(self, chunk_size: int = 1 << 20):
+        self.chunk_size = chunk_size
+        self._chunks: List[str] = []
+        self._pending: List[str] = []
+        self._pending_length = 0
+        self._locations: Dict[bytes, Tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, text: str) -> Tuple[int, int, int]:
+        """Store text and return its (chunk, start, end) location"""
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            location = self._locations.get(key)
+            if location is not None:
+                return location
+            if self._pending_length and self._pending_length + len(text) > self.chunk_size:
+                self._seal()
+            start = self._pending_length
+            self._pending.append(text)
+            self._pending_length += len(text)
+            location = self._locations[key] = (len(self._chunks), start, self._pending_length)
+            return location
+
+    def get(self, chunk: int, start: int, end: int) -> str:
+        """Return the text stored at the given location"""
+        if chunk >= len(self._chunks):
+            with self._lock:
+                if chunk == len(self._chunks):
+                    self._seal()
+        return self._chunks[chunk][start:end]
+
+    def _seal(self) -> None:
+        """Join the pending pieces into one immutable chunk; the caller holds the lock"""
+        if self._pending:
+            self._chunks.append(''.join(self._pending))
+            self._pending = []
+            self._pending_length = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(chunk) for chunk in self._chunks) + self._pending_length
+
+
+# Shared by the bundled corpus and uploads for the life of the process (see TextArena)
+DEFAULT_ARENA = TextArena()
+
+
+def _intern(value: Optional[str]) -> str:
+    return sys.intern(value) if value else ''
+
+
+class Article(Mapping):
+    """
+    Compact, read-only article record.
+
+    The short fields are interned so repeated values are stored once, and the
+    content lives in a shared TextArena, so an article filed under several
+    categories costs one slotted record per placement but its text is stored once. The class behaves
+    like the plain article dicts used elsewhere (article['title'],
+    article.get('penalty'), dict(article)).
+    """
+
+    __slots__ = ('title', 'law', 'penalty', 'category', 'subcategory',
+                 '_arena', '_chunk', '_start', '_end')
+
+    def __init__(self, title: str, law: str, content: str, penalty: str = '',
+                 category: str = '', subcategory: str = '',
+                 arena: Optional[TextArena] = None):
+        self.title = _intern(title)
+        self.law = _intern(law)
+        self.penalty = _intern(penalty)
+        self.category = _intern(category)
+        self.subcategory = _intern(subcategory)
+        self._arena = arena if arena is not None else DEFAULT_ARENA
+        self._chunk, self._start, self._end = self._arena.add(content)
+
+    @classmethod
+    def from_dict(cls, data: Mapping, category: str = '', subcategory: str = '',
+                  arena: Optional[TextArena] = None) -> 'Article':
+        """Build an Article from an article dict"""
+        if isinstance(data, Article) and arena is None:
+            return data
+        return cls(
+            title=data['title'],
+            law=data.get('law', ''),
+            content=data.get('content', ''),
+            penalty=data.get('penalty', ''),
+            category=data.get('category') or category,
+            subcategory=data.get('subcategory') or subcategory,
+            arena=arena
+        )
+
+    @property
+    def content(self) -> str:
+        return self._arena.get(self._chunk, self._start, self._end)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Return a plain dict copy, e.g. for JSON serialization"""
+        return {field: self[field] for field in ARTICLE_FIELDS}
+
+    def __getitem__(self, key: str) -> str:
+        if key not in ARTICLE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(ARTICLE_FIELDS)
+
+    def __len__(self) -> int:
+        return len(ARTICLE_FIELDS)
+
+    def __reduce__(self):
+        return (Article.from_dict, (self.to_dict(),))
+
+    def __repr__(self) -> str:
+        return f"Article(title={self.title!r}, law={self.law!r})"
+
+
+def compact_categories(categories: Dict, arena: Optional[TextArena] = None) -> Dict[str, Dict[str, List[Article]]]:
+    """
+    Convert a nested categories dict of article dicts into Article records.
+    The input dict is left untouched.
+    """
+    return {
+        category: {
+            subcategory: [Article.from_dict(article, category, subcategory, arena) for article in articles]
+            for subcategory, articles in subcategories.items()
+        }
+        for category, subcategories in categories.items()
+    }
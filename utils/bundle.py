@@ -0,0 +1,209 @@
+"""
+Offline field bundle: the corpus compiled into static, content-addressed shards
+that a browser or mobile client can download once and search without a network.
+
+A bundle directory holds manifest.json plus, per top-level category, two gzipped
+JSON files named after the sha256 of their content:
+
+    articles  [{"subcategory", "title", "law", "content", "penalty", "also_in"}, ...]
+    index     {"fields": {field: {"tokens": [...], "postings": [[...], ...]}}}
+
+Tokens are sorted, so prefix lookups are a binary search. Postings are the
+document positions within the shard's articles list, delta-encoded. An article
+filed under several subcategories is stored once, with the other subcategories
+in also_in. Text is
+normalized as in utils.search (lowercase, then strip combining marks after NFD)
+and split on \\w+, which clients reproduce with String.normalize('NFD').
+
+Unchanged shards keep their file names between exports, so clients only fetch
+the files they do not have yet (see missing_files).
+
+Usage (from the project root):
+    python -m utils.bundle --output dist/bundle
+    python -m utils.bundle --output dist/bundle --pdf-dir attached_assets --prune
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.query import FIELDS, GREEKLISH_PREFIX
+from utils.search_index import SearchIndex, ShardedSearchIndex
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def _delta_encode(values: List[int]) -> List[int]:
+    return [value - previous for previous, value in zip([0] + values[:-1], values)]
+
+
+def _delta_decode(deltas: Iterable[int]) -> List[int]:
+    values, total = [], 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+
+def _write_content_addressed(output_dir: Path, kind: str, data: object) -> Dict[str, object]:
+    """Write gzipped JSON under its content hash unless it already exists"""
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    digest = hashlib.sha256(raw).hexdigest()
+    name = f"{kind}-{digest[:20]}.json.gz"
+    path = output_dir / name
+    if not path.exists():
+        # mtime=0 keeps the gzip bytes identical across exports of the same content
+        compressed = gzip.compress(raw, compresslevel=9, mtime=0)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(compressed)
+        os.replace(tmp_path, path)
+    return {'file': name, 'sha256': digest, 'bytes': path.stat().st_size, 'raw_bytes': len(raw)}
+
+
+def build_shard(category: str, articles: Iterable) -> Dict[str, object]:
+    """The articles and index payloads of one category"""
+    index = SearchIndex.from_articles((category, subcategory, article) for _, subcategory, article in articles)
+    # Clients fold text as documented in the manifest, they cannot look up Greeklish keys
+    postings = {field: {token: doc_ids for token, doc_ids in field_postings.items()
+                        if not token.startswith(GREEKLISH_PREFIX)}
+                for field, field_postings in index.export_postings().items()}
+    return {
+        'articles': [{
+            'subcategory': subcategory,
+            'title': article['title'],
+            'law': article.get('law', '') or '',
+            'content': article.get('content', '') or '',
+            'penalty': article.get('penalty', '') or '',
+            'also_in': [other for _, other in index.placements.get(doc_id, [])]
+        } for doc_id, (_, subcategory, article) in enumerate(index.documents)],
+        'index': {'fields': {
+            field: {
+                'tokens': list(postings[field]),
+                'postings': [_delta_encode(doc_ids) for doc_ids in postings[field].values()]
+            } for field in FIELDS
+        }}
+    }
+
+
+def export_bundle(repository, output_dir: str, prune: bool = False) -> Dict[str, object]:
+    """
+    Compile every category of the repository into output_dir and return the
+    manifest. The manifest is replaced last, so a client never sees a manifest
+    that points at files which are not written yet.
+    """
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+
+    shards = []
+    for category in repository.get_categories():
+        shard = build_shard(category, repository.iter_category(category))
+        shards.append({
+            'category': category,
+            'articles': len(shard['articles']),
+            'files': {
+                'articles': _write_content_addressed(output, 'articles', shard['articles']),
+                'index': _write_content_addressed(output, 'index', shard['index'])
+            }
+        })
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'corpus_version': repository.version,
+        'normalization': 'lowercase,nfd,strip-marks',
+        'token_pattern': r'\w+',
+        'fields': list(FIELDS),
+        'shards': shards
+    }
+    manifest_path = output / MANIFEST_NAME
+    tmp_path = output / (MANIFEST_NAME + '.tmp')
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp_path, manifest_path)
+
+    if prune:
+        referenced = bundle_files(manifest)
+        for path in output.glob("*.json.gz"):
+            if path.name not in referenced:
+                path.unlink()
+                logger.info(f"Pruned {path.name}")
+
+    total = sum(entry['bytes'] for shard in shards for entry in shard['files'].values())
+    logger.info(f"Exported {len(shards)} shards to {output_dir} ({total} bytes)")
+    return manifest
+
+
+def load_manifest(bundle_dir: str) -> Dict[str, object]:
+    with open(Path(bundle_dir) / MANIFEST_NAME, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def bundle_files(manifest: Dict[str, object]) -> Set[str]:
+    return {entry['file'] for shard in manifest['shards'] for entry in shard['files'].values()}
+
+
+def missing_files(manifest: Dict[str, object], local_dir: str) -> List[str]:
+    """Files of a (new) manifest that a client holding local_dir still has to download"""
+    local = Path(local_dir)
+    return sorted(name for name in bundle_files(manifest) if not (local / name).exists())
+
+
+def _read_gzip_json(path: Path) -> object:
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def load_shard(bundle_dir: str, shard: Dict[str, object]) -> SearchIndex:
+    """Reference reader: rebuild a SearchIndex from one shard of a bundle"""
+    directory = Path(bundle_dir)
+    articles = _read_gzip_json(directory / shard['files']['articles']['file'])
+    index_data = _read_gzip_json(directory / shard['files']['index']['file'])
+    category = shard['category']
+    documents = [(category, article['subcategory'], article) for article in articles]
+    placements = {doc_id: [(category, other) for other in article.get('also_in', [])]
+                  for doc_id, article in enumerate(articles)}
+    postings = {
+        field: dict(zip(data['tokens'], (_delta_decode(deltas) for deltas in data['postings'])))
+        for field, data in index_data['fields'].items()
+    }
+    return SearchIndex.from_postings(documents, postings, placements)
+
+
+def load_bundle(bundle_dir: str, categories: Optional[Iterable[str]] = None) -> ShardedSearchIndex:
+    """Load a bundle (or some of its categories) as a ShardedSearchIndex"""
+    wanted = set(categories) if categories is not None else None
+    index = ShardedSearchIndex()
+    for shard in load_manifest(bundle_dir)['shards']:
+        if wanted is None or shard['category'] in wanted:
+            index.shards[shard['category']] = load_shard(bundle_dir, shard)
+    return index
+
+
+def main() -> None:
+    from data.categories import CATEGORIES
+    from utils.article import compact_categories
+    from utils.pdf_processor import process_multiple_pdfs
+    from utils.storage import create_repository
+
+    parser = argparse.ArgumentParser(description="Export the corpus as an offline search bundle")
+    parser.add_argument("--output", default="dist/bundle")
+    parser.add_argument("--pdf-dir", help="also ingest the PDFs of this directory")
+    parser.add_argument("--prune", action="store_true", help="delete shard files the new manifest does not use")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    repository = create_repository(compact_categories(CATEGORIES))
+    if args.pdf_dir:
+        repository.add_categories(process_multiple_pdfs(args.pdf_dir))
+    manifest = export_bundle(repository, args.output, prune=args.prune)
+    total = sum(entry['bytes'] for shard in manifest['shards'] for entry in shard['files'].values())
+    print(f"{len(manifest['shards'])} shards, {total / 1024:.1f} KiB in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Content-based category classification of ingested PDFs.
+
+The classifier holds one TF-IDF centroid per category and per subcategory of
+a reference corpus (the configured corpus by default). A batch of documents
+is vectorized over the corpus vocabulary and compared with every category
+centroid in one sparse matrix product; the articles of a document are then
+compared with the subcategory centroids of its category the same way.
+A document is only placed when its best category is both close
+(MIN_CATEGORY_SCORE) and clearly ahead of the runner-up (MIN_CATEGORY_MARGIN);
+otherwise it keeps the '' category, where an administrator sees it, and a
+filename rule always takes precedence.
+
+Usage (from the project root):
+    python -m utils.classifier attached_assets
+"""
+import argparse
+import logging
+import threading
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from utils.related import idf_weights, normalize_rows, related_available, term_counts, tfidf_rows
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # Classification is skipped without them
+    np = None
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+# Calibrated on attached_assets against the bundled corpus: legal vocabulary is so widely
+# shared that the best category agreed with the filename rule for only 2 of the 10 files
+# that have one, and wrong best categories scored up to 0.56 with leads of up to 0.28 over
+# the runner-up. Below either bound a document is left in '' rather than misfiled.
+MIN_CATEGORY_SCORE = 0.6
+MIN_CATEGORY_MARGIN = 0.3
+# Cosine similarity below which an article of a placed document keeps the default subcategory
+MIN_SUBCATEGORY_SCORE = 0.05
+# Greek inflects heavily ("όπλο", "όπλων", "οπλοφορία"): terms are compared by their first characters
+STEM_LENGTH = 5
+
+
+def _article_text(article: Mapping[str, str]) -> str:
+    return '\n'.join(article.get(field, '') or '' for field in ('title', 'law', 'content', 'penalty'))
+
+
+class CategoryClassifier:
+    def __init__(self, articles: Sequence[Tuple[str, str, Mapping[str, str]]]):
+        # Category and subcategory names are part of the text they stand for
+        texts = [f"{category}\n{subcategory}\n{_article_text(article)}" for category, subcategory, article in articles]
+        self.vocabulary: Dict[str, int] = {}
+        counts = term_counts(texts, self.vocabulary, stem=STEM_LENGTH)
+        # Unlike related articles, a term of a single article still points to its category
+        self.idf = idf_weights(counts, min_document_frequency=1)
+        rows = tfidf_rows(counts, self.idf)
+
+        # Each name maps to its position, in order of first appearance
+        category_positions: Dict[str, int] = {}
+        subcategory_positions: Dict[Tuple[str, str], int] = {}
+        category_of_row, subcategory_of_row = [], []
+        for category, subcategory, _ in articles:
+            category_of_row.append(category_positions.setdefault(category, len(category_positions)))
+            subcategory_of_row.append(subcategory_positions.setdefault((category, subcategory),
+                                                                       len(subcategory_positions)))
+        self.categories: List[str] = list(category_positions)
+        self.subcategories: List[Tuple[str, str]] = list(subcategory_positions)
+        self.category_centroids = self._centroids(rows, category_of_row, len(self.categories))
+        self.subcategory_centroids = self._centroids(rows, subcategory_of_row, len(self.subcategories))
+
+    @classmethod
+    def from_repository(cls, repository) -> 'CategoryClassifier':
+        return cls(list(repository.iter_articles()))
+
+    @staticmethod
+    def _centroids(rows, labels: List[int], count: int):
+        """L2-normalized sum of the rows of each label, as a CSR matrix with one row per label"""
+        membership = sparse.csr_matrix((np.ones(len(labels), dtype=np.float32),
+                                        (np.asarray(labels, dtype=np.int32), np.arange(len(labels)))),
+                                       shape=(count, rows.shape[0]))
+        return normalize_rows(membership @ rows)
+
+    def vectorize(self, texts: List[str]):
+        """TF-IDF rows of texts over the reference vocabulary"""
+        return tfidf_rows(term_counts(texts, self.vocabulary, extend=False, stem=STEM_LENGTH), self.idf)
+
+    def classify(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """
+        (category, score) of each text; '' when the best category is below
+        MIN_CATEGORY_SCORE or leads the runner-up by less than MIN_CATEGORY_MARGIN
+        """
+        if not texts or not self.categories:
+            return [('', 0.0)] * len(texts)
+        scores = (self.vectorize(texts) @ self.category_centroids.T).toarray()
+        best = scores.argmax(axis=1)
+        ranked = -np.sort(-scores, axis=1)
+        runner_up = ranked[:, 1] if len(self.categories) > 1 else np.zeros(len(texts))
+        return [(self.categories[column]
+                 if scores[row, column] >= MIN_CATEGORY_SCORE
+                 and scores[row, column] - runner_up[row] >= MIN_CATEGORY_MARGIN else '',
+                 float(scores[row, column])) for row, column in enumerate(best)]
+
+    def classify_subcategories(self, category: str, texts: List[str]) -> List[Optional[str]]:
+        """The closest subcategory of category for each text, or None below MIN_SUBCATEGORY_SCORE"""
+        candidates = [position for position, (owner, _) in enumerate(self.subcategories) if owner == category]
+        if not texts or not candidates:
+            return [None] * len(texts)
+        scores = (self.vectorize(texts) @ self.subcategory_centroids[candidates].T).toarray()
+        best = scores.argmax(axis=1)
+        return [self.subcategories[candidates[column]][1] if scores[row, column] >= MIN_SUBCATEGORY_SCORE else None
+                for row, column in enumerate(best)]
+
+    def classify_articles(self, category: str, articles: List[Mapping[str, str]]) -> List[Optional[str]]:
+        return self.classify_subcategories(category, [_article_text(article) for article in articles])
+
+
+_classifier: Optional[CategoryClassifier] = None
+_classifier_version: Optional[str] = None
+_corpus = None
+_classifier_lock = threading.Lock()
+
+
+def get_category_classifier(repository=None) -> Optional[CategoryClassifier]:
+    """
+    Return a classifier over the articles of repository, rebuilt when its
+    version changes, or None without numpy/scipy. The default repository is the
+    configured corpus (see create_repository), so the ingestion worker learns
+    from the shared SQLite corpus, published uploads included.
+    """
+    global _classifier, _classifier_version, _corpus
+    if not related_available():
+        return None
+    with _classifier_lock:
+        if repository is None:
+            if _corpus is None:
+                from data.categories import CATEGORIES
+                from utils.storage import create_repository
+                _corpus = create_repository(CATEGORIES, version="curated")
+            repository = _corpus
+        if _classifier is None or _classifier_version != repository.version:
+            _classifier_version = repository.version
+            # Articles nothing could place teach nothing about the categories
+            _classifier = CategoryClassifier([(category, subcategory, article)
+                                              for category, subcategory, article in repository.iter_articles()
+                                              if category])
+            logger.info(f"Category classifier built over {len(_classifier.subcategories)} subcategories")
+        return _classifier
+
+
+def main() -> None:
+    from pathlib import Path
+
+    from utils.pdf_processor import get_category_from_filename, process_pdf
+
+    parser = argparse.ArgumentParser(description="Classify the PDFs of a directory by content")
+    parser.add_argument("pdf_dir")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    classifier = get_category_classifier()
+    if classifier is None:
+        raise SystemExit("numpy and scipy are required: pip install .[related]")
+    files = sorted(Path(args.pdf_dir).glob("*.pdf"))
+    texts = [process_pdf(str(path)) for path in files]
+    for path, (category, score) in zip(files, classifier.classify(texts)):
+        rule = get_category_from_filename(path.name)[0]
+        print(f"{score:.2f}  {category or '-':<40} {('rule: ' + rule) if rule else '':<30} {path.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Article-level comparison between two editions of the Penal Code.
+
+Both PDFs are split into articles by their "Άρθρο N" headers and aligned by
+article number. An article whose normalized text hashes the same in both
+editions is unchanged and never diffed; the others get a word-level diff,
+computed only inside the paragraphs that differ. The result is cached as JSON
+under data/edition_diffs/, keyed by the sha256 of both files, so it is computed
+once per pair of files rather than on every run.
+
+Usage (from the project root):
+    python -m utils.editions
+    python -m utils.editions --article 372
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.pdf_backends import extract_pages
+from utils.pdf_processor import file_sha256
+from utils.search import normalize_greek_text
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = "attached_assets"
+DEFAULT_DIFF_DIR = "data/edition_diffs"
+
+# Bumped when parsing or diffing changes, so cached comparisons are recomputed
+DIFF_ENGINE_VERSION = 2
+
+# (file name, label) of the older and the newer edition
+PENAL_CODE_EDITIONS = (
+    ("Ποινικός-Κώδικας.pdf", "Π.Κ. (dsanet, 2019)"),
+    ("ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ ενημερωμένος με Ν 5108_2024 loninja watermark.pdf", "Π.Κ. 2024"),
+)
+
+ARTICLE_HEADER = re.compile(r'^[ \t]*(?:Άρθρο|Αρθρο|ΑΡΘΡΟ)[ \t]*:?[ \t]*(\d+[Α-ΩA-Z]?)[ \t]*$', re.MULTILINE)
+LAW_NUMBER = re.compile(r'Ν\.?\s*(\d+)\s*[_/]\s*(\d{4})')
+PENAL_CODE_LAW = re.compile(r'^\s*Π\.?\s*Κ\.?\s*(\d+[Α-ΩA-Z]?)')
+
+# Page furniture of the two prints: dsanet headers and footers, the LoNinja watermark
+PAGE_NOISE = re.compile(
+    r'^(?:\d{1,2}/\d{1,2}/\d{4}|ΟΘΟΝΗ ΕΚΤΥΠΩΣΗΣ|www\.dsanet\.gr\S*|\d+/\d+|\d+|LoNinja\.gr'
+    r'|ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ \d{4} \(Ενημερωμένος με .*\))[ \t]*$', re.MULTILINE)
+# The LoNinja watermark is also printed inside a line ("… LoNinja.gr 41 gr LoNinja.gr LoN
+# ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ 2024 (Ενημερωμένος με Ν. 5108/2024) …"), sometimes broken over lines
+INLINE_WATERMARK = re.compile(
+    r'LoNinja\.gr(?:\s+\d+\s+gr(?!\w))?(?:\s+LoN(?:inja\.gr|(?!\w)))*'
+    r'(?:\s+ΠΟΙΝΙΚΟΣ\s+ΚΩΔΙΚΑΣ\s+\d{4}\s+\(Ενημερωμένος\s+με\s+Ν\.\s*\d+/\d{4}\))?'
+    r'|ΠΟΙΝΙΚΟΣ\s+ΚΩΔΙΚΑΣ\s+\d{4}\s+\(Ενημερωμένος\s+με\s+Ν\.\s*\d+/\d{4}\)')
+# dsanet records carry metadata before the article text proper
+DSANET_TEXT_MARKER = re.compile(r'^[ \t]*Κείμενο Αρθρου[ \t]*$', re.MULTILINE)
+DSANET_TITLE = re.compile(r'^[ \t]*Τίτλος Αρθρου[ \t]*\n\s*(.+)$', re.MULTILINE)
+# A new paragraph starts at "1." / "2α." / "α)" / "ββ)"
+PARAGRAPH_START = re.compile(r'^(?:\d+[α-ω]?\.|[α-ω]{1,2}\))\s')
+HYPHENATION = re.compile(r'(\w)- ([α-ωά-ώ])')
+MISSING_SPACE = re.compile(r'([,;·])(?=[^\W\d_])')
+
+
+def find_asset(filename: str, directory: str = ASSETS_DIR) -> Optional[str]:
+    """Path of filename in directory, matching names in any Unicode normalization form"""
+    wanted = unicodedata.normalize('NFC', filename)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    for name in names:
+        if unicodedata.normalize('NFC', name) == wanted:
+            return os.path.join(directory, name)
+    return None
+
+
+def amending_law(filename: str) -> Optional[str]:
+    """The "Ν.5108/2024" an edition is updated with, from its file name"""
+    match = LAW_NUMBER.search(unicodedata.normalize('NFC', filename))
+    return f"Ν.{match.group(1)}/{match.group(2)}" if match else None
+
+
+def penal_code_article_number(article: Dict[str, str]) -> Optional[str]:
+    """The Penal Code article an article of the corpus refers to, from its law ("Π.Κ. 299Α")"""
+    match = PENAL_CODE_LAW.match(article.get('law', '') or '')
+    return match.group(1) if match else None
+
+
+def _is_heading(line: str) -> bool:
+    """Chapter and section headings are set in capitals with no lowercase letters"""
+    letters = [char for char in line if char.isalpha()]
+    return len(line.split()) >= 2 and bool(letters) and all(char.isupper() for char in letters)
+
+
+def _clean_article(body: str) -> Tuple[str, str]:
+    """Title and text of one article body, without page furniture or trailing headings"""
+    title = ''
+    marker = DSANET_TEXT_MARKER.search(body)
+    if marker:
+        title_match = DSANET_TITLE.search(body, 0, marker.start())
+        title = title_match.group(1).strip() if title_match else ''
+        body = body[marker.end():]
+
+    # A watermark spanning a line break keeps the break, so paragraphs are not joined
+    body = INLINE_WATERMARK.sub(lambda m: '\n' if '\n' in m.group() else ' ', body)
+    # dsanet prints the apostrophe as a NUL character
+    body = PAGE_NOISE.sub('', body).replace('\x00', '’')
+    lines = [re.sub(r'[ \t]{2,}', ' ', line.strip()) for line in body.split('\n')]
+    lines = [line for line in lines if line]
+    # Headings of the next chapter are printed before the next article header,
+    # dsanet repeats the chapter heading at the start of the text
+    while lines and _is_heading(lines[-1]):
+        lines.pop()
+    while marker and lines and _is_heading(lines[0]):
+        lines.pop(0)
+
+    if not marker and len(lines) > 1 and not PARAGRAPH_START.match(lines[0]) \
+            and not _is_heading(lines[0]) and len(lines[0]) < 120:
+        title = lines.pop(0)
+    return title, '\n'.join(lines)
+
+
+def parse_edition(text: str) -> Dict[str, Dict[str, str]]:
+    """Map article number -> {'title', 'text'}; repeated numbers keep the first occurrence"""
+    articles: Dict[str, Dict[str, str]] = {}
+    headers = list(ARTICLE_HEADER.finditer(text))
+    for header, following in zip(headers, headers[1:] + [None]):
+        number = header.group(1)
+        if number in articles:
+            continue
+        end = following.start() if following else len(text)
+        title, body = _clean_article(text[header.end():end])
+        articles[number] = {'title': title, 'text': body}
+    return articles
+
+
+def comparison_text(text: str) -> str:
+    """
+    Text as compared: accent-folded, lowercased, typographic quotes unified,
+    dsanet footnote asterisks dropped and whitespace collapsed
+    """
+    text = text.replace('’', "'").replace('‘', "'").replace('΄', "'").replace('*', '')
+    text = MISSING_SPACE.sub(r'\1 ', HYPHENATION.sub(r'\1\2', text.replace('\n', ' ')))
+    return ' '.join(normalize_greek_text(text).split())
+
+
+def text_digest(text: str) -> str:
+    return hashlib.blake2b(comparison_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _paragraphs(text: str) -> List[str]:
+    """Reflow the printed lines into paragraphs, so line breaks of the layout do not count as changes"""
+    paragraphs: List[List[str]] = []
+    for line in text.split('\n'):
+        if not paragraphs or PARAGRAPH_START.match(line):
+            paragraphs.append([])
+        paragraphs[-1].append(line)
+    # Words hyphenated at the end of a printed line are joined back
+    return [MISSING_SPACE.sub(r'\1 ', HYPHENATION.sub(r'\1\2', ' '.join(lines))) for lines in paragraphs]
+
+
+def _word_diff(old_words: List[str], new_words: List[str], ops: List[List[str]]) -> int:
+    """Append word-level ops for two word lists; returns how many words were equal"""
+    matcher = difflib.SequenceMatcher(None, [comparison_text(word) for word in old_words],
+                                      [comparison_text(word) for word in new_words], autojunk=False)
+    equal = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            equal += i2 - i1
+            _append_op(ops, 'equal', '', ' '.join(new_words[j1:j2]))
+        else:
+            _append_op(ops, tag, ' '.join(old_words[i1:i2]), ' '.join(new_words[j1:j2]))
+    return equal
+
+
+def _append_op(ops: List[List[str]], tag: str, old: str, new: str) -> None:
+    """Append an op, merging it into the previous one when both have the same tag"""
+    if ops and ops[-1][0] == tag:
+        ops[-1][1] = ' '.join(filter(None, (ops[-1][1], old)))
+        ops[-1][2] = ' '.join(filter(None, (ops[-1][2], new)))
+    else:
+        ops.append([tag, old, new])
+
+
+def diff_texts(old: str, new: str) -> Tuple[List[List[str]], float]:
+    """
+    Word-level diff of two article texts as [tag, old words, new words] ops,
+    tag being equal, replace, delete or insert, and the share of equal words.
+    Paragraphs are aligned by digest first and only the differing ones are
+    diffed word by word.
+    """
+    old_paragraphs, new_paragraphs = _paragraphs(old), _paragraphs(new)
+    matcher = difflib.SequenceMatcher(None, [text_digest(p) for p in old_paragraphs],
+                                      [text_digest(p) for p in new_paragraphs], autojunk=False)
+    ops: List[List[str]] = []
+    equal = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            text = ' '.join(new_paragraphs[j1:j2])
+            equal += len(text.split())
+            _append_op(ops, 'equal', '', text)
+        else:
+            equal += _word_diff(' '.join(old_paragraphs[i1:i2]).split(),
+                                ' '.join(new_paragraphs[j1:j2]).split(), ops)
+    total = max(len(old.split()), len(new.split()))
+    return ops, (equal / total if total else 1.0)
+
+
+def compare_editions(old: Dict[str, Dict[str, str]], new: Dict[str, Dict[str, str]]) -> Dict[str, Dict]:
+    """
+    Per article number: status (unchanged, changed, added or removed), the
+    titles, and for changed articles the similarity and the word-level ops.
+    """
+    articles: Dict[str, Dict] = {}
+    for number in sorted(set(old) | set(new), key=_article_sort_key):
+        before, after = old.get(number), new.get(number)
+        entry: Dict = {'title': (after or before)['title']}
+        if before is None:
+            entry['status'] = 'added'
+        elif after is None:
+            entry['status'] = 'removed'
+        elif text_digest(before['text']) == text_digest(after['text']):
+            entry['status'] = 'unchanged'
+        else:
+            entry['status'] = 'changed'
+            entry['ops'], entry['similarity'] = diff_texts(before['text'], after['text'])
+            if before['title'] != after['title']:
+                entry['old_title'] = before['title']
+        articles[number] = entry
+    return articles
+
+
+def _article_sort_key(number: str) -> Tuple[int, str]:
+    digits = re.match(r'\d+', number)
+    return int(digits.group()), number[digits.end():]
+
+
+def read_edition(path: str) -> Dict[str, Dict[str, str]]:
+    backend, page_texts = extract_pages(path)
+    if backend is None:
+        raise ValueError(f"No PDF backend could read {path}")
+    return parse_edition('\n'.join(page_texts))
+
+
+def load_or_build_diff(old_path: str, new_path: str, old_label: str, new_label: str,
+                       cache_dir: str = DEFAULT_DIFF_DIR) -> Dict:
+    """The comparison of two edition PDFs, from the cache when both files are unchanged"""
+    old_sha, new_sha = file_sha256(old_path), file_sha256(new_path)
+    cache_path = Path(cache_dir) / f"{old_sha[:16]}-{new_sha[:16]}-v{DIFF_ENGINE_VERSION}.json"
+    if cache_path.exists():
+        try:
+            with open(cache_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable edition diff cache {cache_path}: {str(e)}")
+
+    start = time.perf_counter()
+    articles = compare_editions(read_edition(old_path), read_edition(new_path))
+    counts: Dict[str, int] = {}
+    for entry in articles.values():
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    diff = {
+        'old': {'label': old_label, 'file': os.path.basename(old_path), 'sha256': old_sha},
+        'new': {'label': new_label, 'file': os.path.basename(new_path), 'sha256': new_sha},
+        'amended_by': amending_law(os.path.basename(new_path)) or new_label,
+        'counts': counts,
+        'articles': articles
+    }
+    logger.info(f"Compared {old_label} with {new_label} in {time.perf_counter() - start:.2f}s: {counts}")
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(diff, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+    os.replace(tmp_path, cache_path)
+    return diff
+
+
+def build_penal_code_diff(directory: str = ASSETS_DIR, cache_dir: str = DEFAULT_DIFF_DIR) -> Optional[Dict]:
+    (old_name, old_label), (new_name, new_label) = PENAL_CODE_EDITIONS
+    old_path, new_path = find_asset(old_name, directory), find_asset(new_name, directory)
+    if old_path is None or new_path is None:
+        logger.info(f"Penal Code editions not found in {directory}, skipping the comparison")
+        return None
+    return load_or_build_diff(old_path, new_path, old_label, new_label, cache_dir)
+
+
+_penal_code_diff: Optional[Dict] = None
+_penal_code_diff_started = False
+_penal_code_diff_lock = threading.Lock()
+
+
+def _build_in_background() -> None:
+    global _penal_code_diff
+    try:
+        _penal_code_diff = build_penal_code_diff()
+    except Exception as e:
+        logger.error(f"Error comparing Penal Code editions: {str(e)}")
+
+
+def get_penal_code_diff(background: bool = True) -> Optional[Dict]:
+    """
+    Return the process-wide comparison of the Penal Code editions. The first
+    call starts building it (or loading it from the cache) in a background
+    thread and returns None until it is ready, like get_page_index.
+    """
+    global _penal_code_diff_started
+    with _penal_code_diff_lock:
+        if not _penal_code_diff_started:
+            _penal_code_diff_started = True
+            if background:
+                threading.Thread(target=_build_in_background, name="edition-diff", daemon=True).start()
+            else:
+                _build_in_background()
+    return _penal_code_diff
+
+
+def article_amendment(article: Dict[str, str]) -> Optional[Dict]:
+    """
+    The comparison entry of a Penal Code article of the corpus if the newer
+    edition changed it, with the amending law under 'amended_by'
+    """
+    number = penal_code_article_number(article)
+    diff = get_penal_code_diff() if number else None
+    entry = diff['articles'].get(number) if diff else None
+    if entry is None or entry['status'] not in ('changed', 'added'):
+        return None
+    return dict(entry, number=number, amended_by=diff['amended_by'])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the two Penal Code editions article by article")
+    parser.add_argument("--assets", default=ASSETS_DIR)
+    parser.add_argument("--cache-dir", default=DEFAULT_DIFF_DIR)
+    parser.add_argument("--article", help="print the diff of one article")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    diff = build_penal_code_diff(args.assets, args.cache_dir)
+    if diff is None:
+        print(f"Penal Code editions not found in {args.assets}")
+        return
+    print(f"{diff['old']['label']} -> {diff['new']['label']} ({diff['amended_by']}): "
+          f"{diff['counts']} in {time.perf_counter() - start:.2f}s")
+    if args.article:
+        entry = diff['articles'].get(args.article)
+        if entry is None:
+            print(f"Άρθρο {args.article} is in neither edition")
+            return
+        print(f"Άρθρο {args.article} {entry['title']}: {entry['status']}")
+        for tag, old, new in entry.get('ops', []):
+            if tag == 'equal':
+                print(f"  {new}")
+            else:
+                print(f"- {old}" if old else "", f"+ {new}" if new else "", sep="\n" if old and new else "")
+
+
+if __name__ == "__main__":
+    main()
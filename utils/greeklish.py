@@ -0,0 +1,78 @@
+"""
+Greeklish keys: one Latin spelling per word, shared by Greek words and the
+many ways of typing them in Latin letters ("narkotika", "oplo", "8anatos").
+
+greeklish_key() transliterates Greek letters and then folds the spellings
+that Greeklish writers use interchangeably onto one form:
+
+    η ι υ ει οι  -> i        ω o      -> o        ου u     -> u
+    θ th 8       -> 8        χ ch h x, ξ ks -> x
+    β b v, μπ mp -> v        φ ph f   -> f        αι e     -> e
+    ντ nt        -> d        γκ γγ gk gg -> g     ψ ps     -> ps
+
+and drops doubled letters. A lone h is η ("swmatikh", "mhtera") unless a
+vowel, ρ or λ follows, where it is χ ("hrhmata", "ohima").
+
+The search index stores the key of every word next to the word itself, so a
+Greeklish query is folded once and answered by the same prefix lookups as a
+Greek one. Keys are lossy by design (ξ and χ share one), which only widens
+the matches of Latin-letter queries.
+"""
+import re
+from functools import lru_cache
+
+_GREEK_DIGRAPHS = {
+    'ου': 'ou', 'ει': 'ei', 'οι': 'oi', 'υι': 'yi', 'αι': 'ai', 'αυ': 'av', 'ευ': 'ev',
+    'μπ': 'mp', 'ντ': 'nt', 'γκ': 'gk', 'γγ': 'gg'
+}
+_GREEK_LETTERS = {
+    'α': 'a', 'β': 'v', 'γ': 'g', 'δ': 'd', 'ε': 'e', 'ζ': 'z', 'η': 'i', 'θ': 'th',
+    'ι': 'i', 'κ': 'k', 'λ': 'l', 'μ': 'm', 'ν': 'n', 'ξ': 'ks', 'ο': 'o', 'π': 'p',
+    'ρ': 'r', 'σ': 's', 'ς': 's', 'τ': 't', 'υ': 'y', 'φ': 'f', 'χ': 'ch', 'ψ': 'ps', 'ω': 'o'
+}
+_LATIN_FOLDS = {
+    'th': '8', 'ch': 'x', 'ks': 'x', 'ph': 'f', 'ps': 'ps', 'ou': 'u',
+    'ei': 'i', 'oi': 'i', 'yi': 'i', 'ai': 'e', 'au': 'av', 'eu': 'ev', 'af': 'av', 'ef': 'ev',
+    'mp': 'v', 'nt': 'd', 'gk': 'g', 'gg': 'g',
+    'b': 'v', 'y': 'i', 'w': 'o', 'c': 'k', 'j': 'g', 'q': 'k'
+}
+
+_GREEK = re.compile('|'.join(sorted(_GREEK_DIGRAPHS, key=len, reverse=True) + list(_GREEK_LETTERS)))
+_LATIN = re.compile('|'.join(sorted(_LATIN_FOLDS, key=len, reverse=True)) + '|h')
+_CHI_FOLLOWERS = frozenset('aeiouywrl')
+_DOUBLED = re.compile(r'([a-z])\1+')
+_GREEK_CHARACTER = re.compile('[Ͱ-Ͽ]')
+_LATIN_CHARACTER = re.compile('[a-z]')
+
+
+def transliterate(text: str) -> str:
+    """Latin transliteration of lowercase, accent-folded Greek text; other characters are kept"""
+    return _GREEK.sub(lambda match: _GREEK_DIGRAPHS.get(match.group()) or _GREEK_LETTERS[match.group()], text)
+
+
+def _fold(match) -> str:
+    if match.group() != 'h':
+        return _LATIN_FOLDS[match.group()]
+    following = match.string[match.end():match.end() + 1]
+    return 'x' if following and following in _CHI_FOLLOWERS else 'i'
+
+
+def fold_latin(text: str) -> str:
+    """Fold the interchangeable Greeklish spellings of lowercase Latin text onto one form"""
+    return _DOUBLED.sub(r'\1', _LATIN.sub(_fold, text))
+
+
+def greeklish_text(text: str) -> str:
+    """The Greeklish form of normalized text, word by word"""
+    return fold_latin(transliterate(text))
+
+
+@lru_cache(maxsize=65536)
+def greeklish_key(token: str) -> str:
+    """The Greeklish key of a normalized token, whether written in Greek or in Latin letters"""
+    return greeklish_text(token)
+
+
+def is_greeklish(text: str) -> bool:
+    """True for normalized text written in Latin letters with no Greek ones"""
+    return bool(_LATIN_CHARACTER.search(text)) and not _GREEK_CHARACTER.search(text)
@@ -0,0 +1,432 @@
+"""
+Revision history of the corpus, for reading the wording that applied on a date.
+
+Every article revision is stored with the date it took effect. A revision is a
+zlib-compressed delta against the previous revision of the same article: only
+the changed fields, as line ranges copied from the previous text plus the new
+lines. Every KEYFRAME_INTERVAL revisions (and after a deletion) the full text
+is stored instead, which bounds the work to rebuild any revision. Recording a
+corpus whose articles did not change stores nothing, so the history grows with
+the amount of text changed rather than with the number of snapshots.
+
+as_of(date) materializes the corpus as it stood on a date into an
+InMemoryRepository, lazily and cached per date.
+
+Revisions are dated by the texts themselves (effective_date), not by when
+they were recorded. The bundled corpus carries no dates and is recorded as in
+force since BUNDLED_EFFECTIVE, so it is the wording of any date before the
+first dated revision. Only writes every session sees are recorded: the shared
+repository, the snapshot builder and the law updater, never a session's own
+in-memory copy.
+"""
+import difflib
+import json
+import logging
+import os
+import re
+import sqlite3
+import unicodedata
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from utils.article import CONTENT_FIELDS, article_digest
+from utils.storage import InMemoryRepository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DB_PATH = "data/history.sqlite3"
+KEYFRAME_INTERVAL = 16
+MAX_CACHED_VIEWS = 8
+MAX_CACHED_REVISIONS = 4096
+
+# The bundled corpus has no date of its own: it applies as far back as the history goes
+BUNDLED_EFFECTIVE = date.min
+
+# "ΦΕΚ Α' 95/29.05.2019": the date of publication in the Government Gazette
+GAZETTE_DATE = re.compile(r'ΦΕΚ[^\n]{0,40}?(\d{1,2})\.(\d{1,2})\.(\d{4})')
+
+DateLike = Union[date, str]
+
+
+def _iso(effective: DateLike) -> str:
+    return effective.isoformat() if isinstance(effective, date) else date.fromisoformat(effective).isoformat()
+
+
+def _published(value: Optional[DateLike]) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10]) if value else None
+    except ValueError:
+        return None
+
+
+def effective_date(text: str = '', published: Optional[DateLike] = None, source: str = '',
+                   default: Optional[date] = None) -> date:
+    """
+    The date a text took effect: the publication date from its source metadata,
+    else the latest Government Gazette (ΦΕΚ) date it cites, else the 1st of
+    January of the latest amending law named in its source or text ("Ν.5108/2024"),
+    else default (today).
+    """
+    from utils.editions import LAW_NUMBER
+
+    found = _published(published)
+    if found is not None:
+        return found
+    gazette_dates = []
+    for day, month, year in GAZETTE_DATE.findall(text):
+        try:
+            gazette_dates.append(date(int(year), int(month), int(day)))
+        except ValueError:
+            continue
+    if gazette_dates:
+        return max(gazette_dates)
+    years = [int(year) for _, year in LAW_NUMBER.findall(unicodedata.normalize('NFC', f"{source}\n{text}"))]
+    if years:
+        return date(max(years), 1, 1)
+    return default or date.today()
+
+
+def _fields(article: Mapping) -> Dict[str, str]:
+    return {field: article.get(field, '') or '' for field in CONTENT_FIELDS}
+
+
+def encode_delta(base: Dict[str, str], target: Dict[str, str]) -> Dict[str, List]:
+    """
+    Per changed field, ops that rebuild the target lines from the base lines:
+    [start, end] copies base lines, a string inserts new text.
+    """
+    delta = {}
+    for field in CONTENT_FIELDS:
+        if base[field] == target[field]:
+            continue
+        old_lines = base[field].splitlines(keepends=True)
+        new_lines = target[field].splitlines(keepends=True)
+        ops: List = []
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                ops.append([i1, i2])
+            elif j2 > j1:
+                ops.append(''.join(new_lines[j1:j2]))
+        delta[field] = ops
+    return delta
+
+
+def apply_delta(base: Dict[str, str], delta: Dict[str, List]) -> Dict[str, str]:
+    target = dict(base)
+    for field, ops in delta.items():
+        old_lines = base[field].splitlines(keepends=True)
+        target[field] = ''.join(op if isinstance(op, str) else ''.join(old_lines[op[0]:op[1]]) for op in ops)
+    return target
+
+
+def _pack(data: object) -> bytes:
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def _unpack(blob: bytes) -> object:
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class ArticleHistory:
+    """
+    SQLite store of dated article revisions. An article is identified by its
+    category, subcategory and title (plus its occurrence number when a section
+    repeats a title).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history_articles (
+            id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            subcategory TEXT NOT NULL,
+            title TEXT NOT NULL,
+            occurrence INTEGER NOT NULL,
+            UNIQUE (category, subcategory, title, occurrence)
+        );
+        CREATE TABLE IF NOT EXISTS history_revisions (
+            id INTEGER PRIMARY KEY,
+            article_id INTEGER NOT NULL REFERENCES history_articles(id),
+            effective TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            data BLOB,
+            UNIQUE (article_id, effective)
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_revisions_effective ON history_revisions(effective, article_id);
+        CREATE TABLE IF NOT EXISTS history_generation (id INTEGER PRIMARY KEY CHECK (id = 1),
+                                                       generation INTEGER NOT NULL);
+        INSERT OR IGNORE INTO history_generation (id, generation) VALUES (1, 0);
+    """
+
+    def __init__(self, db_path: str = DEFAULT_HISTORY_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._views: "OrderedDict[Tuple[str, int], InMemoryRepository]" = OrderedDict()
+        self._revisions: "OrderedDict[int, Dict[str, str]]" = OrderedDict()
+        self._cached_generation = -1
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def head(self) -> int:
+        """
+        Generation of the history, bumped by every write. Revision ids cannot
+        serve: a correction rewrites a chain and SQLite reuses the freed ids.
+        """
+        return self._connection().execute("SELECT generation FROM history_generation WHERE id = 1").fetchone()[0]
+
+    def _sync_caches(self) -> int:
+        """Drop the cached revisions if any process wrote since they were read; returns the generation"""
+        generation = self.head
+        with self._cache_lock:
+            if generation != self._cached_generation:
+                self._revisions.clear()
+                self._cached_generation = generation
+        return generation
+
+    def _article_id(self, conn: sqlite3.Connection, category: str, subcategory: str,
+                    title: str, occurrence: int) -> int:
+        key = (category, subcategory, title, occurrence)
+        row = conn.execute("SELECT id FROM history_articles WHERE category = ? AND subcategory = ? "
+                           "AND title = ? AND occurrence = ?", key).fetchone()
+        if row is not None:
+            return row['id']
+        return conn.execute("INSERT INTO history_articles (category, subcategory, title, occurrence) "
+                            "VALUES (?, ?, ?, ?)", key).lastrowid
+
+    def _chain(self, conn: sqlite3.Connection, article_id: int) -> List[sqlite3.Row]:
+        return conn.execute("SELECT id, effective, position, kind, digest, data FROM history_revisions "
+                            "WHERE article_id = ? ORDER BY effective", (article_id,)).fetchall()
+
+    def _materialize(self, conn: sqlite3.Connection, revision_id: int) -> Optional[Dict[str, str]]:
+        """Fields of a revision, rebuilt from the nearest keyframe; None for a deletion"""
+        with self._cache_lock:
+            cached = self._revisions.get(revision_id)
+            if cached is not None:
+                self._revisions.move_to_end(revision_id)
+                return cached
+        row = conn.execute("SELECT article_id, effective, kind, data FROM history_revisions WHERE id = ?",
+                           (revision_id,)).fetchone()
+        if row['kind'] == 'deleted':
+            return None
+        if row['kind'] == 'full':
+            fields = _unpack(row['data'])
+        else:
+            previous = conn.execute("SELECT id FROM history_revisions WHERE article_id = ? AND effective < ? "
+                                    "ORDER BY effective DESC LIMIT 1", (row['article_id'], row['effective'])).fetchone()
+            fields = apply_delta(self._materialize(conn, previous['id']), _unpack(row['data']))
+        with self._cache_lock:
+            self._revisions[revision_id] = fields
+            while len(self._revisions) > MAX_CACHED_REVISIONS:
+                self._revisions.popitem(last=False)
+        return fields
+
+    def _encode(self, previous: Optional[Dict[str, str]], fields: Optional[Dict[str, str]],
+                since_keyframe: int) -> Tuple[str, Optional[bytes]]:
+        """(kind, data) of a revision following previous"""
+        if fields is None:
+            return 'deleted', None
+        full = _pack(fields)
+        if previous is None or since_keyframe + 1 >= KEYFRAME_INTERVAL:
+            return 'full', full
+        delta = _pack(encode_delta(previous, fields))
+        return ('delta', delta) if len(delta) < len(full) else ('full', full)
+
+    def _write_revision(self, conn: sqlite3.Connection, article_id: int, effective: str, position: int,
+                        fields: Optional[Dict[str, str]]) -> bool:
+        """Record the state of one article from effective on; returns whether anything was stored"""
+        digest = article_digest(fields) if fields is not None else 'deleted'
+        chain = self._chain(conn, article_id)
+        earlier = [row for row in chain if row['effective'] <= effective]
+        later = [row for row in chain if row['effective'] > effective]
+        current = earlier[-1] if earlier else None
+        # An article recorded as it already stands did not change, whatever the date
+        for state in (current, chain[-1] if chain else None):
+            if state is not None and state['digest'] == digest and state['position'] == position:
+                return False
+        if current is None and fields is None:
+            return False
+
+        if later or (current is not None and current['effective'] == effective):
+            # Back-dated or same-day correction: re-encode the part of the chain that follows
+            states = [(row['effective'], row['position'], self._materialize(conn, row['id'])) for row in chain]
+            states = [state for state in states if state[0] != effective] + [(effective, position, fields)]
+            states.sort(key=lambda state: state[0])
+            conn.execute("DELETE FROM history_revisions WHERE article_id = ?", (article_id,))
+            with self._cache_lock:
+                for row in chain:
+                    self._revisions.pop(row['id'], None)
+            previous, since_keyframe = None, 0
+            for state_effective, state_position, state_fields in states:
+                kind, data = self._encode(previous, state_fields, since_keyframe)
+                self._insert(conn, article_id, state_effective, state_position, kind, state_fields, data)
+                since_keyframe = 0 if kind == 'full' else since_keyframe + 1
+                previous = state_fields
+            return True
+
+        since_keyframe = 0
+        for row in reversed(earlier):
+            if row['kind'] != 'delta':
+                break
+            since_keyframe += 1
+        previous = self._materialize(conn, current['id']) if current is not None else None
+        kind, data = self._encode(previous, fields, since_keyframe)
+        self._insert(conn, article_id, effective, position, kind, fields, data)
+        return True
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, article_id: int, effective: str, position: int, kind: str,
+                fields: Optional[Dict[str, str]], data: Optional[bytes]) -> None:
+        conn.execute("INSERT INTO history_revisions (article_id, effective, position, kind, digest, data) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     (article_id, effective, position, kind,
+                      article_digest(fields) if fields is not None else 'deleted', data))
+
+    def record_section(self, category: str, subcategory: str, articles: Iterable[Mapping],
+                       effective: DateLike) -> int:
+        """
+        Record the articles of a section as they stand from effective on.
+        Articles of the section missing from articles are recorded as deleted.
+        Returns the number of revisions stored.
+        """
+        effective = _iso(effective)
+        stored = 0
+        with self._write_lock, self._connection() as conn:
+            self._sync_caches()
+            seen = set()
+            occurrences: Dict[str, int] = {}
+            for position, article in enumerate(articles):
+                fields = _fields(article)
+                occurrence = occurrences[fields['title']] = occurrences.get(fields['title'], 0) + 1
+                article_id = self._article_id(conn, category, subcategory, fields['title'], occurrence)
+                seen.add(article_id)
+                stored += self._write_revision(conn, article_id, effective, position, fields)
+            known = conn.execute("SELECT id FROM history_articles WHERE category = ? AND subcategory = ?",
+                                 (category, subcategory)).fetchall()
+            for row in known:
+                if row['id'] not in seen:
+                    stored += self._write_revision(conn, row['id'], effective, 0, None)
+            if stored:
+                conn.execute("UPDATE history_generation SET generation = generation + 1 WHERE id = 1")
+        if stored:
+            logger.info(f"Recorded {stored} revisions of {category} / {subcategory} effective {effective}")
+        return stored
+
+    def record_categories(self, categories: Mapping, effective: DateLike) -> int:
+        """Record every section of a category -> subcategory -> articles mapping"""
+        return sum(self.record_section(category, subcategory, articles, effective)
+                   for category, subcategories in categories.items()
+                   for subcategory, articles in subcategories.items())
+
+    def record_repository(self, repository, effective: DateLike,
+                          categories: Optional[Iterable[str]] = None) -> int:
+        """
+        Record the current content of a repository, or of some of its categories.
+        Sections the history knows but the repository no longer has are recorded as deleted.
+        """
+        stored = 0
+        for category in (categories if categories is not None else repository.get_categories()):
+            subcategories = repository.get_subcategories(category)
+            for subcategory in subcategories:
+                stored += self.record_section(category, subcategory,
+                                              repository.get_articles(category, subcategory), effective)
+            removed = self._connection().execute(
+                "SELECT DISTINCT subcategory FROM history_articles WHERE category = ?", (category,)).fetchall()
+            for row in removed:
+                if row['subcategory'] not in subcategories:
+                    stored += self.record_section(category, row['subcategory'], [], effective)
+        return stored
+
+    def article_revisions(self, category: str, subcategory: str, title: str,
+                          occurrence: int = 1) -> List[Dict[str, object]]:
+        """Every revision of one article, oldest first, with the date it took effect"""
+        self._sync_caches()
+        conn = self._connection()
+        row = conn.execute("SELECT id FROM history_articles WHERE category = ? AND subcategory = ? "
+                           "AND title = ? AND occurrence = ?", (category, subcategory, title, occurrence)).fetchone()
+        if row is None:
+            return []
+        return [{'effective': revision['effective'], 'deleted': revision['kind'] == 'deleted',
+                 'article': self._materialize(conn, revision['id'])} for revision in self._chain(conn, row['id'])]
+
+    def as_of(self, effective: DateLike) -> InMemoryRepository:
+        """
+        The corpus as it stood on a date, as a read-only InMemoryRepository.
+        Views are cached per (date, head), so a new revision invalidates them.
+        """
+        effective = _iso(effective)
+        key = (effective, self._sync_caches())
+        with self._cache_lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+
+        conn = self._connection()
+        rows = conn.execute("""
+            SELECT a.category, a.subcategory, r.id, r.position, r.kind
+            FROM history_revisions r JOIN history_articles a ON a.id = r.article_id
+            WHERE r.effective = (SELECT MAX(effective) FROM history_revisions
+                                 WHERE article_id = r.article_id AND effective <= ?)
+            ORDER BY a.category, a.subcategory, r.position
+        """, (effective,)).fetchall()
+        categories: Dict[str, Dict[str, List[Dict[str, str]]]] = {}
+        for row in rows:
+            if row['kind'] == 'deleted':
+                continue
+            fields = self._materialize(conn, row['id'])
+            categories.setdefault(row['category'], {}).setdefault(row['subcategory'], []).append(
+                dict(fields, category=row['category'], subcategory=row['subcategory']))
+
+        view = InMemoryRepository(categories, version=f"history-{key[0]}-{key[1]}")
+        with self._cache_lock:
+            self._views[key] = view
+            while len(self._views) > MAX_CACHED_VIEWS:
+                self._views.popitem(last=False)
+        return view
+
+    def stats(self) -> Dict[str, int]:
+        row = self._connection().execute("""
+            SELECT COUNT(*) AS revisions,
+                   COALESCE(SUM(kind = 'full'), 0) AS keyframes,
+                   COALESCE(SUM(kind = 'delta'), 0) AS deltas,
+                   COALESCE(SUM(kind = 'deleted'), 0) AS deletions,
+                   COALESCE(SUM(LENGTH(data)), 0) AS stored_bytes,
+                   COUNT(DISTINCT effective) AS dates
+            FROM history_revisions
+        """).fetchone()
+        return dict(row)
+
+
+_history: Optional[ArticleHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> ArticleHistory:
+    """Return the process-wide history store; HISTORY_DB_PATH overrides its location"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = ArticleHistory(os.environ.get("HISTORY_DB_PATH", DEFAULT_HISTORY_DB_PATH))
+        return _history
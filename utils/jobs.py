@@ -0,0 +1,418 @@
+"""
+Persistent queue of ingestion jobs for PDF uploads.
+
+An upload becomes a job: its files are written to a workspace of its own under
+data/jobs/<id>/, so concurrent uploads never share files, and a local worker
+process parses them in the background. The worker reports progress per
+extracted page and checks for cancellation while it extracts. It stores the
+parsed articles with the job and marks it done in a single update.
+publish() then merges them into a repository; on SQLite that is one
+transaction, so readers see every article of a job or none of them.
+
+Job states: queued -> running -> done -> publishing -> published, or failed /
+cancelled. A job keeps its articles until they are merged: a failed merge puts
+it back to done, and so does the next publish() if its publisher died.
+
+Usage (from the project root):
+    python -m utils.jobs              # run a worker until interrupted
+    python -m utils.jobs --status     # list recent jobs
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.pdf_backends import ExtractionCancelled, count_pages
+from utils.pdf_processor import READ_CHUNK_SIZE, PdfSource, process_pdf_sources
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DB_PATH = "data/jobs.sqlite3"
+DEFAULT_WORKSPACE_DIR = "data/jobs"
+POLL_INTERVAL = 1.0
+# A worker whose heartbeat is older than this is considered dead
+WORKER_TIMEOUT = 15.0
+# Minimum time between two progress writes of a running job
+PROGRESS_INTERVAL = 0.25
+
+ACTIVE_STATES = ('queued', 'running')
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by the app and its worker processes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL,
+            files TEXT NOT NULL,
+            workspace TEXT NOT NULL,
+            submitted REAL NOT NULL,
+            started REAL,
+            finished REAL,
+            pages_done INTEGER NOT NULL DEFAULT 0,
+            pages_total INTEGER NOT NULL DEFAULT 0,
+            message TEXT NOT NULL DEFAULT '',
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            worker_pid INTEGER,
+            result BLOB
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+        CREATE TABLE IF NOT EXISTS workers (
+            pid INTEGER PRIMARY KEY,
+            heartbeat REAL NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str = DEFAULT_JOBS_DB_PATH, workspace_dir: str = DEFAULT_WORKSPACE_DIR):
+        self.db_path = db_path
+        self.workspace_dir = workspace_dir
+        self._local = threading.local()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, files: Iterable[Tuple[str, PdfSource]]) -> int:
+        """
+        Queue an upload of (file name, PDF) pairs and return the job id. Each
+        PDF may be a path, a buffer or a binary stream; buffers are written to
+        the workspace as they are, without an intermediate copy.
+        """
+        with self._connection() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (status, files, workspace, submitted) VALUES ('preparing', '[]', '', ?)",
+                (time.time(),)).lastrowid
+        workspace = Path(self.workspace_dir) / str(job_id)
+        workspace.mkdir(parents=True, exist_ok=True)
+        names = []
+        try:
+            for name, data in files:
+                # Only the base name: an upload cannot write outside its workspace
+                name = os.path.basename(name)
+                _write_upload(data, workspace / name)
+                names.append(name)
+        except Exception as e:
+            with self._connection() as conn:
+                conn.execute("UPDATE jobs SET status = 'failed', message = ?, finished = ? WHERE id = ?",
+                             (f"Αποτυχία αποθήκευσης: {str(e)}", time.time(), job_id))
+            self._remove_workspace(job_id)
+            raise
+        with self._connection() as conn:
+            conn.execute("UPDATE jobs SET status = 'queued', files = ?, workspace = ? WHERE id = ?",
+                         (json.dumps(names, ensure_ascii=False), str(workspace), job_id))
+        logger.info(f"Queued ingestion job {job_id} with {len(names)} files")
+        return job_id
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT id, status, files, submitted, started, finished, pages_done, pages_total, message, "
+            "cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['files'] = json.loads(job['files'])
+        job['progress'] = min(1.0, job['pages_done'] / job['pages_total']) if job['pages_total'] else 0.0
+        return job
+
+    def jobs(self, limit: int = 20) -> List[Dict]:
+        ids = [row['id'] for row in self._connection().execute(
+            "SELECT id FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+        return [self.get(job_id) for job_id in ids]
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a job. A queued or finished but unpublished job is cancelled at
+        once; a running one stops at its next page. Returns False if the job
+        can no longer be cancelled.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ?, result = NULL, message = 'Ακυρώθηκε' "
+                "WHERE id = ? AND status IN ('queued', 'done')", (time.time(), job_id))
+            if cursor.rowcount:
+                self._remove_workspace(job_id)
+                return True
+            cursor = conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+                                  (job_id,))
+            return cursor.rowcount > 0
+
+    def publish(self, job_id: int, repository) -> Optional[Dict]:
+        """
+        Merge the articles of a done job into repository and return them, or
+        None if the job is not done. The job is claimed first, so each job is
+        published once even when several sessions try at the same time; its
+        articles are only dropped once the merge succeeded.
+        """
+        self._recover_publishing()
+        conn = self._connection()
+        with conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+            if row is None or not conn.execute(
+                    "UPDATE jobs SET status = 'publishing', worker_pid = ? WHERE id = ? AND status = 'done'",
+                    (os.getpid(), job_id)).rowcount:
+                return None
+        try:
+            categories = json.loads(zlib.decompress(row['result']).decode('utf-8'))
+            repository.add_categories(categories)
+        except Exception:
+            with conn:
+                conn.execute("UPDATE jobs SET status = 'done' WHERE id = ? AND status = 'publishing'", (job_id,))
+            raise
+        with conn:
+            conn.execute("UPDATE jobs SET status = 'published', result = NULL WHERE id = ? AND status = 'publishing'",
+                         (job_id,))
+        logger.info(f"Published ingestion job {job_id}")
+        return categories
+
+    def _recover_publishing(self) -> int:
+        """Put back to done the jobs whose publishing process died before the merge finished"""
+        rows = self._connection().execute("SELECT id, worker_pid FROM jobs WHERE status = 'publishing'").fetchall()
+        stale = [row['id'] for row in rows if not _process_alive(row['worker_pid'])]
+        if not stale:
+            return 0
+        with self._connection() as conn:
+            return conn.executemany("UPDATE jobs SET status = 'done' WHERE id = ? AND status = 'publishing'",
+                                    [(job_id,) for job_id in stale]).rowcount
+
+    # Worker side
+
+    def heartbeat(self, pid: int) -> None:
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers (pid, heartbeat) VALUES (?, ?)", (pid, time.time()))
+
+    def forget_worker(self, pid: int) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+
+    def live_workers(self) -> List[int]:
+        cutoff = time.time() - WORKER_TIMEOUT
+        return [row['pid'] for row in self._connection().execute(
+            "SELECT pid FROM workers WHERE heartbeat >= ?", (cutoff,))]
+
+    def requeue_orphans(self) -> int:
+        """Put back jobs left running by workers that died"""
+        live = self.live_workers()
+        placeholders = ','.join('?' * len(live)) or 'NULL'
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'queued', pages_done = 0, worker_pid = NULL "
+                f"WHERE status = 'running' AND (worker_pid IS NULL OR worker_pid NOT IN ({placeholders}))",
+                live).rowcount
+
+    def claim(self, pid: int) -> Optional[sqlite3.Row]:
+        """Take the oldest queued job, atomically with respect to other workers"""
+        with self._connection() as conn:
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            if not conn.execute("UPDATE jobs SET status = 'running', started = ?, worker_pid = ? "
+                                "WHERE id = ? AND status = 'queued'", (time.time(), pid, row['id'])).rowcount:
+                return None
+            return conn.execute("SELECT id, files, workspace, worker_pid FROM jobs WHERE id = ?",
+                                (row['id'],)).fetchone()
+
+    def _set_progress(self, job_id: int, pages_done: int, pages_total: int, message: str) -> bool:
+        """Store progress; returns whether cancellation was requested"""
+        with self._connection() as conn:
+            conn.execute("UPDATE jobs SET pages_done = ?, pages_total = ?, message = ? WHERE id = ?",
+                         (pages_done, pages_total, message, job_id))
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row['cancel_requested'])
+
+    def _finish(self, job_id: int, worker_pid: int, status: str, message: str,
+                result: Optional[Dict] = None) -> bool:
+        """
+        Store the outcome of a job this worker still holds; returns False, and
+        leaves the workspace alone, if the job was requeued or taken over meanwhile.
+        """
+        blob = None
+        if result is not None:
+            blob = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        with self._connection() as conn:
+            finished = conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, finished = ?, result = ? "
+                "WHERE id = ? AND status = 'running' AND worker_pid = ?",
+                (status, message, time.time(), blob, job_id, worker_pid)).rowcount
+        if not finished:
+            logger.warning(f"Ingestion job {job_id} is no longer held by worker {worker_pid}, result dropped")
+            return False
+        self._remove_workspace(job_id)
+        return True
+
+    def _remove_workspace(self, job_id: int) -> None:
+        shutil.rmtree(Path(self.workspace_dir) / str(job_id), ignore_errors=True)
+
+    def run_job(self, job: sqlite3.Row) -> str:
+        """Parse the files of a claimed job; returns the final status"""
+        job_id, worker_pid = job['id'], job['worker_pid']
+        workspace = Path(job['workspace'])
+        paths = [workspace / name for name in json.loads(job['files'])]
+        try:
+            pages_total = sum(count_pages(str(path)) for path in paths)
+        except Exception as e:
+            self._finish(job_id, worker_pid, 'failed', f"Μη αναγνώσιμο PDF: {str(e)}")
+            return 'failed'
+
+        pages_done = 0
+        last_write = 0.0
+        current_file = ''
+
+        def on_page():
+            nonlocal pages_done, last_write
+            pages_done += 1
+            now = time.monotonic()
+            if now - last_write >= PROGRESS_INTERVAL:
+                last_write = now
+                if self._set_progress(job_id, pages_done, pages_total, current_file):
+                    raise ExtractionCancelled()
+
+        def sources():
+            nonlocal current_file
+            for path in paths:
+                current_file = path.name
+                yield path.name, str(path)
+
+        try:
+            articles = process_pdf_sources(sources(), on_page=on_page)
+            categories = {category: {subcategory: [dict(article) for article in section]
+                                     for subcategory, section in subcategories.items()}
+                          for category, subcategories in articles.items()}
+            if self._set_progress(job_id, pages_total, pages_total, ''):
+                raise ExtractionCancelled()
+        except ExtractionCancelled:
+            self._finish(job_id, worker_pid, 'cancelled', 'Ακυρώθηκε')
+            logger.info(f"Ingestion job {job_id} cancelled")
+            return 'cancelled'
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            self._finish(job_id, worker_pid, 'failed', str(e))
+            return 'failed'
+
+        count = sum(len(articles) for subcategories in categories.values() for articles in subcategories.values())
+        if self._finish(job_id, worker_pid, 'done', f"{count} άρθρα", categories):
+            logger.info(f"Ingestion job {job_id} done: {count} articles from {len(paths)} files")
+        return 'done'
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_upload(source: PdfSource, path: Path) -> None:
+    if isinstance(source, (str, os.PathLike)):
+        shutil.copyfile(source, path)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        path.write_bytes(source)
+    elif hasattr(source, 'getbuffer'):
+        with source.getbuffer() as view:
+            path.write_bytes(view)
+    else:
+        with open(path, 'wb') as file:
+            shutil.copyfileobj(source, file, READ_CHUNK_SIZE)
+
+
+def run_worker(queue: JobQueue, poll_interval: float = POLL_INTERVAL, once: bool = False) -> None:
+    """Process queued jobs one at a time; with once, return when the queue is empty"""
+    pid = os.getpid()
+    queue.heartbeat(pid)
+    requeued = queue.requeue_orphans()
+    if requeued:
+        logger.info(f"Requeued {requeued} jobs of workers that stopped")
+
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(WORKER_TIMEOUT / 3):
+            queue.heartbeat(pid)
+
+    threading.Thread(target=beat, name="jobs-heartbeat", daemon=True).start()
+    try:
+        while True:
+            job = queue.claim(pid)
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            queue.run_job(job)
+    finally:
+        stop.set()
+        queue.forget_worker(pid)
+
+
+def ensure_worker(queue: JobQueue) -> None:
+    """Start a local worker process unless one is alive"""
+    if queue.live_workers():
+        return
+    os.makedirs(queue.workspace_dir, exist_ok=True)
+    with open(os.path.join(queue.workspace_dir, "worker.log"), 'ab') as log:
+        process = subprocess.Popen([sys.executable, "-m", "utils.jobs", "--db", queue.db_path,
+                                    "--workspace", queue.workspace_dir],
+                                   stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                   start_new_session=True)
+    # Count the new worker as alive right away, so reruns do not start another one
+    queue.heartbeat(process.pid)
+    logger.info(f"Started ingestion worker {process.pid}")
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue; JOBS_DB_PATH overrides its location"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(os.environ.get("JOBS_DB_PATH", DEFAULT_JOBS_DB_PATH))
+        return _queue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the PDF ingestion worker")
+    parser.add_argument("--db", default=os.environ.get("JOBS_DB_PATH", DEFAULT_JOBS_DB_PATH))
+    parser.add_argument("--workspace", default=DEFAULT_WORKSPACE_DIR)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--status", action="store_true", help="list recent jobs and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    queue = JobQueue(args.db, args.workspace)
+    if args.status:
+        for job in queue.jobs():
+            print(f"{job['id']:>5} {job['status']:<10} {job['pages_done']}/{job['pages_total']} pages "
+                  f"{', '.join(job['files'])} {job['message']}")
+        return
+    run_worker(queue, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,63 @@
-import trafilatura
 from datetime import datetime
 import json
 import os
-from typing import Dict, List, Optional
+import re
+from typing import Dict, List, Optional, Tuple
+
+from utils.history import ArticleHistory, effective_date, get_history
+
+# Official text of each category: a URL, a local PDF under /attached_assets, or both
+SOURCES = {
+    "ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ": {
+        "local": "/attached_assets/Ποινικός-Κώδικας.pdf",
+        "external": "https://www.ministryofjustice.gr/wp-content/uploads/2019/10/Ποινικός-Κώδικας.pdf"
+    },
+    "ΚΩΔΙΚΑΣ ΠΟΙΝΙΚΗΣ ΔΙΚΟΝΟΜΙΑΣ": {
+        "local": "/attached_assets/Κώδικας-Ποινικής-Δικονομίας.pdf",
+        "external": "https://ministryofjustice.gr/wp-content/uploads/2019/10/Κώδικας-Ποινικής-Δικονομίας.pdf"
+    },
+    "ΕΙΔΙΚΟΙ ΠΟΙΝΙΚΟΙ ΝΟΜΟΙ": "/attached_assets/eidikoi_poinikoi_nomoi-poinologi.pdf",
+    "ΝΑΡΚΩΤΙΚΑ": "/attached_assets/nomos peri narkotikon.pdf",
+    "ΟΠΛΑ": "/attached_assets/Ν.-2168.1993-ΠΕΡΙ-ΟΠΛΩΝ-ΕΠΙΚΑΙΡΟΠΟΙΗΜΕΝΟΣ.pdf",
+    "ΕΝΔΟΟΙΚΟΓΕΝΕΙΑΚΗ ΒΙΑ (Ν.3500/2006)": {
+        "Ορισμοί": "/attached_assets/νομος ενδοοικογενειακης βιας.pdf",
+        "Σωματική Βία": "/attached_assets/νομος ενδοοικογενειακης βιας.pdf",
+        "Οδηγός Αντιμετώπισης": "/attached_assets/Οδηγός αντιμετώπισης ενδοοικογενειακής βίας .pdf"
+    },
+    "ΝΟΜΙΜΕΣ ΔΙΑΔΙΚΑΣΙΕΣ - 141/1991": "/attached_assets/ΠΔ 141 1991 ΑΡΜΟΔΙΟΤΗΤΕΣ ΚΑΙ ΕΝΕΡΓΕΙΕΣ ΕΛΑΣ.pdf",
+    "ΚΟΚ-ΤΡΟΧΟΝΟΜΙΚΑ": "/attached_assets/neoskok.pdf",
+    "ΝΟΜΟΣ ΠΕΡΙ ΚΑΤΟΙΚΙΔΙΩΝ": "/attached_assets/ΦΕΚ κατοικιδια.pdf",
+    "ΠΟΙΝΙΚΗ ΔΙΚΟΝΟΜΙΑ": "/attached_assets/Κώδικας-Ποινικής-Δικονομίας.pdf",
+    "ΑΣΤΥΝΟΜΙΚΟ ΠΡΟΣΩΠΙΚΟ": {
+        "Άδειες": "/attached_assets/adeies astynomikoy prosopikoy.pdf",
+        "Μεταθέσεις": "/attached_assets/metaueseis astynomikoy prosopikoy.pdf",
+        "Κώδικας Δεοντολογίας": "/attached_assets/kodikas deontologias.pdf",
+        "Χρήση Οπλισμού": "/attached_assets/nomos peri xrhshs oplismoy.pdf",
+        "Πειθαρχικό Δίκαιο": "/attached_assets/peitharxiko dikaio astynomikon.pdf",
+        "Χρόνος Εργασίας": "/attached_assets/xronos ergasias astynomikon.pdf",
+        "Ν.3169/2003 χρήση όπλου": "/attached_assets/nomos peri xrhshs oplismoy.pdf"
+    }
+}
+
+# Keys of a source that name copies of the whole document rather than subcategories
+SOURCE_COPIES = ("external", "local")
+
+ARTICLE_NUMBER = re.compile(r'(?:Άρθρο|Αρθρο|ΑΡΘΡΟ)\s*(\d+[Α-ΩA-Z]?)')
+
+
+def _article_number(title: str) -> Optional[str]:
+    match = ARTICLE_NUMBER.search(title or '')
+    return match.group(1) if match else None
+
 
 class LawUpdater:
-    def __init__(self, data_path: str = "data/law_database.json"):
+    def __init__(self, data_path: str = "data/law_database.json", history: Optional[ArticleHistory] = None,
+                 repository=None):
         self.data_path = data_path
-        self.sources = {
-            "ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ": {
-                "local": "/attached_assets/Ποινικός-Κώδικας.pdf",
-                "external": "https://www.ministryofjustice.gr/wp-content/uploads/2019/10/Ποινικός-Κώδικας.pdf"
-            },
-            "ΚΩΔΙΚΑΣ ΠΟΙΝΙΚΗΣ ΔΙΚΟΝΟΜΙΑΣ": {
-                "local": "/attached_assets/Κώδικας-Ποινικής-Δικονομίας.pdf",
-                "external": "https://ministryofjustice.gr/wp-content/uploads/2019/10/Κώδικας-Ποινικής-Δικονομίας.pdf"
-            },
-            "ΕΙΔΙΚΟΙ ΠΟΙΝΙΚΟΙ ΝΟΜΟΙ": "/attached_assets/eidikoi_poinikoi_nomoi-poinologi.pdf",
-            "ΝΑΡΚΩΤΙΚΑ": "/attached_assets/nomos peri narkotikon.pdf",
-            "ΟΠΛΑ": "/attached_assets/Ν.-2168.1993-ΠΕΡΙ-ΟΠΛΩΝ-ΕΠΙΚΑΙΡΟΠΟΙΗΜΕΝΟΣ.pdf",
-            "ΕΝΔΟΟΙΚΟΓΕΝΕΙΑΚΗ ΒΙΑ (Ν.3500/2006)": {
-                "Ορισμοί": "/attached_assets/νομος ενδοοικογενειακης βιας.pdf",
-                "Σωματική Βία": "/attached_assets/νομος ενδοοικογενειακης βιας.pdf",
-                "Οδηγός Αντιμετώπισης": "/attached_assets/Οδηγός αντιμετώπισης ενδοοικογενειακής βίας .pdf"
-            },
-            "ΝΟΜΙΜΕΣ ΔΙΑΔΙΚΑΣΙΕΣ - 141/1991": "/attached_assets/ΠΔ 141 1991 ΑΡΜΟΔΙΟΤΗΤΕΣ ΚΑΙ ΕΝΕΡΓΕΙΕΣ ΕΛΑΣ.pdf",
-            "ΚΟΚ-ΤΡΟΧΟΝΟΜΙΚΑ": "/attached_assets/neoskok.pdf",
-            "ΝΟΜΟΣ ΠΕΡΙ ΚΑΤΟΙΚΙΔΙΩΝ": "/attached_assets/ΦΕΚ κατοικιδια.pdf",
-            "ΠΟΙΝΙΚΗ ΔΙΚΟΝΟΜΙΑ": "/attached_assets/Κώδικας-Ποινικής-Δικονομίας.pdf",
-            "ΑΣΤΥΝΟΜΙΚΟ ΠΡΟΣΩΠΙΚΟ": {
-                "Άδειες": "/attached_assets/adeies astynomikoy prosopikoy.pdf",
-                "Μεταθέσεις": "/attached_assets/metaueseis astynomikoy prosopikoy.pdf",
-                "Κώδικας Δεοντολογίας": "/attached_assets/kodikas deontologias.pdf",
-                "Χρήση Οπλισμού": "/attached_assets/nomos peri xrhshs oplismoy.pdf",
-                "Πειθαρχικό Δίκαιο": "/attached_assets/peitharxiko dikaio astynomikon.pdf",
-                "Χρόνος Εργασίας": "/attached_assets/xronos ergasias astynomikon.pdf",
-                "Ν.3169/2003 χρήση όπλου": "/attached_assets/nomos peri xrhshs oplismoy.pdf"
-            }
-        }
+        self.history = history
+        # The corpus whose sections the fetched articles update, for their subcategories
+        self.repository = repository
+        self.sources = SOURCES
         self.last_update = self._load_last_update()
 
     def _load_last_update(self) -> Dict:
@@ -54,16 +74,49 @@ class LawUpdater:
         with open(self.data_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
-    def fetch_latest_content(self, url: str) -> Optional[str]:
-        """Fetch and extract content from URL"""
+    def fetch_source(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """Fetch and extract content from URL, with its publication date if the page gives one"""
+        # Only updates need trafilatura, so it is not loaded with the app
+        import trafilatura
         try:
             downloaded = trafilatura.fetch_url(url)
-            if downloaded:
-                return trafilatura.extract(downloaded)
-            return None
+            if not downloaded:
+                return None, None
+            metadata = trafilatura.extract_metadata(downloaded)
+            return trafilatura.extract(downloaded), metadata.date if metadata is not None else None
         except Exception as e:
             print(f"Error fetching content from {url}: {str(e)}")
-            return None
+            return None, None
+
+    def fetch_latest_content(self, url: str) -> Optional[str]:
+        """Fetch and extract content from URL"""
+        return self.fetch_source(url)[0]
+
+    def _sections(self, category: str, subcategory: Optional[str], articles: List[Dict]) -> Dict[str, List]:
+        """
+        The sections of category the fetched articles update: the named subcategory,
+        or, for a document covering the whole category, every subcategory holding
+        one of its articles. Articles of the corpus are matched by their number and
+        take the fetched text; the rest of each section stays as it is.
+        """
+        fetched = {}
+        for article in articles:
+            fetched.setdefault(_article_number(article['title']), article)
+        fetched.pop(None, None)
+
+        existing = self.repository.get_subcategories(category)
+        if subcategory is not None and subcategory not in existing:
+            return {subcategory: articles}
+        sections = {}
+        for name in ([subcategory] if subcategory is not None else existing):
+            updated, matched = [], False
+            for article in self.repository.get_articles(category, name):
+                match = fetched.get(_article_number(article.get('title', '')))
+                matched = matched or match is not None
+                updated.append(dict(article, content=match['content']) if match is not None else dict(article))
+            if matched:
+                sections[name] = updated
+        return sections
 
     def process_content(self, content: str) -> Dict:
         """Process raw content into structured data"""
@@ -97,25 +150,48 @@ class LawUpdater:
             with open(self.data_path, 'r', encoding='utf-8') as f:
                 current_data = json.load(f)
 
+        # The database file only holds the latest text; every revision goes to the history
+        history = self.history or get_history()
+        if self.repository is None:
+            from data.categories import CATEGORIES
+            from utils.article import compact_categories
+            from utils.storage import create_repository
+            self.repository = create_repository(compact_categories(CATEGORIES))
+
+        # Several categories share a source; fetch each one once per run
+        fetched = {}
+
+        def fetch(source_url):
+            if source_url not in fetched:
+                fetched[source_url] = self.fetch_source(source_url)
+            return fetched[source_url]
+
         for category, url in self.sources.items():
             print(f"Checking updates for {category}...")
-            if isinstance(url, dict):
-                for key, u in url.items():
-                    content = self.fetch_latest_content(u)
-                    if content:
-                        processed_data = self.process_content(content)
-                        if processed_data['articles']:
-                            current_data['categories'][category] = processed_data
-                            current_data['last_update'][category] = datetime.now().isoformat()
-                            updated = True
+            # (subcategory, copies of its source); None for a document covering the whole category
+            if isinstance(url, dict) and set(url) <= set(SOURCE_COPIES):
+                targets = [(None, [url[key] for key in SOURCE_COPIES if key in url])]
+            elif isinstance(url, dict):
+                targets = [(key, [u]) for key, u in url.items()]
             else:
-                content = self.fetch_latest_content(url)
-                if content:
-                    processed_data = self.process_content(content)
-                    if processed_data['articles']:
-                        current_data['categories'][category] = processed_data
-                        current_data['last_update'][category] = datetime.now().isoformat()
-                        updated = True
+                targets = [(None, [url])]
+
+            for subcategory, copies in targets:
+                for u in copies:
+                    content, published = fetch(u)
+                    if content:
+                        break
+                if not content:
+                    continue
+                processed_data = self.process_content(content)
+                if not processed_data['articles']:
+                    continue
+                current_data['categories'][category] = processed_data
+                current_data['last_update'][category] = datetime.now().isoformat()
+                effective = effective_date(content, published, source=u)
+                for name, articles in self._sections(category, subcategory, processed_data['articles']).items():
+                    history.record_section(category, name, articles, effective)
+                updated = True
 
 
         if updated:
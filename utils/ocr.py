@@ -0,0 +1,257 @@
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from utils.pdf_backends import PdfData, pdf_reader, source_label
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # OCR is an optional feature
+    pytesseract = None
+    Image = None
+
+# Pages with less extracted text than this are treated as scanned images
+MIN_TEXT_CHARS = 30
+OCR_LANGUAGE = "ell+eng"
+OCR_CACHE_DIR = "data/ocr_cache"
+MAX_OCR_WORKERS = 2
+MAX_PENDING_PAGES = 16
+
+
+def ocr_available() -> bool:
+    """Check that both pytesseract and the tesseract binary are installed"""
+    return pytesseract is not None and shutil.which("tesseract") is not None
+
+
+def get_page_images(page) -> List[bytes]:
+    """Return the raw data of every image embedded in a PyPDF2 page"""
+    try:
+        return [image.data for image in page.images]
+    except Exception as e:
+        logger.warning(f"Could not extract images from page: {str(e)}")
+        return []
+
+
+def is_image_only_page(page, page_text: Optional[str], min_chars: int = MIN_TEXT_CHARS) -> bool:
+    """
+    Detect a scanned page: almost no extractable text but at least one image
+    """
+    if page_text and len(page_text.strip()) >= min_chars:
+        return False
+    try:
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources is not None else None
+        if xobjects is None:
+            return False
+        return any(xobject.get_object().get("/Subtype") == "/Image" for xobject in xobjects.get_object().values())
+    except Exception:
+        return False
+
+
+def page_hash(images: List[bytes]) -> str:
+    """Content hash of a page's images, used as the OCR cache key"""
+    digest = hashlib.sha256()
+    for data in images:
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """On-disk cache of OCR results keyed by page hash"""
+
+    def __init__(self, cache_dir: str = OCR_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def _recognize(images: List[bytes], language: str) -> Tuple[str, bool]:
+    """The recognized text of one page, and whether every image of it was read"""
+    texts, complete = [], True
+    for data in images:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                texts.append(pytesseract.image_to_string(image, lang=language))
+        except Exception as e:
+            logger.warning(f"OCR failed for page image: {str(e)}")
+            complete = False
+    return "\n".join(text.strip() for text in texts if text.strip()), complete
+
+
+def ocr_images(images: List[bytes], language: str = OCR_LANGUAGE) -> str:
+    """Run Tesseract over the images of one page and join the recognized text"""
+    return _recognize(images, language)[0]
+
+
+class OcrPool:
+    """
+    Bounded background worker pool for OCR.
+    At most max_workers pages are recognized at once and at most max_pending
+    pages wait in the queue; submit() blocks when the queue is full.
+    """
+
+    def __init__(self, max_workers: int = MAX_OCR_WORKERS, max_pending: int = MAX_PENDING_PAGES,
+                 cache: Optional[OcrCache] = None):
+        self.cache = cache or OcrCache()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, images: List[bytes], language: str = OCR_LANGUAGE) -> Future:
+        """Queue one page for OCR; cached pages resolve immediately"""
+        key = page_hash(images)
+        cached = self.cache.get(key)
+        if cached:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        with self._lock:
+            # The same scanned page may appear in several documents
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            future = self._in_flight[key] = Future()
+
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._run, key, images, language, future)
+        except Exception as e:
+            self._release(key)
+            if not future.done():
+                future.set_exception(e)
+        return future
+
+    def _run(self, key: str, images: List[bytes], language: str, future: Future) -> None:
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+            text, complete = _recognize(images, language)
+            # Empty or partial results are retried the next time instead of being cached
+            if text and complete:
+                self.cache.set(key, text)
+            future.set_result(text)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            self._release(key)
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+        self._slots.release()
+
+
+_pool: Optional[OcrPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> OcrPool:
+    """Return the process-wide OCR pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OcrPool()
+        return _pool
+
+
+class OcrJob:
+    """OCR of the scanned pages of one document, running in the shared pool"""
+
+    def __init__(self, futures: Dict[int, Future]):
+        self.futures = futures
+
+    @property
+    def progress(self) -> float:
+        if not self.futures:
+            return 1.0
+        return sum(future.done() for future in self.futures.values()) / len(self.futures)
+
+    def done(self) -> bool:
+        return all(future.done() for future in self.futures.values())
+
+    def cancel(self) -> None:
+        for future in self.futures.values():
+            future.cancel()
+
+    def result(self, timeout: Optional[float] = None) -> Dict[int, str]:
+        """Wait for every page and return the recognized text by page number"""
+        texts = {}
+        for page_number, future in self.futures.items():
+            try:
+                texts[page_number] = future.result(timeout=timeout)
+            except Exception as e:
+                logger.error(f"OCR failed for page {page_number}: {str(e)}")
+        return texts
+
+
+def submit_ocr_job(pages: Dict[int, object]) -> Optional[OcrJob]:
+    """
+    Queue the given PyPDF2 pages (by page number) for OCR.
+    Returns None when OCR is not installed.
+    """
+    if not ocr_available():
+        return None
+
+    pool = get_ocr_pool()
+    futures = {}
+    for page_number, page in pages.items():
+        images = get_page_images(page)
+        if images:
+            futures[page_number] = pool.submit(images)
+    return OcrJob(futures)
+
+
+def ocr_missing_pages(file_path: PdfData, page_texts: List[str]) -> List[str]:
+    """
+    Fill in the text of scanned pages of a document (a path or a PDF buffer)
+    through the OCR pool. Pages that already have text are returned unchanged.
+    """
+    candidates = [page_number for page_number, page_text in enumerate(page_texts)
+                  if len(page_text.strip()) < MIN_TEXT_CHARS]
+    if not candidates:
+        return page_texts
+
+    page_texts = list(page_texts)
+    with pdf_reader(file_path) as reader:
+        scanned_pages = {page_number: reader.pages[page_number] for page_number in candidates
+                         if page_number < len(reader.pages)
+                         and is_image_only_page(reader.pages[page_number], page_texts[page_number])}
+        if not scanned_pages:
+            return page_texts
+
+        job = submit_ocr_job(scanned_pages)
+        if job is None:
+            logger.info(f"{len(scanned_pages)} scanned pages in {source_label(file_path)} skipped, "
+                        f"OCR is not installed")
+            return page_texts
+
+    for page_number, page_text in job.result().items():
+        if page_text:
+            page_texts[page_number] = page_text
+    return page_texts
@@ -0,0 +1,382 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.ocr import ocr_missing_pages
+from utils.pdf_backends import extract_pages
+from utils.pdf_processor import file_sha256
+from utils.query import And, Node, Not, Or, Phrase, QuerySyntaxError, Term, parse_query
+from utils.search import normalize_greek_text
+from utils.search_cache import SEARCH_CACHE, SearchCache
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = "attached_assets"
+DEFAULT_PAGE_DB_PATH = "data/pages.sqlite3"
+SNIPPET_RADIUS = 80
+MAX_PAGE_HITS = 50
+
+
+def fold_page_text(text: str) -> str:
+    """normalize_greek_text, also folding the micro sign that several assets use for μ"""
+    return normalize_greek_text(text).replace('\u00b5', '\u03bc')
+
+
+def _fts_string(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _leaf_text(node: Node) -> str:
+    # The word as typed: a Greeklish query word is looked up in the article index by its
+    # key, but the pages hold the Latin word itself
+    return fold_page_text(node.typed)
+
+
+def _page_expression(node: Node) -> Optional[str]:
+    """
+    The FTS5 expression of a query plan node, or None when the trigram index
+    cannot express it: words shorter than three characters have no trigrams,
+    and NOT needs something to subtract from. Field prefixes do not apply to
+    pages and are ignored.
+    """
+    if isinstance(node, (Term, Phrase)):
+        text = _leaf_text(node)
+        return _fts_string(text) if len(text) >= 3 else None
+    if isinstance(node, And):
+        positive = [_page_expression(child) for child in node.children if not isinstance(child, Not)]
+        negative = [_page_expression(child.child) for child in node.children if isinstance(child, Not)]
+        if not positive or None in positive or None in negative:
+            return None
+        expression = ' AND '.join(positive)
+        for negated in negative:
+            expression = f"({expression}) NOT {negated}"
+        return f"({expression})"
+    if isinstance(node, Or):
+        children = [_page_expression(child) for child in node.children]
+        if None in children:
+            return None
+        return '(' + ' OR '.join(children) + ')'
+    return None
+
+
+def _like_condition(node: Node) -> Tuple[str, List[str]]:
+    """A node as a LIKE condition over the folded page text, for what FTS5 cannot express"""
+    if isinstance(node, (Term, Phrase)):
+        text = _leaf_text(node)
+        return ("pages_fts.text LIKE ? ESCAPE '\\'",
+                ['%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'])
+    if isinstance(node, Not):
+        condition, params = _like_condition(node.child)
+        return f"NOT ({condition})", params
+    conditions, params = [], []
+    for child in node.children:
+        condition, child_params = _like_condition(child)
+        conditions.append(f"({condition})")
+        params += child_params
+    return (' AND ' if isinstance(node, And) else ' OR ').join(conditions), params
+
+
+def _positive_words(node: Node, words: List[str]) -> None:
+    if isinstance(node, (Term, Phrase)):
+        words.append(_leaf_text(node))
+    elif isinstance(node, (And, Or)):
+        for child in node.children:
+            _positive_words(child, words)
+
+
+def page_query(query: str) -> Tuple[Optional[str], List[Tuple[str, List[str]]], List[str]]:
+    """
+    (FTS5 MATCH expression, LIKE conditions with their parameters, words for
+    the snippet) of a query in the language of utils.query. Every part of a
+    top-level AND the trigram index can express goes into the MATCH; the rest
+    is matched with LIKE on the pages the MATCH leaves. A query with nothing
+    to look for (only NOT) yields neither.
+    """
+    plan = parse_query(query)
+    if plan is None:
+        return None, [], []
+    conjuncts = plan.children if isinstance(plan, And) else [plan]
+    matched, negated, likes = [], [], []
+    for conjunct in conjuncts:
+        expression = _page_expression(conjunct.child if isinstance(conjunct, Not) else conjunct)
+        if isinstance(conjunct, Not):
+            negated.append((conjunct, expression))
+        elif expression is not None:
+            matched.append(expression)
+        else:
+            likes.append(_like_condition(conjunct))
+    if not matched and not likes:
+        return None, [], []
+
+    expression = ' AND '.join(matched) or None
+    for conjunct, negated_expression in negated:
+        if expression is not None and negated_expression is not None:
+            expression = f"({expression}) NOT {negated_expression}"
+        else:
+            likes.append(_like_condition(conjunct))
+    words: List[str] = []
+    _positive_words(plan, words)
+    return expression, likes, [word for word in words if word]
+
+
+def make_snippet(text: str, words: List[str], radius: int = SNIPPET_RADIUS) -> str:
+    """Text around the first query word found in the page, on a single line"""
+    normalized = fold_page_text(text)
+    positions = [normalized.find(word) for word in words]
+    positions = [position for position in positions if position >= 0]
+    position = min(positions) if positions else 0
+    # Accent folding keeps one character per character for the scripts in these PDFs;
+    # if it ever does not, cut the folded text rather than misalign the raw one
+    source = text if len(normalized) == len(text) else normalized
+    start = max(0, position - radius)
+    end = min(len(source), position + radius)
+    snippet = ' '.join(source[start:end].split())
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(source) else '')
+
+
+class PageIndex:
+    """
+    Full-text index of the raw text of every page of every PDF in a directory,
+    for documents (or parts of documents) the article parser does not cover.
+
+    Pages are stored in SQLite with an FTS5 trigram index over the accent-folded
+    text, like SqliteRepository. update() is incremental: a file is re-extracted
+    only when its mtime or size changed and its sha256 differs from the indexed one.
+
+    Pages are keyed by the sha256 of their file, so identical PDFs stored under
+    several names are extracted and indexed once and returned as a single hit.
+    """
+
+    # Bumped when the layout changes; the index is derived data, so it is rebuilt
+    SCHEMA_VERSION = 2
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            path TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            backend TEXT,
+            pages INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents(sha256);
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            text TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_pages_sha256 ON pages(sha256, page);
+        CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(text, tokenize='trigram');
+    """
+
+    def __init__(self, db_path: str = DEFAULT_PAGE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._update_lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS pages; "
+                                   "DROP TABLE IF EXISTS pages_fts;")
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def documents(self) -> List[Dict]:
+        rows = self._connection().execute(
+            "SELECT path, mtime, size, sha256, backend, pages FROM documents ORDER BY path")
+        return [dict(row) for row in rows]
+
+    @property
+    def version(self) -> str:
+        """Changes whenever a document is indexed, replaced or removed"""
+        digest = hashlib.sha256()
+        for row in self._connection().execute("SELECT path, sha256 FROM documents ORDER BY path"):
+            digest.update(f"{row['path']}\0{row['sha256']}\n".encode('utf-8'))
+        return f"pages:{digest.hexdigest()[:16]}"
+
+    def _iter_pdfs(self, directory: str) -> Iterator[str]:
+        for path in sorted(Path(directory).glob("*.pdf")):
+            yield str(path)
+
+    def update(self, directory: str = ASSETS_DIR, ocr: bool = True) -> Dict[str, int]:
+        """
+        Bring the index in line with the PDFs in directory and return counts of
+        indexed, unchanged and removed files. Concurrent calls run one at a time.
+        """
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        with self._update_lock:
+            known = {row['path']: row for row in self.documents()}
+            seen = set()
+            for path in self._iter_pdfs(directory):
+                seen.add(path)
+                try:
+                    if self._update_file(path, known.get(path), ocr):
+                        stats['indexed'] += 1
+                    else:
+                        stats['unchanged'] += 1
+                except Exception as e:
+                    logger.error(f"Error indexing pages of {path}: {str(e)}")
+
+            directory_prefix = str(Path(directory)) + os.sep
+            for path in known:
+                if path.startswith(directory_prefix) and path not in seen:
+                    self.remove_file(path)
+                    stats['removed'] += 1
+        logger.info(f"Page index update of {directory}: {stats}")
+        return stats
+
+    def _update_file(self, path: str, known: Optional[Dict], ocr: bool) -> bool:
+        """Re-index one file if its content changed; returns whether it was indexed"""
+        stat = os.stat(path)
+        if known and known['mtime'] == stat.st_mtime and known['size'] == stat.st_size:
+            return False
+
+        sha256 = file_sha256(path)
+        if known and known['sha256'] == sha256:
+            # Touched but identical: remember the new mtime so the hash is not recomputed
+            with self._connection() as conn:
+                conn.execute("UPDATE documents SET mtime = ?, size = ? WHERE path = ?",
+                             (stat.st_mtime, stat.st_size, path))
+            return False
+
+        with self._connection() as conn:
+            same_content = conn.execute("SELECT backend, pages FROM documents WHERE sha256 = ? LIMIT 1",
+                                        (sha256,)).fetchone()
+            if same_content is not None:
+                # Another name for a file that is already indexed: only record the path
+                self._delete(conn, path)
+                conn.execute(
+                    "INSERT INTO documents (path, mtime, size, sha256, backend, pages) VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, stat.st_mtime, stat.st_size, sha256, same_content['backend'], same_content['pages']))
+                logger.info(f"{path} has the same content as an indexed file, reusing its pages")
+                return True
+
+        backend, page_texts = extract_pages(path)
+        if backend is None:
+            logger.warning(f"No PDF backend could read {path}, skipping")
+            return False
+        if ocr:
+            page_texts = ocr_missing_pages(path, page_texts)
+        self._store(path, stat.st_mtime, stat.st_size, sha256, backend, page_texts)
+        return True
+
+    def _store(self, path: str, mtime: float, size: int, sha256: str, backend: str,
+               page_texts: List[str]) -> None:
+        with self._connection() as conn:
+            self._delete(conn, path)
+            for page_number, text in enumerate(page_texts, start=1):
+                if not text.strip():
+                    continue
+                cursor = conn.execute("INSERT INTO pages (sha256, page, text) VALUES (?, ?, ?)",
+                                      (sha256, page_number, text))
+                conn.execute("INSERT INTO pages_fts (rowid, text) VALUES (?, ?)",
+                             (cursor.lastrowid, fold_page_text(text)))
+            conn.execute(
+                "INSERT INTO documents (path, mtime, size, sha256, backend, pages) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, mtime, size, sha256, backend, len(page_texts)))
+        logger.info(f"Indexed {len(page_texts)} pages of {path} with {backend}")
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, path: str) -> None:
+        """Forget a path, and its pages once no other path has the same content"""
+        row = conn.execute("SELECT sha256 FROM documents WHERE path = ?", (path,)).fetchone()
+        conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+        if row is None:
+            return
+        if conn.execute("SELECT 1 FROM documents WHERE sha256 = ? LIMIT 1", (row['sha256'],)).fetchone() is None:
+            conn.execute("DELETE FROM pages_fts WHERE rowid IN (SELECT id FROM pages WHERE sha256 = ?)",
+                         (row['sha256'],))
+            conn.execute("DELETE FROM pages WHERE sha256 = ?", (row['sha256'],))
+
+    def remove_file(self, path: str) -> None:
+        with self._connection() as conn:
+            self._delete(conn, path)
+
+    def search(self, query: str, limit: int = MAX_PAGE_HITS) -> List[Dict[str, object]]:
+        """
+        Pages matching the query, best matches first. The query is parsed like
+        an article search (utils.query): words match as substrings after accent
+        folding, "phrases" as written, with AND, OR and NOT. Each hit has
+        document, path, page and snippet, and also_in lists other file names
+        with the same content.
+        """
+        if not query or not isinstance(query, str):
+            return []
+        try:
+            expression, likes, words = page_query(query)
+        except QuerySyntaxError:
+            return []
+        if expression is None and not likes:
+            return []
+
+        # Trigrams need three characters; shorter words and what contains them are matched with LIKE
+        conditions, params = [], []
+        if expression is not None:
+            conditions.append("pages_fts MATCH ?")
+            params.append(expression)
+        for condition, like_params in likes:
+            conditions.append(f"({condition})")
+            params += like_params
+        order = "pages_fts.rank" if expression is not None else "p.sha256, p.page"
+
+        try:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT p.sha256, p.page, p.text FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid "
+                f"WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT ?", params + [limit]).fetchall()
+            paths: Dict[str, List[str]] = {}
+            for sha256 in {row['sha256'] for row in rows}:
+                paths[sha256] = [document['path'] for document in conn.execute(
+                    "SELECT path FROM documents WHERE sha256 = ? ORDER BY path", (sha256,))]
+            return [{
+                'document': os.path.basename(paths[row['sha256']][0]),
+                'path': paths[row['sha256']][0],
+                'page': row['page'],
+                'snippet': make_snippet(row['text'], words),
+                'also_in': [os.path.basename(path) for path in paths[row['sha256']][1:]]
+            } for row in rows if paths[row['sha256']]]
+        except sqlite3.Error as e:
+            logger.error(f"Page search error: {str(e)}")
+            return []
+
+
+def cached_page_search(page_index: PageIndex, query: str, limit: int = MAX_PAGE_HITS,
+                       cache: SearchCache = SEARCH_CACHE) -> List[Dict[str, object]]:
+    """Run page_index.search(query) through the shared result cache, keyed on the page index version"""
+    key = cache.make_key(query, page_index.version, ('pages', limit))
+    return cache.get_or_compute(key, lambda: page_index.search(query, limit))
+
+
+_page_index: Optional[PageIndex] = None
+_page_index_lock = threading.Lock()
+
+
+def get_page_index(background_update: bool = True) -> PageIndex:
+    """
+    Return the process-wide page index. The first call starts an incremental
+    update of ASSETS_DIR in a background thread, so pages become searchable as
+    they are indexed instead of blocking the first request.
+    """
+    global _page_index
+    with _page_index_lock:
+        if _page_index is None:
+            _page_index = PageIndex(os.environ.get("PAGE_INDEX_DB_PATH", DEFAULT_PAGE_DB_PATH))
+            if background_update:
+                threading.Thread(target=_page_index.update, name="page-index-update", daemon=True).start()
+        return _page_index
@@ -0,0 +1,180 @@
+import io
+import logging
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pymupdf  # C-accelerated MuPDF bindings
+except ImportError:
+    pymupdf = None
+
+try:
+    from pdfminer.high_level import extract_pages as pdfminer_extract_pages
+    from pdfminer.layout import LAParams, LTTextContainer
+except ImportError:
+    pdfminer_extract_pages = None
+
+import PyPDF2
+
+from utils.pdf_pool import get_pdf_pool
+
+# Called once per extracted page; may raise ExtractionCancelled to stop the extraction
+PageCallback = Optional[Callable[[], None]]
+
+# A PDF given by path or by its bytes already in memory; buffers are read in place
+PdfData = Union[str, bytes, bytearray, memoryview]
+
+
+def open_pdf_stream(source: PdfData) -> BinaryIO:
+    """Binary stream over a PDF path or buffer, for readers that want a file object"""
+    if isinstance(source, str):
+        return open(source, 'rb')
+    # BytesIO shares an immutable bytes object until written to; other buffers are copied once
+    return io.BytesIO(source)
+
+
+def source_label(source: PdfData, name: Optional[str] = None) -> str:
+    """Name of a PDF source for logs and per-file backend preferences"""
+    if name:
+        return name
+    return source if isinstance(source, str) else f"<{len(source)} byte buffer>"
+
+
+class ExtractionCancelled(Exception):
+    """Raised from a page callback to abandon an extraction; never triggers a backend fallback"""
+
+
+def _pages(texts, on_page: PageCallback) -> List[str]:
+    pages = []
+    for text in texts:
+        pages.append(text)
+        if on_page is not None:
+            on_page()
+    return pages
+
+
+@contextmanager
+def pdf_reader(source: PdfData) -> Iterator[PyPDF2.PdfReader]:
+    """PyPDF2 reader of a PDF path (pooled, see utils.pdf_pool) or buffer, usable inside the block"""
+    if isinstance(source, str):
+        with get_pdf_pool().reader(source) as reader:
+            yield reader
+    else:
+        with open_pdf_stream(source) as file:
+            yield PyPDF2.PdfReader(file)
+
+
+def _extract_pypdf2(source: PdfData, on_page: PageCallback = None) -> List[str]:
+    """Pure-Python extraction, always available"""
+    with pdf_reader(source) as reader:
+        return _pages((page.extract_text() or '' for page in reader.pages), on_page)
+
+
+def _extract_pdfminer(source: PdfData, on_page: PageCallback = None) -> List[str]:
+    """pdfminer layout analysis, keeps the reading order of Greek text blocks"""
+    with open_pdf_stream(source) as file:
+        return _pages((''.join(element.get_text() for element in page_layout
+                               if isinstance(element, LTTextContainer))
+                       for page_layout in pdfminer_extract_pages(file, laparams=LAParams())), on_page)
+
+
+@contextmanager
+def _pymupdf_document(source: PdfData):
+    if isinstance(source, str):
+        with get_pdf_pool().document(source) as document:
+            yield document
+    else:
+        # MuPDF reads a buffer in place, without copying it
+        with pymupdf.open(stream=source, filetype="pdf") as document:
+            yield document
+
+
+def _extract_pymupdf(source: PdfData, on_page: PageCallback = None) -> List[str]:
+    """MuPDF extraction, by far the fastest when installed"""
+    # Content-stream order rather than sort=True: sorting by position interleaves
+    # the lines of two-column pages such as the 2024 Penal Code
+    with _pymupdf_document(source) as document:
+        return _pages((page.get_text("text") for page in document), on_page)
+
+
+def count_pages(source: PdfData) -> int:
+    """Number of pages of a PDF, without extracting any text"""
+    if pymupdf is not None:
+        with _pymupdf_document(source) as document:
+            return document.page_count
+    with pdf_reader(source) as reader:
+        return len(reader.pages)
+
+
+# name -> (extractor, availability check)
+BACKENDS: Dict[str, Tuple[Callable[[PdfData, PageCallback], List[str]], Callable[[], bool]]] = {
+    'pymupdf': (_extract_pymupdf, lambda: pymupdf is not None),
+    'pdfminer': (_extract_pdfminer, lambda: pdfminer_extract_pages is not None),
+    'pypdf2': (_extract_pypdf2, lambda: True),
+}
+
+# Preferred order when no backend is requested; pypdf2 is the last resort
+DEFAULT_BACKEND_ORDER = ['pymupdf', 'pdfminer', 'pypdf2']
+
+# Per-file preferences, matched against the lowercased filename
+FILE_BACKENDS: Dict[str, str] = {}
+
+
+def available_backends() -> List[str]:
+    """Names of the installed backends in preference order"""
+    return [name for name in DEFAULT_BACKEND_ORDER if BACKENDS[name][1]()]
+
+
+def select_backends(file_path: str, preferred: Optional[str] = None) -> List[str]:
+    """
+    Return the backends to try for a file, most preferred first.
+    An explicit preference wins over FILE_BACKENDS, which wins over the default order.
+    """
+    filename = os.path.basename(file_path).lower()
+    if preferred is None:
+        for key, backend in FILE_BACKENDS.items():
+            if key in filename:
+                preferred = backend
+                break
+
+    order = available_backends()
+    if preferred:
+        if preferred not in BACKENDS:
+            logger.warning(f"Unknown PDF backend '{preferred}', using defaults")
+        elif preferred in order:
+            order.remove(preferred)
+            order.insert(0, preferred)
+        else:
+            logger.warning(f"PDF backend '{preferred}' is not installed, using defaults")
+    return order
+
+
+def extract_pages(source: PdfData, backend: Optional[str] = None, on_page: PageCallback = None,
+                  name: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    Extract the text of every page of a PDF path or buffer, falling back to the
+    next backend when one fails or returns no text at all. Returns
+    (backend_name, page_texts). on_page is called after each page, so a
+    fallback reports the pages again. name stands for the file name of a buffer.
+    """
+    label = source_label(source, name)
+    blank_result = (None, [])
+    for backend_name in select_backends(label, backend):
+        extractor = BACKENDS[backend_name][0]
+        try:
+            pages = extractor(source, on_page)
+        except ExtractionCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"PDF backend {backend_name} failed for {label}: {str(e)}")
+            continue
+        if any(page.strip() for page in pages):
+            return backend_name, pages
+        logger.info(f"PDF backend {backend_name} found no text in {label}, trying next backend")
+        if blank_result[0] is None:
+            # Keep the page count so scanned documents can still go through OCR
+            blank_result = (backend_name, pages)
+    return blank_result
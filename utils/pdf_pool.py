@@ -0,0 +1,192 @@
+"""
+Process-wide pool of open PDF readers.
+
+Opening a PDF parses its cross-reference table, which for the large assets
+costs far more than reading a page. The pool keeps recently used files open
+so page lookups (page ranges, OCR of scanned pages, repeated extraction) skip
+that step. PyPDF2 readers work on a read-only memory map of the file rather
+than a buffered file object, and MuPDF documents keep their own handle.
+
+Entries are keyed by path, mtime and size, so a file that changes on disk is
+reopened. The least recently used entries are closed when the pool goes over
+MAX_OPEN_FILES file descriptors or MAX_MAPPED_BYTES of mapped files; an entry
+in use is closed when it is released. Readers are not thread-safe, so each
+entry is used by one thread at a time.
+"""
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import PyPDF2
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+MAX_OPEN_FILES = int(os.environ.get("PDF_POOL_MAX_FILES", 16))
+MAX_MAPPED_BYTES = int(os.environ.get("PDF_POOL_MAX_BYTES", 512 * 1024 * 1024))
+
+PoolKey = Tuple[str, int, int]
+
+
+class PooledPdf:
+    """One open file: a memory map with a PyPDF2 reader, and a MuPDF document, both opened on first use"""
+
+    def __init__(self, path: str, key: PoolKey):
+        self.path = path
+        self.key = key
+        self.size = key[2]
+        self.lock = threading.Lock()
+        self.users = 0
+        self.evicted = False
+        self._map: Optional[mmap.mmap] = None
+        self._reader: Optional[PyPDF2.PdfReader] = None
+        self._document = None
+
+    @property
+    def open_files(self) -> int:
+        return (self._map is not None) + (self._document is not None)
+
+    @property
+    def mapped_bytes(self) -> int:
+        return self.size if self._map is not None else 0
+
+    def reader(self) -> PyPDF2.PdfReader:
+        if self._reader is None:
+            with open(self.path, 'rb') as file:
+                # The map keeps its own duplicate of the descriptor
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._reader = PyPDF2.PdfReader(self._map)
+        return self._reader
+
+    def document(self):
+        if self._document is None:
+            self._document = pymupdf.open(self.path)
+        return self._document
+
+    def close(self) -> None:
+        self._reader = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+
+
+class PdfReaderPool:
+    def __init__(self, max_open_files: int = MAX_OPEN_FILES, max_mapped_bytes: int = MAX_MAPPED_BYTES):
+        self.max_open_files = max_open_files
+        self.max_mapped_bytes = max_mapped_bytes
+        self._entries: "OrderedDict[str, PooledPdf]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(path: str) -> PoolKey:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def _acquire(self, path: str) -> PooledPdf:
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None and entry.key != key:
+                # The file changed on disk: retire the old entry
+                self._retire(self._entries.pop(key[0]))
+                entry = None
+            if entry is None:
+                self.misses += 1
+                entry = self._entries[key[0]] = PooledPdf(key[0], key)
+            else:
+                self.hits += 1
+            self._entries.move_to_end(key[0])
+            entry.users += 1
+            return entry
+
+    def _release(self, entry: PooledPdf) -> None:
+        with self._lock:
+            entry.users -= 1
+            if entry.evicted and entry.users == 0:
+                entry.close()
+            self._evict()
+
+    def _retire(self, entry: PooledPdf) -> None:
+        entry.evicted = True
+        if entry.users == 0:
+            entry.close()
+        self.evictions += 1
+
+    def _evict(self) -> None:
+        """Close least recently used entries until the pool fits its budgets"""
+        for path in list(self._entries):
+            open_files = sum(entry.open_files for entry in self._entries.values())
+            mapped = sum(entry.mapped_bytes for entry in self._entries.values())
+            if open_files <= self.max_open_files and mapped <= self.max_mapped_bytes:
+                return
+            entry = self._entries[path]
+            if entry.users == 0:
+                del self._entries[path]
+                self._retire(entry)
+
+    @contextmanager
+    def _use(self, path: str) -> Iterator[PooledPdf]:
+        entry = self._acquire(path)
+        try:
+            with entry.lock:
+                yield entry
+        finally:
+            self._release(entry)
+
+    @contextmanager
+    def reader(self, path: str) -> Iterator[PyPDF2.PdfReader]:
+        """A PyPDF2 reader over a memory map of path, for exclusive use inside the block"""
+        with self._use(path) as entry:
+            yield entry.reader()
+
+    @contextmanager
+    def document(self, path: str):
+        """A MuPDF document of path, for exclusive use inside the block"""
+        if pymupdf is None:
+            raise RuntimeError("pymupdf is not installed")
+        with self._use(path) as entry:
+            yield entry.document()
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                self._retire(entry)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'open_files': sum(entry.open_files for entry in self._entries.values()),
+                'mapped_bytes': sum(entry.mapped_bytes for entry in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+_pool: Optional[PdfReaderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> PdfReaderPool:
+    """Return the process-wide reader pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PdfReaderPool()
+        return _pool
@@ -1,32 +1,154 @@
-import PyPDF2
+import hashlib
 import re
-from typing import List, Dict, Optional, Tuple
+import tempfile
+import unicodedata
+from typing import BinaryIO, Iterable, List, Dict, Optional, Tuple, Union
 import logging
 from pathlib import Path
 import os
+from utils.article import Article
+from utils.ocr import ocr_missing_pages
+from utils.pdf_backends import ExtractionCancelled, PageCallback, PdfData, extract_pages, source_label
+from utils.search import normalize_greek_text
 
 logger = logging.getLogger(__name__)
 
-def process_pdf(file_path: str) -> Optional[str]:
+# Streams larger than this are spooled to a temporary file instead of memory
+SPILL_THRESHOLD = int(os.environ.get("PDF_SPILL_BYTES", 32 * 1024 * 1024))
+READ_CHUNK_SIZE = 1 << 20
+
+# Anything the ingestion functions accept: a path, a buffer or a binary file object
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# Article and heading lines of extracted law texts
+ARTICLE_PATTERN = re.compile(r'(?:Άρθρο|ΑΡΘΡΟ)\s+(\d+[α-ω]?)\s*[-–]\s*(.+?)(?=\n|$)', re.IGNORECASE)
+HEADING_PATTERN = re.compile(r'(?:ΚΕΦΑΛΑΙΟ|ΜΕΡΟΣ|ΤΜΗΜΑ|ΤΙΤΛΟΣ)\s+[ΑΒΓΔ\d]+\s*[-–]\s*(.+?)(?=\n|$)', re.IGNORECASE)
+
+
+class LoadedPdf:
+    """
+    A PDF ready for extraction, with the sha256 of its content.
+
+    data is a view of the caller's buffer when there is one (no copy), the
+    bytes read from a stream otherwise, or None when the PDF is on disk at
+    path: a path source, or a stream larger than the spill threshold that was
+    spooled to a temporary file. close() releases the view and deletes the
+    temporary file.
+    """
+
+    def __init__(self, name: str, sha256: str, size: int, data: Optional[memoryview] = None,
+                 path: Optional[str] = None, temporary: bool = False):
+        self.name = name
+        self.sha256 = sha256
+        self.size = size
+        self.data = data
+        self.path = path
+        self.temporary = temporary
+
+    @property
+    def source(self) -> PdfData:
+        return self.data if self.data is not None else self.path
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+        if self.temporary and self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self) -> "LoadedPdf":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def load_pdf(source: PdfSource, name: Optional[str] = None, spill_threshold: int = SPILL_THRESHOLD) -> LoadedPdf:
+    """
+    Prepare a PDF given as a path, bytes, memoryview or binary file object,
+    hashing it on the way. Buffers, and file objects that expose theirs
+    (io.BytesIO, Streamlit uploads), are used in place; other streams are read
+    once in chunks, into memory or, past spill_threshold, into a temporary file.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        return LoadedPdf(name or os.path.basename(path), file_sha256(path), os.path.getsize(path), path=path)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+    elif hasattr(source, 'getbuffer'):
+        view = source.getbuffer()
+    else:
+        return _read_stream(source, name or os.path.basename(getattr(source, 'name', '') or ''), spill_threshold)
+    view = view.cast('B') if view.format != 'B' or view.ndim != 1 else view
+    return LoadedPdf(name or '', hashlib.sha256(view).hexdigest(), view.nbytes, data=view)
+
+
+def _read_stream(stream: BinaryIO, name: str, spill_threshold: int) -> LoadedPdf:
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    spill = None
+    try:
+        for chunk in iter(lambda: stream.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            if spill is not None:
+                spill.write(chunk)
+                continue
+            buffer += chunk
+            if len(buffer) > spill_threshold:
+                spill = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", delete=False)
+                spill.write(buffer)
+                buffer = bytearray()
+    finally:
+        if spill is not None:
+            spill.close()
+    if spill is not None:
+        logger.info(f"Spooled {name or 'upload'} to {spill.name}")
+        return LoadedPdf(name, digest.hexdigest(), os.path.getsize(spill.name), path=spill.name, temporary=True)
+    return LoadedPdf(name, digest.hexdigest(), len(buffer), data=memoryview(buffer))
+
+
+def process_pdf(file_path: PdfData, ocr: bool = True, backend: Optional[str] = None,
+                on_page: PageCallback = None, name: Optional[str] = None) -> Optional[str]:
     """
-    Process PDF files and extract complete text with enhanced Greek character support
+    Process PDF files and extract complete text with enhanced Greek character support.
+    file_path may also be the PDF's bytes (see load_pdf for streams), with name as its file name.
+    The extraction backend is chosen per file (see utils.pdf_backends), and scanned
+    pages without a text layer are sent to the OCR pool when it is available.
+    on_page is called after each extracted page (see utils.pdf_backends.extract_pages).
     """
-    text = ""
+    label = source_label(file_path, name)
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
+        backend_used, page_texts = extract_pages(file_path, backend, on_page, name)
+        if backend_used is None:
+            logger.error(f"No PDF backend could read {label}")
+            return None
+        if ocr:
+            page_texts = ocr_missing_pages(file_path, page_texts)
+    except ExtractionCancelled:
+        raise
     except Exception as e:
-        logger.error(f"Error processing PDF {file_path}: {str(e)}")
+        logger.error(f"Error processing PDF {label}: {str(e)}")
         return None
 
+    text = "".join(page_text + "\n\n" for page_text in page_texts if page_text)
+
     # Clean and normalize text
     text = clean_text(text)
     return text
 
+def file_sha256(file_path: str) -> str:
+    """Content hash of a file, used to recognize the same PDF under different names"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 def clean_text(text: str) -> str:
     """
     Enhanced text cleaning with better Greek support and formatting
@@ -47,37 +169,54 @@ def clean_text(text: str) -> str:
 
     return text.strip()
 
+def _filename_key(text: str) -> str:
+    """Accent- and case-folded form of a filename, with final sigmas and separators unified"""
+    text = normalize_greek_text(unicodedata.normalize('NFC', text)).replace('ς', 'σ')
+    return re.sub(r'[\s_-]+', ' ', text)
+
+
+FILENAME_RULES = {
+    'ποινικοσ κωδικασ': ('ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ', ''),
+    'ναρκωτικων': ('ΝΑΡΚΩΤΙΚΑ', 'Διακίνηση και Κατοχή'),
+    'οπλων': ('ΟΠΛΑ', 'Οπλοκατοχή'),
+    'κατοικιδια': ('ΝΟΜΟΣ ΠΕΡΙ ΚΑΤΟΙΚΙΔΙΩΝ', 'Βασικές Διατάξεις'),
+    'ενδοοικογενειακησ': ('ΕΝΔΟΟΙΚΟΓΕΝΕΙΑΚΗ ΒΙΑ', 'Βασικές Διατάξεις'),
+    'δικονομιασ': ('ΠΟΙΝΙΚΗ ΔΙΚΟΝΟΜΙΑ', 'Γενικές Διατάξεις'),
+    'poinikoi nomoi': ('ΕΙΔΙΚΟΙ ΠΟΙΝΙΚΟΙ ΝΟΜΟΙ', 'Γενικές Διατάξεις')
+}
+
 def get_category_from_filename(filename: str) -> Tuple[str, str]:
     """
-    Determine the main category and subcategory based on filename
-    """
-    filename = filename.lower()
-    categories = {
-        'ποινικοσ κωδικασ': ('ΠΟΙΝΙΚΟΣ ΚΩΔΙΚΑΣ', ''),
-        'ναρκωτικων': ('ΝΑΡΚΩΤΙΚΑ', 'Διακίνηση και Κατοχή'),
-        'οπλων': ('ΟΠΛΑ', 'Οπλοκατοχή'),
-        'κατοικιδια': ('ΝΟΜΟΣ ΠΕΡΙ ΚΑΤΟΙΚΙΔΙΩΝ', 'Βασικές Διατάξεις'),
-        'ενδοοικογενειακης': ('ΕΝΔΟΟΙΚΟΓΕΝΕΙΑΚΗ ΒΙΑ', 'Βασικές Διατάξεις'),
-        'δικονομιασ': ('ΠΟΙΝΙΚΗ ΔΙΚΟΝΟΜΙΑ', 'Γενικές Διατάξεις'),
-        'poinikoi_nomoi': ('ΕΙΔΙΚΟΙ ΠΟΙΝΙΚΟΙ ΝΟΜΟΙ', 'Γενικές Διατάξεις')
-    }
-
-    for key, (category, subcategory) in categories.items():
+    Determine the main category and subcategory based on filename.
+    Returns ('', 'Βασικές Διατάξεις') when no rule matches.
+    """
+    filename = _filename_key(filename)
+    for key, (category, subcategory) in FILENAME_RULES.items():
         if key in filename:
             return category, subcategory
     return '', 'Βασικές Διατάξεις'
 
-def process_pdf_to_articles(file_path: str) -> List[Dict[str, str]]:
+def process_pdf_to_articles(file_path: PdfSource, backend: Optional[str] = None,
+                            name: Optional[str] = None) -> List[Article]:
     """
-    Process a PDF file and return structured articles with complete content
+    Process a PDF file (or buffer or stream, named by name) and return structured articles with complete content
     """
-    text = process_pdf(file_path)
-    if not text:
-        return []
+    with load_pdf(file_path, name) as pdf:
+        text = process_pdf(pdf.source, backend=backend, name=pdf.name)
+        if not text:
+            return []
+        return split_articles(text, pdf.name)
 
-    # Get the base category from filename
-    filename = os.path.basename(file_path)
-    main_category, default_subcategory = get_category_from_filename(filename)
+def split_articles(text: str, filename: str, placement: Optional[Tuple[str, str]] = None,
+                   classifier=None) -> List[Article]:
+    """
+    Split extracted PDF text into articles. placement is the (category,
+    default subcategory) of the file, from the filename when not given.
+    Headings set the subcategory of the articles that follow them; with a
+    classifier, articles left with an empty subcategory get the closest
+    subcategory of their category.
+    """
+    main_category, default_subcategory = placement or get_category_from_filename(filename)
 
     articles = []
     current_article = None
@@ -86,22 +225,18 @@ def process_pdf_to_articles(file_path: str) -> List[Dict[str, str]]:
     # Split text into sections
     sections = text.split('\n\n')
 
-    # Patterns for article and category detection
-    article_pattern = re.compile(r'(?:Άρθρο|ΑΡΘΡΟ)\s+(\d+[α-ω]?)\s*[-–]\s*(.+?)(?=\n|$)', re.IGNORECASE)
-    category_pattern = re.compile(r'(?:ΚΕΦΑΛΑΙΟ|ΜΕΡΟΣ|ΤΜΗΜΑ|ΤΙΤΛΟΣ)\s+[ΑΒΓΔ\d]+\s*[-–]\s*(.+?)(?=\n|$)', re.IGNORECASE)
-
     for section in sections:
         if not section.strip():
             continue
 
         # Check for category headers
-        category_match = category_pattern.search(section)
+        category_match = HEADING_PATTERN.search(section)
         if category_match:
             current_subcategory = category_match.group(1).strip()
             continue
 
         # Check for article headers
-        article_match = article_pattern.search(section)
+        article_match = ARTICLE_PATTERN.search(section)
         if article_match:
             if current_article and current_article['content'].strip():
                 articles.append(current_article)
@@ -127,34 +262,85 @@ def process_pdf_to_articles(file_path: str) -> List[Dict[str, str]]:
     if current_article and current_article['content'].strip():
         articles.append(current_article)
 
-    return articles
+    unplaced = [article for article in articles if not article['subcategory']]
+    if unplaced and classifier is not None:
+        for article, subcategory in zip(unplaced, classifier.classify_articles(main_category, unplaced)):
+            article['subcategory'] = subcategory or 'Βασικές Διατάξεις'
 
-def process_multiple_pdfs(pdf_directory: str) -> Dict[str, List[Dict[str, str]]]:
+    return [Article.from_dict(article) for article in articles]
+
+def process_multiple_pdfs(pdf_directory: str) -> Dict[str, Dict[str, List[Article]]]:
     """
     Process all PDFs in a directory and organize articles by category
     """
-    all_articles = {}
-    pdf_dir = Path(pdf_directory)
+    return process_pdf_sources((pdf_file.name, str(pdf_file)) for pdf_file in Path(pdf_directory).glob("*.pdf"))
 
-    for pdf_file in pdf_dir.glob("*.pdf"):
-        try:
-            logger.info(f"Processing {pdf_file}")
-            articles = process_pdf_to_articles(str(pdf_file))
 
-            # Organize articles by their determined categories
-            for article in articles:
-                category = article["category"]
-                if category not in all_articles:
-                    all_articles[category] = {}
+def process_pdf_sources(sources: Iterable[Tuple[str, PdfSource]], on_page: PageCallback = None,
+                        classifier=None) -> Dict[str, Dict[str, List[Article]]]:
+    """
+    Process (file name, PDF) pairs and organize their articles by category.
+    Each PDF may be a path, a buffer or a binary stream (see load_pdf).
+
+    The texts are extracted one by one first. A matching filename rule decides
+    the category of a file; all other files are classified by content together,
+    in one matrix product against the category centroids of classifier (by
+    default the one over the current corpus, see utils.classifier).
+    """
+    texts_by_hash = {}
+    documents = []
 
-                subcategory = article["subcategory"]
-                if subcategory not in all_articles[category]:
-                    all_articles[category][subcategory] = []
+    for filename, source in sources:
+        try:
+            # Identical files under different names are extracted once; each
+            # name is still placed on its own
+            with load_pdf(source, filename) as pdf:
+                if pdf.sha256 in texts_by_hash:
+                    logger.info(f"Reusing the extracted text of an identical file for {filename}")
+                else:
+                    logger.info(f"Processing {filename}")
+                    texts_by_hash[pdf.sha256] = process_pdf(pdf.source, on_page=on_page, name=filename)
+            text = texts_by_hash[pdf.sha256]
+            if text:
+                documents.append((filename, text))
+
+        except ExtractionCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing {filename}: {str(e)}")
+            continue
 
-                all_articles[category][subcategory].append(article)
+    if classifier is None:
+        # numpy and scipy are only loaded once something is ingested
+        from utils.classifier import get_category_classifier
+        classifier = get_category_classifier()
+    placements = [get_category_from_filename(filename) for filename, _ in documents]
+    unmatched = [position for position, (category, _) in enumerate(placements) if not category]
+    if unmatched and classifier is not None:
+        predictions = classifier.classify([documents[position][1] for position in unmatched])
+        for position, (category, score) in zip(unmatched, predictions):
+            logger.info(f"Classified {documents[position][0]} as '{category}' (score {score:.2f})")
+            if category:
+                placements[position] = (category, '')
 
+    all_articles = {}
+    for (filename, text), placement in zip(documents, placements):
+        try:
+            articles = split_articles(text, filename, placement, classifier)
         except Exception as e:
-            logger.error(f"Error processing {pdf_file}: {str(e)}")
+            logger.error(f"Error processing {filename}: {str(e)}")
             continue
 
-    return all_articles
\ No newline at end of file
+        # Organize articles by their determined categories
+        for article in articles:
+            category = article["category"]
+            if category not in all_articles:
+                all_articles[category] = {}
+
+            subcategory = article["subcategory"]
+            if subcategory not in all_articles[category]:
+                all_articles[category][subcategory] = []
+
+            all_articles[category][subcategory].append(article)
+
+    return all_articles
@@ -0,0 +1,300 @@
+"""
+Structured penalty facets and a columnar index to filter articles by them.
+
+parse_penalty() reads the free-text penalty of an article ("Φυλάκιση μέχρι 2
+έτη", "Διοικητικό πρόστιμο 700 ευρώ και αφαίρεση διπλώματος για 60 ημέρες")
+into its penalty types, the imprisonment range in days, the fine range in
+euros, the licence suspension in days and the offence class. Bounds a text
+leaves open take the general limits of the Penal Code (art. 53): φυλάκιση
+10 days to 5 years, κάθειρξη 5 to 15 years, ισόβια unbounded.
+
+PenaltyFacets holds the facets of every article of a corpus as NumPy columns,
+so a filter such as "fines of at least 700 euros" or "felonies in ΟΠΛΑ" is a
+handful of vectorized comparisons rather than a scan of the texts:
+
+    facets = PenaltyFacets.from_repository(repository)
+    facets.select(fine_at_least=700)
+    facets.select(offence_class='κακούργημα', category='ΟΠΛΑ')
+"""
+import math
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.search import normalize_greek_text
+
+# Penalty types, one bit each in PenaltyFacets.kinds
+IMPRISONMENT = 'φυλάκιση'
+CONFINEMENT = 'κάθειρξη'
+FINE = 'πρόστιμο'
+LICENCE = 'αφαίρεση διπλώματος'
+PENALTY_KINDS = (IMPRISONMENT, CONFINEMENT, FINE, LICENCE)
+KIND_BITS = {kind: 1 << position for position, kind in enumerate(PENALTY_KINDS)}
+
+# Offence classes in increasing severity; the code of a class is its position
+OFFENCE_CLASSES = ('', 'διοικητική παράβαση', 'πλημμέλημα', 'κακούργημα')
+
+DAYS_PER_UNIT = {'ετ': 365, 'χρον': 365, 'μην': 30, 'ημερ': 1}
+# General limits of the Penal Code, in days, for bounds the text leaves open
+STATUTORY_LIMITS = {
+    IMPRISONMENT: (10, 5 * 365),
+    CONFINEMENT: (5 * 365, 15 * 365)
+}
+LIFE = math.inf
+
+NUMBER_WORDS = {
+    'ενος': 1, 'ενα': 1, 'μιας': 1, 'μια': 1, 'δυο': 2, 'τριων': 3, 'τρια': 3, 'τρεις': 3,
+    'τεσσαρων': 4, 'τεσσερα': 4, 'πεντε': 5, 'εξι': 6, 'επτα': 7, 'εφτα': 7, 'οκτω': 8,
+    'εννεα': 9, 'δεκα': 10, 'δεκαπεντε': 15, 'εικοσι': 20
+}
+UPPER_BOUND = ('μεχρι', 'εως', 'το πολυ', 'κατω των')
+LOWER_BOUND = ('τουλαχιστον', 'απο', 'ανω των')
+
+# Matched on normalized (lowercase, accent-folded) text. "other" only ends the
+# previous penalty, so "αφαίρεση πινακίδων για 20 ημέρες" is not read as a licence suspension.
+_PENALTY_MENTION = re.compile(
+    r'(?P<life>ισοβι\w*(?: καθειρξ\w*)?)'
+    r'|(?P<confinement>καθειρξ\w*)'
+    r'|(?P<imprisonment>φυλακισ\w*)'
+    r'|(?P<fine>(?:διοικητικ\w* )?προστιμ\w*|χρηματικ\w* ποιν\w*)'
+    r'|(?P<licence>αφαιρεσ\w* (?:του )?(?:διπλωματ\w*|αδει\w* οδηγησ\w*|δικαιωματ\w* αποκτησ\w* αδει\w*))'
+    r'|(?P<other>αφαιρεσ\w*)')
+_QUANTITY = re.compile(
+    r'(?:\b(?P<op>' + '|'.join(UPPER_BOUND + LOWER_BOUND) + r')\s+)?'
+    r'(?P<number>\d[\d.,]*|\b(?:' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r')\b)'
+    # "ενός (1) έτους": the number may be repeated in digits before its unit
+    r'(?:\s*\(\d+\))?'
+    r'\s*(?P<unit>ετ\w*|χρον\w*|μην\w*|ημερ\w*|ευρω|€)?')
+_SENTENCES = re.compile(r'[^.;\n]*τιμωρειται[^.;\n]*')
+
+_KIND_OF_GROUP = {
+    'life': CONFINEMENT, 'confinement': CONFINEMENT, 'imprisonment': IMPRISONMENT,
+    'fine': FINE, 'licence': LICENCE
+}
+
+
+def _number(text: str) -> float:
+    if text in NUMBER_WORDS:
+        return float(NUMBER_WORDS[text])
+    # Greek notation: "300.000" thousands, "2,5" decimals
+    return float(text.replace('.', '').replace(',', '.') or 0)
+
+
+def _quantities(segment: str, euros: bool) -> List[Tuple[str, float]]:
+    """(bound, value) pairs of a penalty segment: bound is 'max', 'min' or 'exact', value in days or euros"""
+    quantities, pending = [], []
+    for match in _QUANTITY.finditer(segment):
+        op = match.group('op')
+        bound = 'max' if op in UPPER_BOUND else 'min' if op in LOWER_BOUND else 'exact'
+        unit = match.group('unit')
+        if unit is None:
+            # "από 300 έως 3.000 ευρώ": the unit of a range comes after its upper bound
+            pending = [(bound, match.group('number'))] if bound == 'min' else []
+            continue
+        if euros != (unit in ('ευρω', '€')):
+            pending = []
+            continue
+        scale = 1 if euros else next(days for prefix, days in DAYS_PER_UNIT.items() if unit.startswith(prefix))
+        for pending_bound, number in pending + [(bound, match.group('number'))]:
+            quantities.append((pending_bound, _number(number) * scale))
+        pending = []
+    return quantities
+
+
+def _bounds(quantities: List[Tuple[str, float]]) -> Tuple[Optional[float], Optional[float]]:
+    low = high = None
+    for bound, value in quantities:
+        if bound in ('min', 'exact'):
+            low = value if low is None else min(low, value)
+        if bound in ('max', 'exact'):
+            high = value if high is None else max(high, value)
+    return low, high
+
+
+def _merge(current: Tuple[float, float], low: float, high: float) -> Tuple[float, float]:
+    return (low, high) if math.isnan(current[0]) else (min(current[0], low), max(current[1], high))
+
+
+def parse_penalty(text: str) -> Dict[str, object]:
+    """
+    Facets of one penalty text: kinds (list of PENALTY_KINDS), offence_class,
+    min_days/max_days of imprisonment or confinement, fine_min/fine_max in
+    euros and licence_days. Values the text does not give are NaN.
+    """
+    normalized = normalize_greek_text(text or '')
+    kinds = set()
+    days = fines = (math.nan, math.nan)
+    licence_days = math.nan
+    administrative_only = True
+
+    mentions = list(_PENALTY_MENTION.finditer(normalized))
+    for position, mention in enumerate(mentions):
+        group = mention.lastgroup
+        if group == 'other':
+            continue
+        kind = _KIND_OF_GROUP[group]
+        kinds.add(kind)
+        end = mentions[position + 1].start() if position + 1 < len(mentions) else len(normalized)
+        segment = normalized[mention.end():end]
+
+        if group == 'life':
+            days = _merge(days, LIFE, LIFE)
+        elif kind in STATUTORY_LIMITS:
+            low, high = _bounds(_quantities(segment, euros=False))
+            default_low, default_high = STATUTORY_LIMITS[kind]
+            days = _merge(days, default_low if low is None else low, default_high if high is None else high)
+        elif kind == FINE:
+            low, high = _bounds(_quantities(segment, euros=True))
+            if low is not None or high is not None:
+                fines = _merge(fines, low if low is not None else 0.0, high if high is not None else low)
+            # Only a χρηματική ποινή is a criminal penalty; a πρόστιμο is administrative
+            if mention.group().startswith('χρηματικ'):
+                administrative_only = False
+        elif kind == LICENCE:
+            low, high = _bounds(_quantities(segment, euros=False))
+            if high is not None or low is not None:
+                licence_days = high if high is not None else low
+
+    if CONFINEMENT in kinds or 'κακουργημα' in normalized:
+        offence_class = 'κακούργημα'
+    elif IMPRISONMENT in kinds or (FINE in kinds and not administrative_only) or 'πλημμελημα' in normalized:
+        offence_class = 'πλημμέλημα'
+    elif kinds:
+        offence_class = 'διοικητική παράβαση'
+    else:
+        offence_class = ''
+
+    return {
+        'kinds': [kind for kind in PENALTY_KINDS if kind in kinds],
+        'offence_class': offence_class,
+        'min_days': days[0],
+        'max_days': days[1],
+        'fine_min': fines[0],
+        'fine_max': fines[1],
+        'licence_days': licence_days
+    }
+
+
+def article_penalty_text(article: Mapping[str, str]) -> str:
+    """The penalty field, or failing that the sentences of the content that impose a penalty"""
+    penalty = article.get('penalty', '') or ''
+    if _PENALTY_MENTION.search(normalize_greek_text(penalty)):
+        return penalty
+    content = normalize_greek_text(article.get('content', '') or '')
+    return '\n'.join([penalty] + _SENTENCES.findall(content))
+
+
+def _facet_row(text: str) -> Tuple:
+    facets = parse_penalty(text)
+    return (sum(KIND_BITS[kind] for kind in facets['kinds']), OFFENCE_CLASSES.index(facets['offence_class']),
+            facets['min_days'], facets['max_days'], facets['fine_min'], facets['fine_max'], facets['licence_days'])
+
+
+class PenaltyFacets:
+    """
+    Penalty facets of every article placement of a corpus, one NumPy column
+    per facet. Rows follow repository.iter_articles(); an article filed under
+    several subcategories has a row in each.
+    """
+
+    def __init__(self, articles: Iterable[Tuple[str, str, Mapping[str, str]]]):
+        self.articles: List[Tuple[str, str, Mapping[str, str]]] = list(articles)
+        category_codes: Dict[str, int] = {}
+        subcategory_codes: Dict[str, int] = {}
+        # Penalty texts repeat across articles ("Φυλάκιση μέχρι 2 έτη"), so each is parsed once
+        by_penalty: Dict[str, Optional[Tuple]] = {}
+        by_text: Dict[str, Tuple] = {}
+        values, categories, subcategories = [], [], []
+        for category, subcategory, article in self.articles:
+            penalty = article.get('penalty', '') or ''
+            if penalty not in by_penalty:
+                # None marks a penalty field that names no penalty: the facets come from the content
+                by_penalty[penalty] = (_facet_row(penalty)
+                                       if _PENALTY_MENTION.search(normalize_greek_text(penalty)) else None)
+            row = by_penalty[penalty]
+            if row is None:
+                text = article_penalty_text(article)
+                row = by_text.get(text)
+                if row is None:
+                    row = by_text[text] = _facet_row(text)
+            values.append(row)
+            categories.append(category_codes.setdefault(category, len(category_codes)))
+            subcategories.append(subcategory_codes.setdefault(f"{category}\x1f{subcategory}", len(subcategory_codes)))
+
+        columns = list(zip(*values)) or [()] * 7
+        self.kinds = np.array(columns[0], dtype=np.uint8)
+        self.offence_class = np.array(columns[1], dtype=np.int8)
+        self.min_days = np.array(columns[2], dtype=np.float32)
+        self.max_days = np.array(columns[3], dtype=np.float32)
+        self.fine_min = np.array(columns[4], dtype=np.float64)
+        self.fine_max = np.array(columns[5], dtype=np.float64)
+        self.licence_days = np.array(columns[6], dtype=np.float32)
+        self.category = np.array(categories, dtype=np.int32)
+        self.subcategory = np.array(subcategories, dtype=np.int32)
+        self.categories: List[str] = list(category_codes)
+        self.subcategories: List[str] = list(subcategory_codes)
+
+    @classmethod
+    def from_repository(cls, repository) -> 'PenaltyFacets':
+        return cls(repository.iter_articles())
+
+    def __len__(self) -> int:
+        return len(self.articles)
+
+    def mask(self, kinds: Sequence[str] = (), offence_class: Optional[str] = None,
+             fine_at_least: Optional[float] = None, fine_at_most: Optional[float] = None,
+             days_at_least: Optional[float] = None, days_at_most: Optional[float] = None,
+             category: Optional[str] = None, subcategory: Optional[str] = None) -> np.ndarray:
+        """
+        Boolean row mask of the articles matching every given filter. kinds
+        requires all listed penalty types; fine_at_least / days_at_least match
+        penalties that can reach the amount, fine_at_most / days_at_most those
+        that can stay within it. Unknown amounts never match an amount filter.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if kinds:
+            required = sum(KIND_BITS[kind] for kind in kinds)
+            mask &= (self.kinds & required) == required
+        if offence_class is not None:
+            mask &= self.offence_class == OFFENCE_CLASSES.index(offence_class)
+        if fine_at_least is not None:
+            mask &= self.fine_max >= fine_at_least
+        if fine_at_most is not None:
+            mask &= self.fine_min <= fine_at_most
+        if days_at_least is not None:
+            mask &= self.max_days >= days_at_least
+        if days_at_most is not None:
+            mask &= self.min_days <= days_at_most
+        if category is not None:
+            code = self.categories.index(category) if category in self.categories else -1
+            mask &= self.category == code
+            if subcategory is not None:
+                key = f"{category}\x1f{subcategory}"
+                code = self.subcategories.index(key) if key in self.subcategories else -1
+                mask &= self.subcategory == code
+        return mask
+
+    def select(self, **filters) -> List[Tuple[str, str, Mapping[str, str]]]:
+        """(category, subcategory, article) of the articles matching mask(**filters)"""
+        return [self.articles[row] for row in np.flatnonzero(self.mask(**filters))]
+
+    def facets(self, row: int) -> Dict[str, object]:
+        """
+        The facets of one row in parse_penalty() form, JSON-safe: unknown
+        values are None, and life imprisonment is life=True with no day counts.
+        """
+        def value(column):
+            number = float(column[row])
+            return None if math.isnan(number) or math.isinf(number) else number
+
+        return {
+            'life': bool(np.isinf(self.max_days[row])),
+            'kinds': [kind for kind in PENALTY_KINDS if self.kinds[row] & KIND_BITS[kind]],
+            'offence_class': OFFENCE_CLASSES[self.offence_class[row]],
+            'min_days': value(self.min_days),
+            'max_days': value(self.max_days),
+            'fine_min': value(self.fine_min),
+            'fine_max': value(self.fine_max),
+            'licence_days': value(self.licence_days)
+        }
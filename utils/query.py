@@ -0,0 +1,334 @@
+"""
+Query language for the article search index.
+
+    κατοχή όπλου                 both words, anywhere in the article (implicit AND)
+    "σωματική βλάβη"             exact phrase
+    κλοπή OR ληστεία             either word
+    ναρκωτικά NOT χρήση          exclusion (also: -χρήση, -"…", -(…))
+    law:"Π.Κ." category:ΟΠΛΑ     field filters
+    penalty:πρόστιμο AND (ΚΟΚ OR οδηγός)
+
+Words match as prefixes after accent folding, so "ναρκωτικ" finds
+"ναρκωτικών", and words in Latin letters are read as Greeklish ("narkotika",
+"oplo") through the keys of utils.greeklish. Fields: title, law, content,
+penalty, category, subcategory. Unscoped terms search title, law and
+content, like search_content.
+"""
+import re
+from typing import List, Optional, Set
+
+from utils.greeklish import greeklish_key, greeklish_text, is_greeklish
+from utils.search import normalize_greek_text
+
+FIELDS = ('title', 'law', 'content', 'penalty', 'category', 'subcategory')
+DEFAULT_FIELDS = ('title', 'law', 'content')
+
+# A '-' right before '(' or '"' is lexed on its own, to negate the group or phrase that follows
+_LEXER = re.compile(r'\(|\)|-(?=[("])|"[^"]*"?|[^\s()"]+')
+_WORD = re.compile(r'\w+')
+# Greeklish keys share the posting lists with the tokens; the prefix is not a word
+# character, so a key never prefix-matches a query for a real token ("8" vs "~8anatos")
+GREEKLISH_PREFIX = '~'
+
+
+class QuerySyntaxError(ValueError):
+    """Raised for malformed queries such as unbalanced parentheses"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized index tokens"""
+    return _WORD.findall(normalize_greek_text(text))
+
+
+def index_tokens(text: str) -> Set[str]:
+    """The tokens of text plus their prefixed Greeklish keys, as stored in the index"""
+    tokens = set(tokenize(text))
+    return tokens | {GREEKLISH_PREFIX + greeklish_key(token) for token in tokens}
+
+
+def query_word(word: str) -> str:
+    """The index token a normalized query word is looked up as"""
+    return GREEKLISH_PREFIX + greeklish_key(word) if is_greeklish(word) else word
+
+
+class Node:
+    """Base class of the query plan nodes"""
+
+    def cost(self, index) -> int:
+        """Estimated number of matching documents, used to order intersections"""
+        raise NotImplementedError
+
+    def evaluate(self, index) -> Set[int]:
+        """All documents matching this node"""
+        raise NotImplementedError
+
+    def filter(self, index, candidates: Set[int]) -> Set[int]:
+        """The subset of candidates matching this node"""
+        return candidates & self.evaluate(index)
+
+
+class Term(Node):
+    """
+    A single word, matched as a token prefix in one or more fields. word is the
+    index token it is looked up as, typed the normalized word as written.
+    """
+
+    def __init__(self, word: str, fields=DEFAULT_FIELDS, typed: Optional[str] = None):
+        self.word = word
+        self.fields = fields
+        self.typed = typed or word
+
+    def cost(self, index) -> int:
+        return index.posting_size(self.fields, self.word)
+
+    def evaluate(self, index) -> Set[int]:
+        return index.postings(self.fields, self.word)
+
+    def filter(self, index, candidates: Set[int]) -> Set[int]:
+        posting_sets = index.posting_sets(self.fields, self.word)
+        if len(candidates) < sum(len(postings) for postings in posting_sets):
+            # Probe the posting lists instead of building their union
+            return {doc_id for doc_id in candidates
+                    if any(doc_id in postings for postings in posting_sets)}
+        return candidates & self.evaluate(index)
+
+    def __repr__(self) -> str:
+        return f"Term({self.word!r}, {self.fields})"
+
+
+class Phrase(Node):
+    """Adjacent words: intersect the word postings, then verify the phrase text"""
+
+    def __init__(self, text: str, fields=DEFAULT_FIELDS):
+        self.text = self.typed = normalize_greek_text(text).strip()
+        # A Greeklish phrase is verified against the Greeklish form of the field text
+        self.greeklish = is_greeklish(self.text)
+        if self.greeklish:
+            self.text = greeklish_text(self.text)
+        self.words = [query_word(word) for word in tokenize(text)]
+        self.fields = fields
+
+    def _terms(self, index) -> List[Term]:
+        terms = [Term(word, self.fields) for word in self.words]
+        terms.sort(key=lambda term: term.cost(index))
+        return terms
+
+    def cost(self, index) -> int:
+        if not self.words:
+            return 0
+        return min(index.posting_size(self.fields, word) for word in self.words)
+
+    def evaluate(self, index) -> Set[int]:
+        terms = self._terms(index)
+        if not terms:
+            return set()
+        return self.filter(index, terms[0].evaluate(index))
+
+    def filter(self, index, candidates: Set[int]) -> Set[int]:
+        for term in self._terms(index):
+            if not candidates:
+                return candidates
+            candidates = term.filter(index, candidates)
+        # Reading the stored text is the expensive step, so it runs on the fewest documents
+        return index.verify_phrase(candidates, self.fields, self.text, self.greeklish)
+
+    def __repr__(self) -> str:
+        return f"Phrase({self.text!r}, {self.fields})"
+
+
+class Not(Node):
+    """Documents that do not match the child"""
+
+    def __init__(self, child: Node):
+        self.child = child
+
+    def cost(self, index) -> int:
+        return len(index) - self.child.cost(index)
+
+    def evaluate(self, index) -> Set[int]:
+        return index.all_documents() - self.child.evaluate(index)
+
+    def filter(self, index, candidates: Set[int]) -> Set[int]:
+        return candidates - self.child.filter(index, candidates)
+
+    def __repr__(self) -> str:
+        return f"Not({self.child!r})"
+
+
+class And(Node):
+    """
+    Intersection. Only the cheapest positive child is evaluated over the whole
+    index; every other child filters the running result, cheapest first, and
+    evaluation stops as soon as the result is empty. Negated children are
+    subtracted without materializing their complement.
+    """
+
+    def __init__(self, children: List[Node]):
+        self.children = children
+
+    def cost(self, index) -> int:
+        positive = [child.cost(index) for child in self.children if not isinstance(child, Not)]
+        return min(positive) if positive else len(index)
+
+    def _plan(self, index) -> List[Node]:
+        """Positive children by ascending cost, then the negated ones"""
+        positive = [child for child in self.children if not isinstance(child, Not)]
+        negative = [child for child in self.children if isinstance(child, Not)]
+        positive.sort(key=lambda child: child.cost(index))
+        return positive + negative
+
+    def evaluate(self, index) -> Set[int]:
+        plan = self._plan(index)
+        if isinstance(plan[0], Not):
+            return self._apply(index, plan, index.all_documents())
+        return self._apply(index, plan[1:], plan[0].evaluate(index))
+
+    def filter(self, index, candidates: Set[int]) -> Set[int]:
+        return self._apply(index, self._plan(index), candidates)
+
+    @staticmethod
+    def _apply(index, plan: List[Node], result: Set[int]) -> Set[int]:
+        for child in plan:
+            if not result:
+                break
+            result = child.filter(index, result)
+        return result
+
+    def __repr__(self) -> str:
+        return f"And({self.children!r})"
+
+
+class Or(Node):
+    """Union of the children"""
+
+    def __init__(self, children: List[Node]):
+        self.children = children
+
+    def cost(self, index) -> int:
+        return min(len(index), sum(child.cost(index) for child in self.children))
+
+    def evaluate(self, index) -> Set[int]:
+        result = set()
+        for child in self.children:
+            result |= child.evaluate(index)
+        return result
+
+    def filter(self, index, candidates: Set[int]) -> Set[int]:
+        result = set()
+        for child in self.children:
+            result |= child.filter(index, candidates - result)
+        return result
+
+    def __repr__(self) -> str:
+        return f"Or({self.children!r})"
+
+
+class _Parser:
+    """Recursive-descent parser: OR binds loosest, then AND, then NOT"""
+
+    def __init__(self, query: str):
+        self.tokens = _LEXER.findall(query)
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self) -> str:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self) -> Optional[Node]:
+        if not self.tokens:
+            return None
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QuerySyntaxError(f"Unexpected '{self.peek()}'")
+        return node
+
+    def parse_or(self) -> Optional[Node]:
+        children = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.next()
+            children.append(self.parse_and())
+        children = [child for child in children if child is not None]
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self) -> Optional[Node]:
+        children = []
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.next()
+                continue
+            child = self.parse_not()
+            if child is not None:
+                children.append(child)
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else And(children)
+
+    def _operand_follows(self) -> None:
+        if self.peek() in (None, 'OR', 'AND', ')'):
+            raise QuerySyntaxError("NOT χωρίς όρο")
+
+    def parse_not(self) -> Optional[Node]:
+        token = self.peek()
+        if token == 'NOT':
+            self.next()
+            self._operand_follows()
+            child = self.parse_not()
+            return Not(child) if child is not None else None
+        if token == '-':
+            self.next()
+            # -(group) and -"phrase"; a dash on its own, between words, is ignored
+            if self.peek() is None or not self.peek().startswith(('(', '"')):
+                if self.peek() in (None, 'OR', 'AND', ')'):
+                    raise QuerySyntaxError("NOT χωρίς όρο")
+                return None
+            child = self.parse_atom()
+            return Not(child) if child is not None else None
+        if token.startswith('-') and len(token) > 1:
+            self.tokens[self.position] = token[1:]
+            child = self.parse_atom()
+            return Not(child) if child is not None else None
+        return self.parse_atom()
+
+    def parse_atom(self) -> Optional[Node]:
+        token = self.next()
+        if token == '(':
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise QuerySyntaxError("Missing ')'")
+            self.next()
+            return node
+        if token == ')':
+            raise QuerySyntaxError("Unexpected ')'")
+
+        fields = DEFAULT_FIELDS
+        name, separator, value = token.partition(':')
+        if separator and name.lower() in FIELDS:
+            fields = (name.lower(),)
+            token = value
+            if not token:
+                # field:"some phrase" is lexed as two tokens
+                if self.peek() is None or self.peek() in ('(', ')'):
+                    raise QuerySyntaxError(f"Missing value for field '{name}'")
+                token = self.next()
+
+        if token.startswith('"'):
+            return Phrase(token.strip('"'), fields)
+
+        words = tokenize(token)
+        if not words:
+            return None
+        if len(words) == 1:
+            return Term(query_word(words[0]), fields, words[0])
+        # Punctuated words such as Π.Κ. or 3500/2006 must stay adjacent
+        return Phrase(token, fields)
+
+
+def parse_query(query: str) -> Optional[Node]:
+    """Parse a query string into a plan; returns None for an empty query"""
+    return _Parser(query).parse()
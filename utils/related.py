@@ -0,0 +1,251 @@
+"""
+Precomputed "related articles": the nearest neighbours of every article by
+TF-IDF cosine similarity, stored as a compact table so the UI only looks them up.
+
+The pipeline builds one sparse TF-IDF row per distinct article (title, law and
+content, sublinear term frequency, smoothed idf, L2-normalized), then computes
+the similarities in batches of rows with a sparse matrix product and keeps the
+top k of each row. The table (data/related.npz) holds plain arrays, no pickles:
+article digests, neighbour positions (int32), scores (float16) and the
+title, law and placement of every article as one UTF-8 blob with offsets.
+
+Usage (from the project root):
+    python -m utils.related
+    python -m utils.related --pdf-dir attached_assets --k 8
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Mapping, Optional
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # Only needed to build or read the table
+    np = None
+    sparse = None
+
+from utils.article import article_digest
+from utils.query import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RELATED_PATH = "data/related.npz"
+DEFAULT_NEIGHBOURS = 5
+BATCH_SIZE = 512
+# Neighbours below this cosine similarity are not worth showing
+MIN_SCORE = 0.15
+# Terms in more than this share of the articles carry no signal ("άρθρο", "ποινή")
+MAX_DOCUMENT_FREQUENCY = 0.5
+
+_LABEL_SEPARATOR = '\x1f'
+
+
+def related_available() -> bool:
+    return np is not None and sparse is not None
+
+
+def term_counts(texts: List[str], vocabulary: Dict[str, int], extend: bool = True, stem: int = 0):
+    """
+    Token counts of texts (CSR, float32) over vocabulary. New tokens are added
+    to vocabulary when extend is set, and dropped otherwise. With stem, tokens
+    are cut to their first stem characters, so inflected forms count as one.
+    """
+    indptr, indices, counts = [0], [], []
+    for text in texts:
+        row: Dict[int, int] = {}
+        for token in tokenize(text):
+            if len(token) < 2 or token.isdigit():
+                continue
+            if stem:
+                token = token[:stem]
+            column = vocabulary.setdefault(token, len(vocabulary)) if extend else vocabulary.get(token)
+            if column is not None:
+                row[column] = row.get(column, 0) + 1
+        indices.extend(row.keys())
+        counts.extend(row.values())
+        indptr.append(len(indices))
+    return sparse.csr_matrix((np.asarray(counts, dtype=np.float32), np.asarray(indices, dtype=np.int32),
+                              np.asarray(indptr, dtype=np.int64)), shape=(len(texts), len(vocabulary)))
+
+
+def idf_weights(counts, min_document_frequency: int = 2):
+    """Smoothed idf of the columns of counts; rare (below min_document_frequency) and very common terms get 0"""
+    documents = max(counts.shape[0], 1)
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + documents) / (1 + document_frequency)).astype(np.float32) + 1
+    # Terms of a single article cannot relate two articles; very common ones only add noise
+    idf[(document_frequency < min_document_frequency) | (document_frequency > MAX_DOCUMENT_FREQUENCY * documents)] = 0
+    return idf
+
+
+def tfidf_rows(counts, idf):
+    """L2-normalized sublinear TF-IDF rows (CSR, float32) of counts"""
+    matrix = counts.copy()
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+    matrix.eliminate_zeros()
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms).dot(matrix), dtype=np.float32)
+
+
+def tfidf_matrix(texts: List[str]):
+    """L2-normalized TF-IDF rows (CSR, float32) of texts"""
+    counts = term_counts(texts, {})
+    return tfidf_rows(counts, idf_weights(counts))
+
+
+def top_neighbours(matrix, k: int, batch_size: int = BATCH_SIZE, min_score: float = MIN_SCORE):
+    """(neighbours, scores) arrays of shape (rows, k); missing neighbours are -1 / 0"""
+    rows = matrix.shape[0]
+    neighbours = np.full((rows, k), -1, dtype=np.int32)
+    scores = np.zeros((rows, k), dtype=np.float32)
+    transposed = matrix.T.tocsc()
+    for start in range(0, rows, batch_size):
+        similarities = (matrix[start:start + batch_size] @ transposed).tocsr()
+        for offset in range(similarities.shape[0]):
+            row = start + offset
+            begin, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+            columns = similarities.indices[begin:end]
+            values = similarities.data[begin:end]
+            keep = (columns != row) & (values >= min_score)
+            columns, values = columns[keep], values[keep]
+            if len(values) > k:
+                best = np.argpartition(-values, k - 1)[:k]
+                columns, values = columns[best], values[best]
+            order = np.argsort(-values, kind='stable')
+            neighbours[row, :len(order)] = columns[order]
+            scores[row, :len(order)] = values[order]
+    return neighbours, scores
+
+
+def _label(category: str, subcategory: str, article: Mapping[str, str]) -> bytes:
+    return _LABEL_SEPARATOR.join((article.get('title', '') or '', article.get('law', '') or '',
+                                  category, subcategory)).encode('utf-8')
+
+
+def build_related(repository, path: str = DEFAULT_RELATED_PATH, k: int = DEFAULT_NEIGHBOURS) -> "RelatedArticles":
+    """Compute the neighbour table of every article in repository and save it to path"""
+    start = time.perf_counter()
+    # One row per distinct article, placed under its first (category, subcategory)
+    documents: Dict[str, tuple] = {}
+    for category, subcategory, article in repository.iter_articles():
+        documents.setdefault(article_digest(article), (category, subcategory, article))
+    texts = ['\n'.join(article.get(field, '') or '' for field in ('title', 'law', 'content'))
+             for _, _, article in documents.values()]
+    neighbours, scores = top_neighbours(tfidf_matrix(texts), k)
+
+    labels = [_label(*document) for document in documents.values()]
+    offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(label) for label in labels])
+    table = {
+        'digests': np.asarray(list(documents), dtype='S40'),
+        'neighbours': neighbours,
+        'scores': scores.astype(np.float16),
+        'labels': np.frombuffer(b''.join(labels), dtype=np.uint8),
+        'label_offsets': offsets
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, **table)
+    os.replace(tmp_path, path)
+    logger.info(f"Built related articles of {len(labels)} articles in {time.perf_counter() - start:.2f}s")
+    return RelatedArticles(table)
+
+
+class RelatedArticles:
+    """Read side of the neighbour table"""
+
+    def __init__(self, table: Mapping):
+        self.digests = table['digests']
+        self.neighbours = table['neighbours']
+        self.scores = table['scores']
+        self._labels = table['labels'].tobytes()
+        self._offsets = table['label_offsets']
+        self._row_by_digest = {digest.decode('ascii'): row for row, digest in enumerate(self.digests)}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_RELATED_PATH) -> "RelatedArticles":
+        with np.load(path, allow_pickle=False) as table:
+            return cls({name: table[name] for name in table.files})
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def _entry(self, row: int, score: float) -> Dict[str, object]:
+        label = self._labels[self._offsets[row]:self._offsets[row + 1]].decode('utf-8')
+        title, law, category, subcategory = label.split(_LABEL_SEPARATOR)
+        return {'title': title, 'law': law, 'category': category, 'subcategory': subcategory, 'score': score}
+
+    def related(self, article: Mapping[str, str], limit: Optional[int] = None) -> List[Dict[str, object]]:
+        """Related articles of an article, most similar first; [] if it is not in the table"""
+        row = self._row_by_digest.get(article_digest(article))
+        if row is None:
+            return []
+        entries = [self._entry(int(neighbour), float(score))
+                   for neighbour, score in zip(self.neighbours[row], self.scores[row]) if neighbour >= 0]
+        return entries[:limit] if limit else entries
+
+
+_related: Optional[RelatedArticles] = None
+_related_started = False
+_related_lock = threading.Lock()
+
+
+def _load_or_build(repository) -> None:
+    global _related
+    path = os.environ.get("RELATED_PATH", DEFAULT_RELATED_PATH)
+    try:
+        _related = RelatedArticles.load(path) if os.path.exists(path) else build_related(repository, path)
+    except Exception as e:
+        logger.error(f"Could not load related articles: {str(e)}")
+
+
+def get_related_articles(repository) -> Optional[RelatedArticles]:
+    """
+    Return the process-wide neighbour table, or None until it is available.
+    The first call loads the saved table, or builds it from repository, in a
+    background thread; rebuild it with python -m utils.related after changing the corpus.
+    """
+    global _related_started
+    if not related_available():
+        return None
+    with _related_lock:
+        if not _related_started:
+            _related_started = True
+            threading.Thread(target=_load_or_build, args=(repository,), name="related-articles",
+                             daemon=True).start()
+    return _related
+
+
+def main() -> None:
+    from data.categories import CATEGORIES
+    from utils.article import compact_categories
+    from utils.pdf_processor import process_multiple_pdfs
+    from utils.storage import create_repository
+
+    parser = argparse.ArgumentParser(description="Precompute the related articles table")
+    parser.add_argument("--output", default=DEFAULT_RELATED_PATH)
+    parser.add_argument("--pdf-dir", help="also ingest the PDFs of this directory")
+    parser.add_argument("--k", type=int, default=DEFAULT_NEIGHBOURS, help="neighbours per article")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not related_available():
+        raise SystemExit("numpy and scipy are required: pip install .[related]")
+    repository = create_repository(compact_categories(CATEGORIES))
+    if args.pdf_dir:
+        repository.add_categories(process_multiple_pdfs(args.pdf_dir))
+    related = build_related(repository, args.output, args.k)
+    print(f"{len(related)} articles, table in {args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
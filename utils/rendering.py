@@ -0,0 +1,63 @@
+import html
+from typing import Dict, List, Optional
+
+
+def render_diff_html(ops: List[List[str]]) -> str:
+    """Inline word diff: removed words struck through, added words highlighted"""
+    parts = []
+    for tag, old, new in ops:
+        if tag == 'equal':
+            parts.append(html.escape(new))
+            continue
+        if old:
+            parts.append(f"<del>{html.escape(old)}</del>")
+        if new:
+            parts.append(f"<ins>{html.escape(new)}</ins>")
+    return ' '.join(parts)
+
+
+def render_amendment_html(amendment: Dict) -> str:
+    """Marker for an article the newer Penal Code edition changed, with its diff"""
+    if amendment['status'] == 'added':
+        return f"<div class='article-amendment'>Νέο άρθρο με {amendment['amended_by']}</div>"
+    return f"""<details class='article-amendment'>
+        <summary>Τροποποιήθηκε με {amendment['amended_by']}</summary>
+        <div class='article-diff'>{render_diff_html(amendment['ops'])}</div>
+    </details>"""
+
+
+def render_related_html(related: List[Dict]) -> str:
+    """Compact list of the articles most similar to an article"""
+    items = ''.join(
+        f"<li>{html.escape(entry['law'])} &middot; {html.escape(entry['title'])}"
+        f" <span class='related-placement'>({html.escape(entry['category'])})</span></li>"
+        for entry in related)
+    return f"""<details class='related-articles'>
+        <summary>Σχετικά άρθρα ({len(related)})</summary>
+        <ul>{items}</ul>
+    </details>"""
+
+
+def render_article_html(article: Dict[str, str], amendment: Optional[Dict] = None,
+                        related: Optional[List[Dict]] = None) -> str:
+    """Build the HTML block used to display a single article"""
+    # Pre-compute penalty section if it exists
+    penalty_html = f"""<div class='article-penalty'>
+        <strong>Ποινή:</strong> {article['penalty']}
+    </div>""" if article.get('penalty') else ""
+    amendment_html = render_amendment_html(amendment) if amendment else ""
+    related_html = render_related_html(related) if related else ""
+
+    # Format the content with proper line breaks
+    content_html = article['content'].replace('\n', '<br>')
+
+    return f"""
+    <div class="law-article">
+        <div class="article-title">{article['title']}</div>
+        <strong>Νόμος:</strong> {article['law']}
+        {amendment_html}
+        <div class="article-content">{content_html}</div>
+        {penalty_html}
+        {related_html}
+    </div>
+    """
@@ -1,14 +1,38 @@
+import unicodedata
+
+# Characters below this code point are folded with a precomputed translation
+# table (Latin, Greek, combining marks, Greek Extended, punctuation)
+_FAST_FOLD_LIMIT = 0x3000
+
+
+def _strip_marks(text):
+    return ''.join(c for c in unicodedata.normalize('NFD', text)
+                   if unicodedata.category(c) != 'Mn')
+
+
+_ACCENT_TABLE = {}
+for _code in range(_FAST_FOLD_LIMIT):
+    _char = chr(_code)
+    _folded = _strip_marks(_char)
+    if _folded != _char:
+        _ACCENT_TABLE[_code] = _folded or None
+
+
 def normalize_greek_text(text):
     """Normalize Greek text for search by removing accents and converting to lowercase"""
-    import unicodedata
     text = text.lower()
-    return ''.join(c for c in unicodedata.normalize('NFD', text)
-                  if unicodedata.category(c) != 'Mn')
+    if text and max(text) >= chr(_FAST_FOLD_LIMIT):
+        return _strip_marks(text)
+    return text.translate(_ACCENT_TABLE)
 
 def search_content(query, categories):
     """
-    Search through legal content with enhanced Greek language support
+    Search through legal content with enhanced Greek language support.
+    categories is either the nested categories dict or a CorpusRepository.
     """
+    if hasattr(categories, 'search'):
+        return categories.search(query)
+
     try:
         results = []
         if not query or not isinstance(query, str):
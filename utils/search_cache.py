@@ -0,0 +1,122 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from utils.search import normalize_greek_text
+
+DEFAULT_MAX_ENTRIES = 512
+
+QUERY_KEYWORDS = ('AND', 'OR', 'NOT')
+
+_QUOTED = re.compile(r'("[^"]*"?)')
+_BARE_WORD = re.compile(r'[^\s()"]+')
+
+
+def _fold_word(match) -> str:
+    word = match.group()
+    return word if word in QUERY_KEYWORDS else normalize_greek_text(word)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key form of a query, so equivalent spellings share one cache entry.
+    Words are accent-folded and lowercased, except the uppercase operators,
+    and runs of whitespace are collapsed outside quoted phrases.
+    """
+    parts = []
+    for part in _QUOTED.split(query):
+        if part.startswith('"'):
+            parts.append(normalize_greek_text(part))
+        else:
+            parts.append(_BARE_WORD.sub(_fold_word, re.sub(r'\s+', ' ', part)))
+    return ''.join(parts).strip()
+
+
+class SearchCache:
+    """
+    Bounded LRU cache of search results, shared by all sessions of the process.
+
+    Keys are (normalized query, filters, corpus version). A write to the corpus
+    changes its version, so results computed for the old content can no longer
+    be hit and simply age out of the LRU order. Cached result lists are shared
+    between callers and must not be modified.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, List[Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, version: str, filters: Tuple[Hashable, ...] = ()) -> Tuple:
+        return normalize_query(query), tuple(filters), version
+
+    def get(self, key: Tuple):
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, key: Tuple, results: List[Dict[str, str]]) -> None:
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Return the cached results for key, computing and storing them on a miss"""
+        results = self.get(key)
+        if results is None:
+            # Computed outside the lock so a slow query does not block other sessions
+            results = compute()
+            self.put(key, results)
+        return results
+
+    def invalidate_version(self, version: str) -> int:
+        """Drop every entry computed for a corpus version; returns how many were dropped"""
+        with self._lock:
+            stale = [key for key in self._entries if key[2] == version]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+SEARCH_CACHE = SearchCache()
+
+
+def cached_search(index, query: str, version: str, categories: Optional[Sequence[str]] = None,
+                  cache: SearchCache = SEARCH_CACHE) -> List[Dict[str, str]]:
+    """
+    Run index.search(query) through the shared result cache. categories scopes
+    the search to those shards of a ShardedSearchIndex and is part of the key.
+    """
+    if categories is None:
+        return cache.get_or_compute(cache.make_key(query, version), lambda: index.search(query))
+    key = cache.make_key(query, version, ('categories',) + tuple(categories))
+    return cache.get_or_compute(key, lambda: index.search(query, categories))
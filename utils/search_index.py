@@ -0,0 +1,275 @@
+import bisect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from utils.article import article_digest
+from utils.greeklish import greeklish_text
+from utils.query import FIELDS, Node, index_tokens, parse_query
+from utils.search import normalize_greek_text
+
+logger = logging.getLogger(__name__)
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over the corpus: one posting list (set of
+    document ids) per field and normalized token. Queries in the language of
+    utils.query are evaluated over these posting lists.
+
+    Documents are unique by content (article_digest): an article filed under
+    several subcategories is indexed once, and its other placements are kept
+    in placements and reported as also_in in the results.
+    """
+
+    def __init__(self):
+        self.documents: List[Tuple[str, str, Mapping[str, str]]] = []
+        self.digests: List[str] = []
+        self.placements: Dict[int, List[Tuple[str, str]]] = {}
+        self._doc_by_digest: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FIELDS}
+        self._vocabulary: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_articles(cls, articles: Iterable[Tuple[str, str, Mapping[str, str]]]) -> 'SearchIndex':
+        """Build an index from (category, subcategory, article) triples"""
+        index = cls()
+        for category, subcategory, article in articles:
+            index.add(category, subcategory, article)
+        return index
+
+    @classmethod
+    def from_repository(cls, repository) -> 'SearchIndex':
+        return cls.from_articles(repository.iter_articles())
+
+    @classmethod
+    def from_categories(cls, categories: Dict) -> 'SearchIndex':
+        return cls.from_articles(
+            (category, subcategory, article)
+            for category, subcategories in categories.items()
+            for subcategory, articles in subcategories.items()
+            for article in articles)
+
+    @classmethod
+    def from_postings(cls, documents: List[Tuple[str, str, Mapping[str, str]]],
+                      postings: Dict[str, Dict[str, Iterable[int]]],
+                      placements: Optional[Dict[int, List[Tuple[str, str]]]] = None) -> 'SearchIndex':
+        """Rebuild an index from export_postings() output without re-tokenizing"""
+        index = cls()
+        index.documents = list(documents)
+        index.digests = [article_digest(article) for _, _, article in index.documents]
+        index._doc_by_digest = {digest: doc_id for doc_id, digest in enumerate(index.digests)}
+        index.placements = {doc_id: list(extra) for doc_id, extra in (placements or {}).items() if extra}
+        for field, field_postings in postings.items():
+            index._postings[field] = {token: set(doc_ids) for token, doc_ids in field_postings.items()}
+        return index
+
+    def export_postings(self) -> Dict[str, Dict[str, List[int]]]:
+        """Posting lists as sorted document id lists, field by field"""
+        return {field: {token: sorted(doc_ids) for token, doc_ids in sorted(postings.items())}
+                for field, postings in self._postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, category: str, subcategory: str, article: Mapping[str, str]) -> int:
+        """Index one article and return its document id; duplicates return the existing id"""
+        digest = article_digest(article)
+        doc_id = self._doc_by_digest.get(digest)
+        if doc_id is not None:
+            if (category, subcategory) not in self.locations(doc_id):
+                self.placements.setdefault(doc_id, []).append((category, subcategory))
+                self._index_fields(doc_id, ('category',), category)
+                self._index_fields(doc_id, ('subcategory',), subcategory)
+            return doc_id
+
+        doc_id = len(self.documents)
+        self.documents.append((category, subcategory, article))
+        self.digests.append(digest)
+        self._doc_by_digest[digest] = doc_id
+        for field in FIELDS:
+            self._index_fields(doc_id, (field,), self.field_text(doc_id, field, normalized=False))
+        return doc_id
+
+    def _index_fields(self, doc_id: int, fields: Tuple[str, ...], text: str) -> None:
+        tokens = index_tokens(text)
+        for field in fields:
+            postings = self._postings[field]
+            for token in tokens:
+                postings.setdefault(token, set()).add(doc_id)
+        self._vocabulary.clear()
+
+    def locations(self, doc_id: int) -> List[Tuple[str, str]]:
+        """Every (category, subcategory) a document is filed under, first placement first"""
+        category, subcategory, _ = self.documents[doc_id]
+        return [(category, subcategory)] + self.placements.get(doc_id, [])
+
+    def field_text(self, doc_id: int, field: str, normalized: bool = True) -> str:
+        category, subcategory, article = self.documents[doc_id]
+        if field == 'category':
+            text = '\n'.join(location[0] for location in self.locations(doc_id))
+        elif field == 'subcategory':
+            text = '\n'.join(location[1] for location in self.locations(doc_id))
+        else:
+            text = article.get(field, '') or ''
+        return normalize_greek_text(text) if normalized else text
+
+    def all_documents(self) -> Set[int]:
+        return set(range(len(self.documents)))
+
+    def _expand(self, field: str, prefix: str) -> List[str]:
+        """All indexed tokens of a field that start with prefix"""
+        vocabulary = self._vocabulary.get(field)
+        if vocabulary is None:
+            vocabulary = self._vocabulary[field] = sorted(self._postings[field])
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + '\uffff')
+        return vocabulary[start:end]
+
+    def posting_size(self, fields: Tuple[str, ...], prefix: str) -> int:
+        """Upper bound of the number of documents matching a prefix"""
+        return sum(len(postings) for postings in self.posting_sets(fields, prefix))
+
+    def posting_sets(self, fields: Tuple[str, ...], prefix: str) -> List[Set[int]]:
+        """The posting lists of every token that starts with prefix in the fields"""
+        return [self._postings[field][token] for field in fields for token in self._expand(field, prefix)]
+
+    def postings(self, fields: Tuple[str, ...], prefix: str) -> Set[int]:
+        """Documents containing a token that starts with prefix in any of the fields"""
+        result = set()
+        for postings in self.posting_sets(fields, prefix):
+            result |= postings
+        return result
+
+    def verify_phrase(self, candidates: Set[int], fields: Tuple[str, ...], text: str,
+                      greeklish: bool = False) -> Set[int]:
+        """Keep the candidates whose normalized (or Greeklish) field text contains the phrase"""
+        if greeklish:
+            return {doc_id for doc_id in candidates
+                    if any(text in greeklish_text(self.field_text(doc_id, field)) for field in fields)}
+        return {doc_id for doc_id in candidates
+                if any(text in self.field_text(doc_id, field) for field in fields)}
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        """
+        Evaluate a query and return results in corpus order, in the shape of
+        search_content plus the content digest and the also_in placements.
+        Raises QuerySyntaxError for malformed queries.
+        """
+        if not query or not isinstance(query, str):
+            return []
+        plan = parse_query(query)
+        if plan is None:
+            return []
+        return self.execute(plan)
+
+    def execute(self, plan: Node) -> List[Dict[str, str]]:
+        """Evaluate an already parsed query plan"""
+        results = []
+        for doc_id in sorted(plan.evaluate(self)):
+            category, subcategory, article = self.documents[doc_id]
+            results.append({
+                'category': category,
+                'subcategory': subcategory,
+                'title': article['title'],
+                'content': article['content'],
+                'law': article.get('law', ''),
+                'penalty': article.get('penalty', ''),
+                'digest': self.digests[doc_id],
+                'also_in': [{'category': other_category, 'subcategory': other_subcategory}
+                            for other_category, other_subcategory in self.placements.get(doc_id, [])]
+            })
+        return results
+
+
+def collapse_duplicates(result_lists: Iterable[List[Dict]]) -> List[Dict]:
+    """
+    Concatenate result lists, keeping the first result per content digest and
+    folding the placements of later copies into its also_in list.
+    """
+    results, first_by_digest = [], {}
+    for partial in result_lists:
+        for result in partial:
+            first = first_by_digest.get(result['digest'])
+            if first is None:
+                first_by_digest[result['digest']] = result
+                results.append(result)
+            else:
+                first['also_in'].append({'category': result['category'], 'subcategory': result['subcategory']})
+                first['also_in'].extend(result['also_in'])
+    return results
+
+
+MAX_SHARD_WORKERS = 4
+
+# Below this many documents thread hand-off costs more than the shard queries
+PARALLEL_MIN_DOCUMENTS = 20000
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_shard_executor() -> ThreadPoolExecutor:
+    """Return the process-wide pool used to query shards in parallel"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_SHARD_WORKERS, thread_name_prefix="search-shard")
+        return _executor
+
+
+class ShardedSearchIndex:
+    """
+    One SearchIndex per top-level category. A search scoped to a category only
+    touches its shard, a global search queries every shard in parallel, and a
+    shard is rebuilt on its own when the content of its category changes.
+    """
+
+    def __init__(self):
+        self.shards: Dict[str, SearchIndex] = {}
+
+    @classmethod
+    def from_repository(cls, repository) -> 'ShardedSearchIndex':
+        index = cls()
+        for category in repository.get_categories():
+            index.shards[category] = SearchIndex.from_articles(repository.iter_category(category))
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    def copy(self) -> 'ShardedSearchIndex':
+        """A new index sharing the shards of this one; rebuilding a shard of either leaves the other intact"""
+        index = ShardedSearchIndex()
+        index.shards = dict(self.shards)
+        return index
+
+    def rebuild_shard(self, repository, category: str) -> None:
+        """Re-read one category from the repository; drops the shard if it is gone"""
+        if category in repository.get_categories():
+            self.shards[category] = SearchIndex.from_articles(repository.iter_category(category))
+        else:
+            self.shards.pop(category, None)
+        logger.info(f"Rebuilt search shard {category}")
+
+    def search(self, query: str, categories: Optional[Sequence[str]] = None) -> List[Dict[str, str]]:
+        """
+        Search the shards of the given categories, or all of them when categories
+        is None. Results come back in shard order, like SearchIndex.search.
+        Raises QuerySyntaxError for malformed queries.
+        """
+        if not query or not isinstance(query, str):
+            return []
+        plan = parse_query(query)
+        if plan is None:
+            return []
+
+        names = list(self.shards) if categories is None else [name for name in categories if name in self.shards]
+        shards = [self.shards[name] for name in names]
+        if len(shards) > 1 and sum(len(shard) for shard in shards) >= PARALLEL_MIN_DOCUMENTS:
+            shard_results = get_shard_executor().map(lambda shard: shard.execute(plan), shards)
+        else:
+            shard_results = (shard.execute(plan) for shard in shards)
+
+        return collapse_duplicates(partial for partial in shard_results)
@@ -0,0 +1,574 @@
+"""
+Immutable corpus snapshots shared by several app workers on one host.
+
+A single builder process compiles the corpus and its search index into one
+read-only file; every worker memory-maps it, so the articles and posting
+lists live once in the page cache instead of once per worker:
+
+    python -m utils.snapshot build                  # publish the configured corpus once
+    python -m utils.snapshot build --watch          # republish whenever its version changes
+    python -m utils.snapshot show                   # the current snapshot and the older ones kept
+    python -m utils.snapshot publish corpus-<sha256>.snap   # roll back to an older one
+    CORPUS_SNAPSHOT_DIR=data/snapshots streamlit run main.py --server.port 5001
+
+The builder writes corpus-<sha256>.snap next to a pointer file, CURRENT,
+holding the name of the latest snapshot. Both are replaced atomically
+(temporary file + os.replace), and get_current_snapshot() rereads the
+pointer at most every POINTER_CHECK_INTERVAL seconds, so workers move to a
+new version between two requests without ever seeing a partial file. Writes
+(uploads, section removal) go to the configured repository (CORPUS_BACKEND,
+normally the shared SQLite corpus); the builder picks them up from there.
+
+File layout (little-endian): magic, header length, a JSON header, then
+8-byte aligned numpy arrays named in the header:
+
+    strings, string_offsets   every distinct token and section name, UTF-8, and its offsets
+    rows, row_offsets         one row per article in repository order: its category, subcategory,
+                              title, law, content and penalty, UTF-8, separated by a 0xFF byte
+    <shard>.documents         article row of each index document of a category
+    <shard>.digests           their article_digest, ASCII
+    <shard>.placements[_at]   the other (category, subcategory) ids of each document
+    <shard>.<field>.tokens    sorted token string ids of a field, with .offsets and .postings
+"""
+import argparse
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from utils.article import ARTICLE_FIELDS, CONTENT_FIELDS
+from utils.query import FIELDS
+from utils.search_index import SearchIndex, ShardedSearchIndex
+from utils.storage import CorpusRepository, create_repository
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'LAWSNAP1'
+SNAPSHOT_FORMAT = 2
+POINTER_NAME = "CURRENT"
+DEFAULT_SNAPSHOT_DIR = "data/snapshots"
+POINTER_CHECK_INTERVAL = 1.0
+# Snapshots kept besides the current one, for workers that have not switched yet
+KEEP_PREVIOUS = 2
+WATCH_INTERVAL = 5.0
+# Hex characters of an article_digest
+DIGEST_LENGTH = 40
+# Decoded tokens and section names kept per worker
+STRING_CACHE_SIZE = 4096
+
+# Cells of an article row. 0xFF never occurs in UTF-8, so it separates them, and a row
+# decodes in one call: surrogateescape turns the separators into lone surrogates
+_ARTICLE_COLUMNS = ('category', 'subcategory') + CONTENT_FIELDS
+_COLUMN = {field: column for column, field in enumerate(_ARTICLE_COLUMNS)}
+_CELL_SEPARATOR = b'\xff'
+_DECODED_SEPARATOR = _CELL_SEPARATOR.decode('utf-8', 'surrogateescape')
+
+
+class _StringTable:
+    """Distinct strings of a snapshot being built, by id"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def id(self, text: Optional[str]) -> int:
+        return self.ids.setdefault(text or '', len(self.ids))
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [text.encode('utf-8') for text in self.ids]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _build_arrays(repository) -> Tuple[Dict[str, np.ndarray], Dict[str, List]]:
+    """The named arrays of a snapshot of repository, and its shards and sections for the header"""
+    strings = _StringTable()
+    rows: List[bytes] = []
+    row_of_article: Dict[int, int] = {}
+    sections, shards, arrays = [], [], {}
+
+    for category in repository.get_categories():
+        index = SearchIndex()
+        for subcategory in repository.get_subcategories(category):
+            start = len(rows)
+            for article in repository.get_articles(category, subcategory):
+                row_of_article.setdefault(id(article), len(rows))
+                rows.append(_CELL_SEPARATOR.join(
+                    (value or '').encode('utf-8')
+                    for value in (category, subcategory) + tuple(article.get(field, '') for field in CONTENT_FIELDS)))
+                index.add(category, subcategory, article)
+            sections.append([category, subcategory, start, len(rows)])
+
+        name = f"s{len(shards)}"
+        shards.append({'category': category, 'name': name, 'documents': len(index)})
+        arrays[f"{name}.documents"] = np.asarray([row_of_article[id(article)] for _, _, article in index.documents],
+                                                 dtype=np.int32)
+        arrays[f"{name}.digests"] = np.asarray(index.digests, dtype=f'S{DIGEST_LENGTH}')
+        placement_at, placements = [0], []
+        for doc_id in range(len(index)):
+            for other_category, other_subcategory in index.placements.get(doc_id, []):
+                placements.append((strings.id(other_category), strings.id(other_subcategory)))
+            placement_at.append(len(placements))
+        arrays[f"{name}.placements"] = np.asarray(placements, dtype=np.int32).reshape(-1, 2)
+        arrays[f"{name}.placements_at"] = np.asarray(placement_at, dtype=np.int32)
+        for field, postings in index.export_postings().items():
+            # export_postings sorts the tokens, which is the order prefix lookups bisect
+            arrays[f"{name}.{field}.tokens"] = np.asarray([strings.id(token) for token in postings], dtype=np.int32)
+            offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+            np.cumsum([len(doc_ids) for doc_ids in postings.values()], out=offsets[1:])
+            arrays[f"{name}.{field}.offsets"] = offsets
+            arrays[f"{name}.{field}.postings"] = np.asarray(
+                [doc_id for doc_ids in postings.values() for doc_id in doc_ids], dtype=np.int32)
+        row_of_article.clear()
+
+    row_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=row_offsets[1:])
+    arrays['rows'], arrays['row_offsets'] = np.frombuffer(b''.join(rows), dtype=np.uint8), row_offsets
+    arrays['strings'], arrays['string_offsets'] = strings.arrays()
+    return arrays, {'shards': shards, 'sections': sections}
+
+
+def write_snapshot(repository, directory: str = DEFAULT_SNAPSHOT_DIR, publish: bool = True) -> Path:
+    """
+    Compile repository into an immutable snapshot file in directory and, with
+    publish, point CURRENT at it. The file is named after its content, so
+    publishing an unchanged corpus again is a no-op for the workers.
+    """
+    output = Path(directory)
+    output.mkdir(parents=True, exist_ok=True)
+    arrays, layout = _build_arrays(repository)
+
+    entries, offset = {}, 0
+    for name, array in arrays.items():
+        entries[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset += (array.nbytes + 7) // 8 * 8
+    header = json.dumps({
+        'format': SNAPSHOT_FORMAT,
+        'source_version': repository.version,
+        'fields': list(FIELDS),
+        'arrays': entries,
+        **layout
+    }, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(len(SNAPSHOT_MAGIC) + 8 + len(header)) % 8)
+
+    # The name hashes the content only, not the source version in the header
+    digest = hashlib.sha256(json.dumps(layout, ensure_ascii=False).encode('utf-8'))
+    tmp_path = output / f".snapshot-{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        for array in arrays.values():
+            data = np.ascontiguousarray(array).tobytes()
+            digest.update(data)
+            file.write(data + b'\0' * (-len(data) % 8))
+        file.flush()
+        os.fsync(file.fileno())
+
+    path = output / f"corpus-{digest.hexdigest()[:16]}.snap"
+    if path.exists():
+        tmp_path.unlink()
+    else:
+        os.replace(tmp_path, path)
+    logger.info(f"Wrote snapshot {path.name}: {len(arrays['row_offsets']) - 1} articles, {path.stat().st_size} bytes")
+    if publish:
+        publish_snapshot(output, path.name)
+    return path
+
+
+def publish_snapshot(directory, name: str) -> None:
+    """Point CURRENT at an existing snapshot of directory, a new one or an older one to roll back to"""
+    directory = Path(directory)
+    with open(directory / name, 'rb') as file:
+        if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{name} is not a corpus snapshot")
+    tmp_path = directory / f".{POINTER_NAME}-{os.getpid()}.tmp"
+    tmp_path.write_text(name, encoding='utf-8')
+    os.replace(tmp_path, directory / POINTER_NAME)
+    _prune(directory, name)
+    logger.info(f"Published snapshot {name}")
+
+
+def _prune(directory: Path, current: str) -> None:
+    """Delete all but the newest KEEP_PREVIOUS older snapshots; mapped files stay readable after unlink"""
+    previous = sorted((path for path in directory.glob("corpus-*.snap") if path.name != current),
+                      key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in previous[KEEP_PREVIOUS:]:
+        path.unlink(missing_ok=True)
+
+
+class _Strings(Sequence):
+    """Read-only view of a list of string ids as decoded strings, for bisect"""
+
+    def __init__(self, snapshot: 'CorpusSnapshot', ids: memoryview):
+        self.snapshot = snapshot
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.snapshot.string(string_id) for string_id in self.ids[position]]
+        return self.snapshot.string(self.ids[position])
+
+
+class MappedArticle(Mapping):
+    """Read-only article backed by a row of the snapshot, decoded on first access"""
+
+    __slots__ = ('_snapshot', '_row', '_cells')
+
+    def __init__(self, snapshot: 'CorpusSnapshot', row: int):
+        self._snapshot = snapshot
+        self._row = row
+        self._cells: Optional[List[str]] = None
+
+    def __getitem__(self, key: str) -> str:
+        if key not in _COLUMN:
+            raise KeyError(key)
+        if self._cells is None:
+            self._cells = self._snapshot.row(self._row)
+        return self._cells[_COLUMN[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(ARTICLE_FIELDS)
+
+    def __len__(self) -> int:
+        return len(ARTICLE_FIELDS)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {field: self[field] for field in ARTICLE_FIELDS}
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+    def __repr__(self) -> str:
+        return f"MappedArticle(title={self['title']!r}, law={self['law']!r})"
+
+
+class _Documents(Sequence):
+    """The (category, subcategory, article) documents of a mapped shard"""
+
+    def __init__(self, snapshot: 'CorpusSnapshot', rows: memoryview):
+        self.snapshot = snapshot
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, doc_id: int) -> Tuple[str, str, MappedArticle]:
+        article = MappedArticle(self.snapshot, self.rows[doc_id])
+        return article['category'], article['subcategory'], article
+
+
+class _Placements:
+    """The other placements of each document of a mapped shard, like SearchIndex.placements"""
+
+    def __init__(self, snapshot: 'CorpusSnapshot', pairs: memoryview, starts: memoryview):
+        self.snapshot = snapshot
+        self.pairs = pairs
+        self.starts = starts
+
+    def get(self, doc_id: int, default=None) -> List[Tuple[str, str]]:
+        start, end = self.starts[doc_id], self.starts[doc_id + 1]
+        if start == end:
+            return default
+        string = self.snapshot.string
+        return [(string(self.pairs[2 * position]), string(self.pairs[2 * position + 1]))
+                for position in range(start, end)]
+
+
+class _Digests(Sequence):
+    def __init__(self, digests: memoryview):
+        self.digests = digests
+
+    def __len__(self) -> int:
+        return len(self.digests) // DIGEST_LENGTH
+
+    def __getitem__(self, doc_id: int) -> str:
+        return self.digests[doc_id * DIGEST_LENGTH:(doc_id + 1) * DIGEST_LENGTH].tobytes().decode('ascii')
+
+
+class MappedSearchIndex(SearchIndex):
+    """
+    SearchIndex over one shard of a snapshot. Documents, digests, placements
+    and posting lists are views of the mapped file; only the posting sets of
+    the tokens a query touches are materialized, per query.
+    """
+
+    def __init__(self, snapshot: 'CorpusSnapshot', name: str):
+        super().__init__()
+        self.snapshot = snapshot
+        self.documents = _Documents(snapshot, snapshot.view(f"{name}.documents"))
+        self.digests = _Digests(snapshot.view(f"{name}.digests"))
+        self.placements = _Placements(snapshot, snapshot.view(f"{name}.placements"),
+                                      snapshot.view(f"{name}.placements_at"))
+        self._fields = {field: (_Strings(snapshot, snapshot.view(f"{name}.{field}.tokens")),
+                                snapshot.view(f"{name}.{field}.offsets"),
+                                snapshot.view(f"{name}.{field}.postings"))
+                        for field in FIELDS}
+
+    def add(self, category: str, subcategory: str, article) -> int:
+        raise TypeError("Snapshot indexes are read-only")
+
+    def _positions(self, field: str, prefix: str) -> range:
+        tokens = self._fields[field][0]
+        return range(bisect.bisect_left(tokens, prefix), bisect.bisect_left(tokens, prefix + '\uffff'))
+
+    def _expand(self, field: str, prefix: str) -> List[str]:
+        tokens = self._fields[field][0]
+        return [tokens[position] for position in self._positions(field, prefix)]
+
+    def posting_size(self, fields: Tuple[str, ...], prefix: str) -> int:
+        size = 0
+        for field in fields:
+            positions = self._positions(field, prefix)
+            if positions:
+                offsets = self._fields[field][1]
+                size += offsets[positions.stop] - offsets[positions.start]
+        return size
+
+    def posting_sets(self, fields: Tuple[str, ...], prefix: str) -> List[Set[int]]:
+        sets = []
+        for field in fields:
+            _, offsets, postings = self._fields[field]
+            for position in self._positions(field, prefix):
+                sets.append(set(postings[offsets[position]:offsets[position + 1]]))
+        return sets
+
+    def execute(self, plan) -> List[Dict[str, str]]:
+        """SearchIndex.execute, decoding each result row in one call"""
+        row, rows = self.snapshot.row, self.documents.rows
+        results = []
+        for doc_id in sorted(plan.evaluate(self)):
+            result = dict(zip(_ARTICLE_COLUMNS, row(rows[doc_id])))
+            result['digest'] = self.digests[doc_id]
+            result['also_in'] = [{'category': other_category, 'subcategory': other_subcategory}
+                                 for other_category, other_subcategory in self.placements.get(doc_id, [])]
+            results.append(result)
+        return results
+
+
+class SnapshotRepository(CorpusRepository):
+    """
+    Read-only repository over a snapshot. Writes go to source, the
+    repository the builder publishes from, and show up with the next snapshot.
+    """
+
+    def __init__(self, snapshot: 'CorpusSnapshot', source: Optional[CorpusRepository] = None):
+        self.snapshot = snapshot
+        self.source = source
+        self.version = snapshot.version
+
+    def get_categories(self) -> List[str]:
+        return list(self.snapshot.sections)
+
+    def get_subcategories(self, category: str) -> List[str]:
+        return list(self.snapshot.sections.get(category, {}))
+
+    def get_articles(self, category: str, subcategory: str) -> List[Mapping[str, str]]:
+        start, end = self.snapshot.sections.get(category, {}).get(subcategory, (0, 0))
+        return [MappedArticle(self.snapshot, row) for row in range(start, end)]
+
+    def _writable(self) -> CorpusRepository:
+        if self.source is None:
+            raise TypeError("This snapshot has no source repository to write to")
+        return self.source
+
+    def add_articles(self, category: str, subcategory: str, articles) -> None:
+        self._writable().add_articles(category, subcategory, articles)
+
+    def remove_section(self, category: str, subcategory: str) -> None:
+        self._writable().remove_section(category, subcategory)
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        return self.snapshot.index.search(query)
+
+
+class CorpusSnapshot:
+    """A memory-mapped snapshot file: its repository and its sharded search index"""
+
+    def __init__(self, path: str, source: Optional[CorpusRepository] = None):
+        self.path = Path(path)
+        with open(self.path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a corpus snapshot")
+        header_length = int.from_bytes(self._map[len(SNAPSHOT_MAGIC):len(SNAPSHOT_MAGIC) + 8], 'little')
+        data_start = len(SNAPSHOT_MAGIC) + 8 + header_length
+        header = json.loads(self._map[len(SNAPSHOT_MAGIC) + 8:data_start].decode('utf-8'))
+        if header['format'] != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {header['format']}")
+
+        self.header = header
+        self._data_start = data_start
+        # The file name holds the content hash, so it is a version shared by every worker
+        self.version = f"snapshot:{self.path.stem}"
+        self._strings_start = self._data_start + header['arrays']['strings']['offset']
+        self._string_offsets = self.view('string_offsets')
+        self._rows_start = self._data_start + header['arrays']['rows']['offset']
+        self._row_offsets = self.view('row_offsets')
+        # Tokens are compared over and over by prefix lookups; the cache keeps their decoded copies
+        self.string = functools.lru_cache(maxsize=STRING_CACHE_SIZE)(self._decode)
+        self.sections: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        for category, subcategory, start, end in header['sections']:
+            self.sections.setdefault(category, {})[subcategory] = (start, end)
+        self.index = ShardedSearchIndex()
+        for shard in header['shards']:
+            self.index.shards[shard['category']] = MappedSearchIndex(self, shard['name'])
+        self.repository = SnapshotRepository(self, source)
+        self._derived: Dict[str, object] = {}
+        self._derived_lock = threading.Lock()
+
+    def array(self, name: str) -> np.ndarray:
+        entry = self.header['arrays'][name]
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        array = np.frombuffer(self._map, dtype=dtype, count=count, offset=self._data_start + entry['offset'])
+        return array.reshape(entry['shape'])
+
+    def derived(self, name: str, build: Callable[[CorpusRepository], object]):
+        """State derived from the snapshot (penalty facets, ...), built once per worker by build(repository)"""
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = build(self.repository)
+            return self._derived[name]
+
+    def view(self, name: str) -> memoryview:
+        """
+        An array as a flat memoryview of the map: indexing it yields Python
+        ints, several times faster than numpy scalars for one cell at a time
+        """
+        entry = self.header['arrays'][name]
+        dtype = np.dtype(entry['dtype'])
+        start = self._data_start + entry['offset']
+        view = memoryview(self._map)[start:start + int(np.prod(entry['shape'], dtype=np.int64)) * dtype.itemsize]
+        return view if dtype.kind == 'S' else view.cast(dtype.char)
+
+    def __len__(self) -> int:
+        """Number of articles"""
+        return len(self._row_offsets) - 1
+
+    def row(self, row: int) -> List[str]:
+        """The cells of an article row, in _ARTICLE_COLUMNS order"""
+        start = self._rows_start
+        data = self._map[start + self._row_offsets[row]:start + self._row_offsets[row + 1]]
+        return data.decode('utf-8', 'surrogateescape').split(_DECODED_SEPARATOR)
+
+    def _decode(self, string_id: int) -> str:
+        start = self._strings_start
+        return self._map[start + self._string_offsets[string_id]:
+                         start + self._string_offsets[string_id + 1]].decode('utf-8')
+
+
+def read_pointer(directory: str) -> Optional[str]:
+    """Name of the current snapshot of directory, or None before the first build"""
+    try:
+        return (Path(directory) / POINTER_NAME).read_text(encoding='utf-8').strip() or None
+    except FileNotFoundError:
+        return None
+
+
+_snapshot: Optional[CorpusSnapshot] = None
+_snapshot_checked = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_dir() -> Optional[str]:
+    """The snapshot directory of this deployment, or None when workers load the corpus themselves"""
+    return os.environ.get("CORPUS_SNAPSHOT_DIR") or None
+
+
+def _shared_source() -> Optional[CorpusRepository]:
+    """The repository the builder publishes from, when workers can write to it too"""
+    # A worker's in-memory repository is invisible to the builder: writes would be lost
+    if os.environ.get("CORPUS_BACKEND", "memory") != "sqlite":
+        return None
+    return create_repository()
+
+
+def get_current_snapshot(source: Optional[CorpusRepository] = None) -> Optional[CorpusSnapshot]:
+    """
+    Return the latest published snapshot, or None outside snapshot deployments
+    or before the first build. The pointer is reread at most every
+    POINTER_CHECK_INTERVAL seconds; callers keep the snapshot they got for the
+    rest of their request. Writes to its repository go to source, by default
+    the shared SQLite corpus (CORPUS_BACKEND=sqlite); without one it is read-only.
+    """
+    global _snapshot, _snapshot_checked
+    directory = snapshot_dir()
+    if directory is None:
+        return None
+    with _snapshot_lock:
+        now = time.monotonic()
+        if _snapshot is None or now - _snapshot_checked >= POINTER_CHECK_INTERVAL:
+            _snapshot_checked = now
+            name = read_pointer(directory)
+            if name is not None and (_snapshot is None or _snapshot.path.name != name):
+                try:
+                    _snapshot = CorpusSnapshot(os.path.join(directory, name),
+                                               source or (_snapshot.repository.source if _snapshot else
+                                                          _shared_source()))
+                    logger.info(f"Switched to snapshot {name}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Cannot open snapshot {name}: {str(e)}")
+        return _snapshot
+
+
+def main() -> None:
+    from data.categories import CATEGORIES
+    from utils.article import compact_categories
+    from utils.history import BUNDLED_EFFECTIVE, get_history
+
+    parser = argparse.ArgumentParser(description="Publish corpus snapshots for the app workers")
+    parser.add_argument("command", choices=["build", "show", "publish"])
+    parser.add_argument("name", nargs="?", help="snapshot file to publish")
+    parser.add_argument("--dir", default=snapshot_dir() or DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--watch", action="store_true",
+                        help="republish whenever the corpus version changes (CORPUS_BACKEND=sqlite)")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "show":
+        name = read_pointer(args.dir)
+        if name is None:
+            raise SystemExit(f"No snapshot published in {args.dir}")
+        for path in sorted(Path(args.dir).glob("corpus-*.snap"), key=lambda path: path.stat().st_mtime):
+            snapshot = CorpusSnapshot(path)
+            print(f"{'*' if path.name == name else ' '} {path.name}: {len(snapshot)} articles, "
+                  f"{len(snapshot.index)} documents, {path.stat().st_size} bytes, "
+                  f"from version {snapshot.header['source_version']}")
+        return
+    if args.command == "publish":
+        if not args.name:
+            parser.error("publish needs the name of a snapshot, see show")
+        publish_snapshot(args.dir, args.name)
+        return
+
+    categories = compact_categories(CATEGORIES)
+    repository = create_repository(categories)
+    # Workers record the writes they make to the shared repository; the bundled corpus is recorded here
+    get_history().record_categories(categories, BUNDLED_EFFECTIVE)
+    published = None
+    while True:
+        if repository.version != published:
+            published = repository.version
+            write_snapshot(repository, args.dir)
+        if not args.watch:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from utils.search import normalize_greek_text, search_content
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "data/corpus.sqlite3"
+
+_version_counter = itertools.count(1)
+
+
+def new_corpus_version() -> str:
+    """Return a process-unique corpus version token"""
+    return f"v{next(_version_counter)}"
+
+
+class CorpusRepository:
+    """
+    Storage interface for the legal corpus (category -> subcategory -> articles).
+    Search, category browsing and reference validation go through these methods
+    so the corpus can live in memory or in SQLite.
+
+    version identifies the current content: it changes on every write, so
+    anything derived from the corpus (indexes, cached results) can be keyed by it.
+    shared tells whether every session sees the writes, as opposed to a copy
+    private to one session.
+    """
+
+    version: str = ""
+    shared: bool = False
+
+    def get_categories(self) -> List[str]:
+        raise NotImplementedError
+
+    def get_subcategories(self, category: str) -> List[str]:
+        raise NotImplementedError
+
+    def get_articles(self, category: str, subcategory: str) -> List[Mapping[str, str]]:
+        raise NotImplementedError
+
+    def add_articles(self, category: str, subcategory: str, articles: Iterable[Mapping[str, str]]) -> None:
+        raise NotImplementedError
+
+    def remove_section(self, category: str, subcategory: str) -> None:
+        raise NotImplementedError
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def has_section(self, category: str, subcategory: str) -> bool:
+        return subcategory in self.get_subcategories(category)
+
+    def iter_articles(self) -> Iterator[Tuple[str, str, Mapping[str, str]]]:
+        """Yield (category, subcategory, article) for the whole corpus"""
+        for category in self.get_categories():
+            for subcategory in self.get_subcategories(category):
+                for article in self.get_articles(category, subcategory):
+                    yield category, subcategory, article
+
+    def iter_category(self, category: str) -> Iterator[Tuple[str, str, Mapping[str, str]]]:
+        """Yield (category, subcategory, article) for one top-level category"""
+        for subcategory in self.get_subcategories(category):
+            for article in self.get_articles(category, subcategory):
+                yield category, subcategory, article
+
+    def add_categories(self, categories: Dict) -> None:
+        """Merge a nested categories dict into the repository"""
+        for category, subcategories in categories.items():
+            for subcategory, articles in subcategories.items():
+                self.add_articles(category, subcategory, articles)
+
+
+class InMemoryRepository(CorpusRepository):
+    """Repository over the nested categories dict kept in session state"""
+
+    def __init__(self, categories: Optional[Dict] = None, version: Optional[str] = None):
+        self.categories = categories if categories is not None else {}
+        self.version = version or new_corpus_version()
+
+    def get_categories(self) -> List[str]:
+        return list(self.categories.keys())
+
+    def get_subcategories(self, category: str) -> List[str]:
+        return list(self.categories.get(category, {}).keys())
+
+    def get_articles(self, category: str, subcategory: str) -> List[Mapping[str, str]]:
+        return self.categories.get(category, {}).get(subcategory, [])
+
+    def add_articles(self, category: str, subcategory: str, articles: Iterable[Mapping[str, str]]) -> None:
+        self.categories.setdefault(category, {}).setdefault(subcategory, []).extend(articles)
+        self.version = new_corpus_version()
+
+    def remove_section(self, category: str, subcategory: str) -> None:
+        if category in self.categories:
+            self.categories[category].pop(subcategory, None)
+            if not self.categories[category]:
+                del self.categories[category]
+        self.version = new_corpus_version()
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        return search_content(query, self.categories)
+
+    def iter_articles(self) -> Iterator[Tuple[str, str, Mapping[str, str]]]:
+        for category, subcategories in self.categories.items():
+            for subcategory, articles in subcategories.items():
+                for article in articles:
+                    yield category, subcategory, article
+
+
+class SqliteRepository(CorpusRepository):
+    """
+    Repository persisted in SQLite with an FTS5 index for search.
+
+    The FTS table stores the accent-folded, lowercased text produced by
+    normalize_greek_text, so matching follows the same rules as the in-memory
+    search. The trigram tokenizer gives substring matches ("ναρκωτικ") from
+    the index; queries shorter than three characters fall back to LIKE.
+    """
+
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS articles (
+            id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            subcategory TEXT NOT NULL,
+            title TEXT NOT NULL,
+            law TEXT NOT NULL DEFAULT '',
+            content TEXT NOT NULL DEFAULT '',
+            penalty TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_articles_section ON articles(category, subcategory, id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(title, law, content, tokenize='trigram');
+        CREATE TABLE IF NOT EXISTS corpus_version (id INTEGER PRIMARY KEY CHECK (id = 1), revision INTEGER NOT NULL);
+        INSERT OR IGNORE INTO corpus_version (id, revision) VALUES (1, 0);
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets several processes read concurrently"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def version(self) -> str:
+        """Stored in the database so every process sees writes made by the others"""
+        row = self._connection().execute("SELECT revision FROM corpus_version WHERE id = 1").fetchone()
+        return f"sqlite:{os.path.abspath(self.db_path)}:{row['revision']}"
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE corpus_version SET revision = revision + 1 WHERE id = 1")
+
+    def is_empty(self) -> bool:
+        return self._connection().execute("SELECT 1 FROM articles LIMIT 1").fetchone() is None
+
+    def get_categories(self) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT category FROM articles GROUP BY category ORDER BY MIN(id)")
+        return [row['category'] for row in rows]
+
+    def get_subcategories(self, category: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT subcategory FROM articles WHERE category = ? GROUP BY subcategory ORDER BY MIN(id)",
+            (category,))
+        return [row['subcategory'] for row in rows]
+
+    def get_articles(self, category: str, subcategory: str) -> List[Dict[str, str]]:
+        rows = self._connection().execute(
+            "SELECT title, law, content, penalty FROM articles "
+            "WHERE category = ? AND subcategory = ? ORDER BY id",
+            (category, subcategory))
+        return [dict(row) for row in rows]
+
+    def iter_articles(self) -> Iterator[Tuple[str, str, Dict[str, str]]]:
+        rows = self._connection().execute(
+            "SELECT category, subcategory, title, law, content, penalty FROM articles ORDER BY id")
+        for row in rows:
+            article = dict(row)
+            yield article.pop('category'), article.pop('subcategory'), article
+
+    def iter_category(self, category: str) -> Iterator[Tuple[str, str, Dict[str, str]]]:
+        rows = self._connection().execute(
+            "SELECT subcategory, title, law, content, penalty FROM articles WHERE category = ? ORDER BY id",
+            (category,))
+        for row in rows:
+            article = dict(row)
+            yield category, article.pop('subcategory'), article
+
+    @staticmethod
+    def _insert_articles(conn: sqlite3.Connection, category: str, subcategory: str,
+                         articles: Iterable[Mapping[str, str]]) -> None:
+        for article in articles:
+            fields = (article['title'], article.get('law', '') or '',
+                      article.get('content', '') or '', article.get('penalty', '') or '')
+            cursor = conn.execute(
+                "INSERT INTO articles (category, subcategory, title, law, content, penalty) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (category, subcategory) + fields)
+            conn.execute(
+                "INSERT INTO articles_fts (rowid, title, law, content) VALUES (?, ?, ?, ?)",
+                (cursor.lastrowid,) + tuple(normalize_greek_text(field) for field in fields[:3]))
+
+    def add_articles(self, category: str, subcategory: str, articles: Iterable[Mapping[str, str]]) -> None:
+        with self._connection() as conn:
+            self._insert_articles(conn, category, subcategory, articles)
+            self._bump_version(conn)
+
+    def add_categories(self, categories: Dict) -> None:
+        """Merge a nested categories dict in one transaction, so readers see all of it or none"""
+        with self._connection() as conn:
+            for category, subcategories in categories.items():
+                for subcategory, articles in subcategories.items():
+                    self._insert_articles(conn, category, subcategory, articles)
+            self._bump_version(conn)
+
+    def remove_section(self, category: str, subcategory: str) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM articles_fts WHERE rowid IN "
+                "(SELECT id FROM articles WHERE category = ? AND subcategory = ?)",
+                (category, subcategory))
+            conn.execute("DELETE FROM articles WHERE category = ? AND subcategory = ?",
+                         (category, subcategory))
+            self._bump_version(conn)
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        if not query or not isinstance(query, str):
+            return []
+
+        normalized_query = normalize_greek_text(query)
+        try:
+            if len(normalized_query) >= 3:
+                # A quoted FTS5 string is a phrase; with trigrams that is a substring match
+                phrase = '"' + normalized_query.replace('"', '""') + '"'
+                rows = self._connection().execute(
+                    "SELECT a.category, a.subcategory, a.title, a.content, a.law, a.penalty "
+                    "FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid "
+                    "WHERE articles_fts MATCH ? ORDER BY a.id", (phrase,))
+            else:
+                pattern = '%' + normalized_query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                rows = self._connection().execute(
+                    "SELECT a.category, a.subcategory, a.title, a.content, a.law, a.penalty "
+                    "FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid "
+                    "WHERE articles_fts.title LIKE ? ESCAPE '\\' OR articles_fts.law LIKE ? ESCAPE '\\' "
+                    "OR articles_fts.content LIKE ? ESCAPE '\\' ORDER BY a.id",
+                    (pattern, pattern, pattern))
+            return [dict(row) for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Search error: {str(e)}")
+            return []
+
+
+def create_repository(categories: Optional[Dict] = None, backend: Optional[str] = None,
+                      db_path: Optional[str] = None, version: Optional[str] = None) -> CorpusRepository:
+    """
+    Build the configured repository. The backend defaults to the CORPUS_BACKEND
+    environment variable ('memory' or 'sqlite'). A new SQLite database is seeded
+    from categories. For the in-memory backend, version names the initial
+    content so that sessions starting from the same corpus share cached results.
+    """
+    backend = backend or os.environ.get("CORPUS_BACKEND", "memory")
+    if backend == "sqlite":
+        repository = SqliteRepository(db_path or os.environ.get("CORPUS_DB_PATH", DEFAULT_DB_PATH))
+        if categories and repository.is_empty():
+            repository.add_categories(categories)
+        return repository
+    return InMemoryRepository(categories, version)
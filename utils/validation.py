@@ -1,17 +1,28 @@
 import logging
 from typing import Dict, List, Set, Tuple
 import re
+from utils.storage import CorpusRepository, InMemoryRepository
 
 logger = logging.getLogger(__name__)
 
+# Match patterns like "Άρθρο 123", "άρθρο 456"
+ARTICLE_REFERENCE = re.compile(r'[Άά]ρθρο\s+(\d+[α-ω]?)', re.IGNORECASE)
+# Match law references like "Ν.4139/2013", "Π.Κ. 372"
+LAW_REFERENCE = re.compile(r'(?:Ν\.|Π\.Κ\.|Π\.Δ\.|ΚΠΔ)\s*\d+(?:[α-ω])?(?:/\d{4})?', re.IGNORECASE)
+
 class ReferenceValidator:
     """
     Validates references between sections and articles in the legal database
     to prevent broken links when removing content.
     """
     
-    def __init__(self, categories: Dict):
+    def __init__(self, categories):
         self.categories = categories
+        # Accept either the nested categories dict or a CorpusRepository
+        if isinstance(categories, CorpusRepository):
+            self.repository = categories
+        else:
+            self.repository = InMemoryRepository(categories)
         self.reference_map = {}
         self._build_reference_map()
     
@@ -19,28 +30,22 @@ class ReferenceValidator:
         """
         Builds a map of all references between articles and sections.
         """
-        for category, subcategories in self.categories.items():
-            for subcategory, articles in subcategories.items():
-                for article in articles:
-                    article_id = f"{category}:{subcategory}:{article['title']}"
-                    self.reference_map[article_id] = self._find_references(article['content'])
+        for category, subcategory, article in self.repository.iter_articles():
+            article_id = f"{category}:{subcategory}:{article['title']}"
+            self.reference_map[article_id] = self._find_references(article['content'])
     
     def _find_references(self, content: str) -> Set[str]:
         """
         Finds all article references in the given content.
         """
         references = set()
-        # Match patterns like "Άρθρο 123", "άρθρο 456"
-        article_pattern = re.compile(r'[Άά]ρθρο\s+(\d+[α-ω]?)', re.IGNORECASE)
-        # Match law references like "Ν.4139/2013", "Π.Κ. 372"
-        law_pattern = re.compile(r'(?:Ν\.|Π\.Κ\.|Π\.Δ\.|ΚΠΔ)\s*\d+(?:[α-ω])?(?:/\d{4})?', re.IGNORECASE)
-        
+
         # Find article references
-        for match in article_pattern.finditer(content):
+        for match in ARTICLE_REFERENCE.finditer(content):
             references.add(match.group())
-        
+
         # Find law references
-        for match in law_pattern.finditer(content):
+        for match in LAW_REFERENCE.finditer(content):
             references.add(match.group())
         
         return references
@@ -69,8 +74,8 @@ class ReferenceValidator:
         affected_references = []
         
         # Check all articles in the section
-        if category in self.categories and subcategory in self.categories[category]:
-            for article in self.categories[category][subcategory]:
+        if self.repository.has_section(category, subcategory):
+            for article in self.repository.get_articles(category, subcategory):
                 is_safe, references = self.validate_removal(category, subcategory, article['title'])
                 if not is_safe:
                     affected_references.extend(references)
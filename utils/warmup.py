@@ -0,0 +1,194 @@
+"""
+Startup warmup: what the first page needs, prepared once per process.
+
+start_warmup() runs these phases in a background thread:
+
+    corpus    the bundled corpus, compacted, in the configured repository
+    index     its search index and penalty facets
+    imports   render-path modules with heavy dependencies (PDF backends, scipy)
+    services  starts the page index update and the related-articles load
+
+In a snapshot deployment (CORPUS_SNAPSHOT_DIR, see utils.snapshot) the
+corpus phase maps the current snapshot instead and the index phase only
+derives its penalty facets; get_warm_corpus() then returns None.
+
+Sessions starting from the bundled corpus wait for the first two phases only
+and share the warm index and facets instead of building their own (see
+get_warm_corpus); the heavy imports finish while the first page renders,
+before an article or a page hit is displayed. The ingestion
+(utils.jobs, utils.pdf_processor) and update (utils.law_updater) subsystems
+are not warmed: the app imports them when their admin panels are used.
+
+is_ready() and warmup_error() back the /api/health check of the JSON API,
+and startup_profile() reports how long each phase took, in milliseconds.
+
+Usage (from the project root):
+    python -m utils.warmup      # warm up once (without services) and print the startup profile
+"""
+import importlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Version of the bundled corpus in a fresh in-memory repository, shared by every session
+CORPUS_VERSION = "categories"
+# Imported by the app after its first render; each one pulls in PDF backends or scipy
+RENDER_PATH_MODULES = ('utils.page_index', 'utils.editions', 'utils.related')
+
+_profile: Dict[str, float] = {}
+_profile_lock = threading.Lock()
+_corpus_ready = threading.Event()
+_error: Optional[str] = None
+_ready = threading.Event()
+_warm: Optional['WarmCorpus'] = None
+_warmup_thread: Optional[threading.Thread] = None
+_warmup_lock = threading.Lock()
+
+
+def record(phase: str, started: float) -> None:
+    """Record the time since started (a perf_counter value) under phase, once per process"""
+    with _profile_lock:
+        if phase not in _profile:
+            _profile[phase] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"Startup phase {phase}: {_profile[phase]} ms")
+
+
+@contextmanager
+def _phase(name: str):
+    started = time.perf_counter()
+    yield
+    record(name, started)
+
+
+def startup_profile() -> Dict[str, float]:
+    with _profile_lock:
+        return dict(_profile)
+
+
+class WarmCorpus:
+    """The bundled corpus and the state derived from it, shared read-only by sessions"""
+
+    def __init__(self, categories: Dict, repository, index, penalties):
+        self.categories = categories
+        self.repository = repository
+        self.version = repository.version
+        self.index = index
+        self.penalties = penalties
+
+    def new_repository(self):
+        """A repository of its own for a session, starting from the bundled corpus"""
+        from utils.storage import create_repository
+
+        # Articles are immutable and shared; only the section lists are copied
+        sections = {category: {subcategory: list(articles) for subcategory, articles in subcategories.items()}
+                    for category, subcategories in self.categories.items()}
+        return create_repository(sections, version=CORPUS_VERSION)
+
+
+def _warm_up(services: bool) -> None:
+    global _warm, _error
+    started = time.perf_counter()
+    try:
+        from data.categories import CATEGORIES
+        from utils.article import compact_categories
+        from utils.penalties import PenaltyFacets
+        from utils.search_index import ShardedSearchIndex
+        from utils.snapshot import get_current_snapshot, snapshot_dir
+        from utils.storage import create_repository
+
+        if snapshot_dir() is not None:
+            # Workers of a snapshot deployment map the published corpus and index instead
+            with _phase('corpus'):
+                snapshot = get_current_snapshot()
+            with _phase('index'):
+                if snapshot is not None:
+                    snapshot.derived('penalties', PenaltyFacets.from_repository)
+            repository = snapshot.repository if snapshot is not None else None
+            categories = None
+        else:
+            with _phase('corpus'):
+                categories = compact_categories(CATEGORIES)
+                repository = create_repository(categories, version=CORPUS_VERSION)
+            with _phase('index'):
+                index = ShardedSearchIndex.from_repository(repository)
+                penalties = PenaltyFacets.from_repository(repository)
+            _warm = WarmCorpus(categories, repository, index, penalties)
+        _corpus_ready.set()
+
+        with _phase('imports'):
+            for module in RENDER_PATH_MODULES:
+                importlib.import_module(module)
+        if categories is not None:
+            # The snapshot builder records the bundled corpus for snapshot deployments
+            with _phase('history'):
+                from utils.history import BUNDLED_EFFECTIVE, get_history
+                try:
+                    get_history().record_categories(categories, BUNDLED_EFFECTIVE)
+                except Exception as e:
+                    # Only point-in-time browsing needs it; the app is ready without it
+                    logger.error(f"Recording the bundled corpus in the history failed: {str(e)}")
+        if services:
+            with _phase('services'):
+                from utils.page_index import get_page_index
+                from utils.related import get_related_articles
+                get_page_index()
+                if repository is not None:
+                    get_related_articles(repository)
+        record('ready', started)
+    except Exception as e:
+        _error = str(e) or type(e).__name__
+        logger.error(f"Warmup failed, sessions build their own state: {str(e)}")
+    finally:
+        _corpus_ready.set()
+        _ready.set()
+
+
+def start_warmup(services: bool = True) -> None:
+    """Start the warmup thread, once per process; services=False skips the background services"""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm_up, args=(services,), name="startup-warmup",
+                                              daemon=True)
+            _warmup_thread.start()
+
+
+def is_ready() -> bool:
+    """True once every phase has finished successfully"""
+    return _ready.is_set() and _error is None
+
+
+def warmup_error() -> Optional[str]:
+    """Why the warmup failed, or None while it runs or once it succeeded"""
+    return _error
+
+
+def get_warm_corpus(timeout: Optional[float] = None) -> Optional[WarmCorpus]:
+    """Start the warmup if needed and wait for its corpus; None if it failed or timeout expired"""
+    start_warmup()
+    _corpus_ready.wait(timeout)
+    return _warm
+
+
+def main() -> None:
+    from utils.snapshot import snapshot_dir
+
+    logging.basicConfig(level=logging.WARNING)
+    started = time.perf_counter()
+    # Without the page index update, which would keep the process alive while it runs
+    start_warmup(services=False)
+    warm = get_warm_corpus()
+    _ready.wait()
+    record('total', started)
+    if warmup_error() is not None or (warm is None and snapshot_dir() is None):
+        raise SystemExit("Warmup failed, see the log above")
+    print(json.dumps(startup_profile(), indent=2))
+
+
+if __name__ == "__main__":
+    main()